@@ -0,0 +1,315 @@
+"""
+Client for api_server.py, for kiosks, camera nodes and HR scripts.
+
+    api = ApiClient("http://127.0.0.1:8765")
+    api.check_in(emp_id)
+    api.stats()                         # {"total", "present", ...}
+    for stats in api.stream_stats():    # blocks, yields on every change
+        ...
+
+RemoteAttendance has the AttendanceWriter interface the recognition loops use, but
+queues events and posts them in batches from a background thread, so a camera node
+never waits on the network. RemoteGallerySync applies the server's roster changes
+to a node's FaceGallery.
+"""
+import base64
+import http.client
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from gallery_cache import fingerprint
+
+GALLERY_CHUNK = 500     # Employee ids per GET /gallery/employees (the server's MAX_GALLERY_IDS)
+
+
+class ApiClient:
+    """One keep-alive HTTP connection; use one client per thread."""
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=10.0):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, query=None):
+        """Returns (status, decoded JSON or text). Reconnects once if the server dropped the connection."""
+        if query:
+            path += "?" + urlencode({k: v for k, v in query.items() if v is not None})
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data else {}
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, data, headers)
+                response = self.conn.getresponse()
+                raw = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                self.close()
+                if attempt:
+                    raise
+        if response.getheader("Content-Type", "").startswith("application/json"):
+            return response.status, json.loads(raw)
+        return response.status, raw.decode()
+
+    def call(self, method, path, body=None, query=None):
+        """Like request() but raises RuntimeError on an error status."""
+        status, payload = self.request(method, path, body, query)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path}: {status} {payload.get('error') if isinstance(payload, dict) else payload}")
+        return payload
+
+    def events(self, events, wait=False):
+        """Posts [(employee_id, "check_in"|"check_out", ts or None)]; returns one True per event that was written."""
+        body = {"events": [{"employee_id": e, "action": a, "ts": ts} for e, a, ts in events], "wait": wait}
+        return self.call("POST", "/events", body)["results"]
+
+    def check_in(self, emp_id, ts=None):
+        return self.events([(emp_id, "check_in", ts)])[0]
+
+    def check_out(self, emp_id, ts=None):
+        return self.events([(emp_id, "check_out", ts)])[0]
+
+    def stats(self):
+        return self.call("GET", "/stats")
+
+    def logs(self, after=None, limit=None, date_from=None, date_to=None, name=None, designation=None):
+        """One page of attendance rows; pass the returned "next" as `after` for the following page."""
+        return self.call("GET", "/logs", query={"after": after, "limit": limit, "date_from": date_from,
+                                                "date_to": date_to, "name": name, "designation": designation})
+
+    def employees(self, after=None, limit=None):
+        return self.call("GET", "/employees", query={"after": after, "limit": limit})
+
+    def add_employee(self, name, email, phone, designation, encodings, photo=None):
+        """Registers an employee from face encodings (and optionally JPEG bytes); returns the new id."""
+        body = {"name": name, "email": email, "phone": phone, "designation": designation,
+                "encodings": [base64.b64encode(np.asarray(e, dtype=np.float64).tobytes()).decode() for e in encodings]}
+        if photo:
+            body["photo"] = base64.b64encode(photo).decode()
+        return self.call("POST", "/employees", body)["id"]
+
+    def delete_employee(self, emp_id):
+        self.call("DELETE", f"/employees/{emp_id}")
+
+    def gallery_keys(self, fingerprint=None):
+        """{"keys": [[template key, employee id]]}, or {"keys": None} if `fingerprint` still matches."""
+        return self.call("GET", "/gallery/keys",
+                         query={"fingerprint": ",".join(str(v) for v in fingerprint) if fingerprint else None})
+
+    def gallery_employees(self, ids):
+        """[{"id", "name", "encodings": [base64 float64]}] for the ids that still exist."""
+        return self.call("GET", "/gallery/employees", query={"ids": ",".join(str(i) for i in ids)})["employees"]
+
+    def stream_stats(self):
+        """Yields the /stats body each time it changes. Uses its own connection and blocks between updates."""
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=None)
+        try:
+            conn.request("GET", "/stats/stream")
+            response = conn.getresponse()
+            for line in response:
+                if line.startswith(b"data: "):
+                    yield json.loads(line[6:])
+        finally:
+            conn.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class RemoteAttendance:
+    """
+    Drop-in for AttendanceWriter that sends events to the API server.
+
+    Like AttendanceWriter it answers check_in()/check_out() from a table of today's
+    open sessions, so the check-in CameraState reports on every frame never leaves
+    the node; only transitions are queued and posted in batches. The table is seeded
+    from GET /sessions and refreshed every `refresh_interval` seconds while nothing is
+    queued, which picks up check-outs made at other nodes. The server still applies
+    its own table, so a transition the node got wrong is simply not written there.
+    Batches the server cannot be reached for are retried until close().
+    """
+
+    def __init__(self, url, flush_interval=0.2, batch_size=200, refresh_interval=5.0):
+        self.client = ApiClient(url)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+        self.open_sessions = set()  # employee ids checked in today, as far as this node knows
+        self.day = None
+        self.lock = threading.Lock()
+        self.events = queue.Queue()
+        self.running = False
+        self.thread = None
+        self.events_sent = 0
+        self.events_written = 0
+        self.errors = 0
+
+    def start(self):
+        try:
+            self._refresh()
+        except (OSError, RuntimeError, http.client.HTTPException) as e:
+            print(f"Attendance API unreachable, starting with no open sessions: {e}")
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    # The server owns the roster; RemoteGallerySync keeps the node's gallery in step
+    def add_employee(self, emp_id):
+        pass
+
+    def remove_employee(self, emp_id):
+        with self.lock:
+            self.open_sessions.discard(emp_id)
+
+    def check_in(self, emp_id, now=None):
+        """Returns True if this opened a session here (i.e. an event will be sent)."""
+        return self._event("check_in", emp_id, now)
+
+    def check_out(self, emp_id, now=None):
+        return self._event("check_out", emp_id, now)
+
+    def _event(self, action, emp_id, now):
+        now = now or datetime.now()
+        date = now.strftime('%Y-%m-%d')
+        with self.lock:
+            if self.day and date < self.day:
+                return False
+            if date != self.day:
+                self.open_sessions, self.day = set(), date
+            is_open = emp_id in self.open_sessions
+            if action == "check_in" and not is_open:
+                self.open_sessions.add(emp_id)
+            elif action == "check_out" and is_open:
+                self.open_sessions.discard(emp_id)
+            else:
+                return False
+            # Queued under the lock so _refresh() can tell the table has unsent changes
+            self.events.put((emp_id, action, now.timestamp()))
+        return True
+
+    def is_checked_in(self, emp_id):
+        return emp_id in self.open_sessions
+
+    def _refresh(self):
+        sessions = self.client.call("GET", "/sessions")
+        today = datetime.now().strftime('%Y-%m-%d')
+        open_ids = set(sessions["open"]) if sessions["day"] == today else set()
+        with self.lock:
+            # Anything queued since the request is not in the server's answer yet
+            if self.events.empty():
+                self.open_sessions, self.day = open_ids, today
+
+    def register_metrics(self, metrics):
+        metrics.gauge("api_queue_depth", self.events.qsize)
+        metrics.gauge("api_events_sent", lambda: self.events_sent)
+        metrics.gauge("api_events_written", lambda: self.events_written)
+        metrics.gauge("api_errors", lambda: self.errors)
+
+    def _run(self):
+        pending = []
+        next_refresh = time.monotonic() + self.refresh_interval
+        while self.running or pending or not self.events.empty():
+            try:
+                if len(pending) < self.batch_size:
+                    pending.append(self.events.get(timeout=self.flush_interval))
+                while len(pending) < self.batch_size:
+                    pending.append(self.events.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                if pending:
+                    results = self.client.events(pending)
+                    self.events_sent += len(pending)
+                    self.events_written += sum(results)
+                    pending = []
+                elif self.running and time.monotonic() >= next_refresh:
+                    self._refresh()
+                    next_refresh = time.monotonic() + self.refresh_interval
+            except RuntimeError as e:
+                # The server rejected the request; resending it would fail the same way
+                self.errors += 1
+                print(f"Attendance API rejected {len(pending)} events: {e}")
+                pending = []
+            except (OSError, http.client.HTTPException) as e:
+                self.errors += 1
+                print(f"Attendance API error: {e}")
+                if not self.running:
+                    break
+                time.sleep(1.0)
+
+    def close(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=10)
+        self.client.close()
+
+
+class RemoteGallerySync:
+    """
+    Keeps a camera node's FaceGallery in step with the server's employees.
+
+    `known` is {template key: employee id} for what the gallery was loaded with
+    (gallery_cache.gallery_keys() on the node's copy of the database). Every `interval`
+    seconds the server compares its key fingerprint with ours; only when they differ
+    are the keys fetched, and the employees with added or removed templates are read
+    again and replaced in (or removed from) the gallery.
+    """
+
+    def __init__(self, url, gallery, known, interval=10.0):
+        self.client = ApiClient(url)
+        self.gallery = gallery
+        self.known = dict(known)
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                changed = self.sync()
+                if changed:
+                    print(f"Gallery: {changed} people updated from the API server")
+            except (OSError, RuntimeError, http.client.HTTPException, ValueError) as e:
+                print(f"Gallery sync error: {e}")
+
+    def sync(self):
+        """One round; returns how many employees changed."""
+        reply = self.client.gallery_keys(fingerprint(list(self.known)))
+        if reply["keys"] is None:
+            return 0
+        keys = {k: emp_id for k, emp_id in reply["keys"]}
+        changed = sorted({emp_id for k, emp_id in keys.items() if k not in self.known}
+                         | {emp_id for k, emp_id in self.known.items() if k not in keys})
+        found = {}
+        for i in range(0, len(changed), GALLERY_CHUNK):
+            for emp in self.client.gallery_employees(changed[i:i + GALLERY_CHUNK]):
+                found[emp["id"]] = emp
+        for emp_id in changed:
+            emp = found.get(emp_id)
+            if emp:
+                self.gallery.add(emp_id, emp["name"], [np.frombuffer(base64.b64decode(e), dtype=np.float64)
+                                                       for e in emp["encodings"]])
+            elif emp_id in self.gallery:
+                self.gallery.remove(emp_id)
+        # Templates read after the keys may be newer; the next round's fingerprint catches that
+        self.known = keys
+        return len(changed)
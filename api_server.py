@@ -0,0 +1,425 @@
+"""
+Local HTTP API that owns the attendance database.
+
+    python api_server.py [--db data/attendance.db] [--host 127.0.0.1] [--port 8765] [--readers 4]
+
+Kiosks, camera nodes and HR tools talk to this instead of opening the SQLite file,
+so there is exactly one writer: AttendanceWriter's connection. Attendance events
+are answered from its in-memory session table and batched into transactions as in
+the dashboard; roster changes go through AttendanceWriter.submit() on the same
+connection. Reads run on a small pool of read-only connections (WAL lets them
+proceed while the writer commits). Plain asyncio and HTTP/1.1 with keep-alive,
+JSON in and out:
+
+    POST   /events                {"events": [{"employee_id", "action": "check_in"|"check_out", "ts"?}],
+                                   "wait": false}   wait=true returns after the commit;
+                                  events whose ts is not today are answered false and listed in "stale"
+    GET    /stats                 dashboard counters and writer queue
+    GET    /sessions              {"day", "open": [employee ids checked in today]}
+    GET    /stats/stream          server-sent events: the /stats body whenever it changes
+    GET    /logs                  ?date_from&date_to&name&designation&after=<ts_in>,<id>&limit
+    GET    /employees             ?after=<id>&limit
+    POST   /employees             {"name", "email", "phone", "designation", "encodings": [base64 float64],
+                                   "photo": base64 JPEG?}
+    DELETE /employees/<id>
+    GET    /gallery/keys          ?fingerprint=<count>,<sum>,<sum of squares>: {"keys": [[template key,
+                                   employee id]], or null while the fingerprint still matches}
+    GET    /gallery/employees     ?ids=<id>,<id>...: {"employees": [{"id", "name", "encodings": [base64]}]}
+    GET    /metrics               Prometheus text
+    GET    /health
+"""
+import argparse
+import asyncio
+import base64
+import json
+import re
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from attendance_writer import AttendanceWriter
+from database import DB_PATH, init_db
+from gallery_cache import db_fingerprint, gallery_keys
+from image_store import make_thumbnail, release_image, store_image_bytes
+from log_queries import PAGE_SIZE, attendance_page, employee_page
+from matcher import ENCODING_SIZE
+from metrics import Metrics, StageTimings
+from stats import DailyStats
+from templates import centroid, gallery_rows, save_templates, MAX_TEMPLATES
+
+DEFAULT_PORT = 8765
+MAX_BODY = 8 * 1024 * 1024      # Enough for a photo and MAX_TEMPLATES encodings
+MAX_EVENTS = 5000               # Per POST /events
+MAX_GALLERY_IDS = 500           # Per GET /gallery/employees
+STREAM_INTERVAL = 0.25          # Seconds between checks for changed stats on /stats/stream
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def employee_fields(body):
+    missing = [f for f in ("name", "email", "phone", "designation") if not str(body.get(f) or "").strip()]
+    if missing:
+        raise ApiError(400, f"missing {', '.join(missing)}")
+    return tuple(str(body[f]).strip() for f in ("name", "email", "phone", "designation"))
+
+
+class ApiServer:
+    def __init__(self, db_path=DB_PATH, host="127.0.0.1", port=DEFAULT_PORT, readers=4):
+        self.db_path = db_path
+        self.host = host
+        self.port = port
+        self.attendance = AttendanceWriter(db_path)
+        self.stats = DailyStats(db_path)
+        self.local = threading.local()
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix="reader")
+        self.timings = StageTimings()   # one stage per route
+        self.metrics = Metrics()
+        self.metrics.register(self.timings, component="api")
+        self.attendance.register_metrics(self.metrics)
+        self.connections = 0
+        self.streams = 0
+        self.metrics.gauge("api_connections", lambda: self.connections)
+        self.metrics.gauge("api_streams", lambda: self.streams)
+        self.routes = [
+            ("POST", re.compile(r"/events"), "events", self.post_events),
+            ("GET", re.compile(r"/stats"), "stats", self.get_stats),
+            ("GET", re.compile(r"/stats/stream"), "stats_stream", self.stream_stats),
+            ("GET", re.compile(r"/sessions"), "sessions", self.get_sessions),
+            ("GET", re.compile(r"/logs"), "logs", self.get_logs),
+            ("GET", re.compile(r"/employees"), "employees", self.get_employees),
+            ("POST", re.compile(r"/employees"), "add_employee", self.add_employee),
+            ("DELETE", re.compile(r"/employees/(\d+)"), "delete_employee", self.delete_employee),
+            ("GET", re.compile(r"/gallery/keys"), "gallery_keys", self.get_gallery_keys),
+            ("GET", re.compile(r"/gallery/employees"), "gallery_employees", self.get_gallery_employees),
+            ("GET", re.compile(r"/metrics"), "metrics", self.get_metrics),
+            ("GET", re.compile(r"/health"), "health", self.health),
+        ]
+
+    # --- Database access ---
+
+    def _reader(self):
+        # One read-only connection per pool thread, opened on first use
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self.local.conn = conn
+        return conn
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, lambda: fn(self._reader(), *args))
+
+    async def write(self, fn):
+        return await asyncio.wrap_future(self.attendance.submit(fn))
+
+    # --- Handlers: (query, body) -> (status, JSON-able body) ---
+
+    async def post_events(self, query, body):
+        events = body.get("events")
+        if not isinstance(events, list) or len(events) > MAX_EVENTS:
+            raise ApiError(400, f"'events' must be a list of at most {MAX_EVENTS} events")
+        # Validate the whole batch first so a rejected request has changed nothing
+        parsed = []
+        for event in events:
+            try:
+                emp_id, action = int(event["employee_id"]), event["action"]
+                now = datetime.fromtimestamp(float(event["ts"])) if event.get("ts") is not None else None
+            except (KeyError, TypeError, ValueError, OverflowError, OSError):
+                raise ApiError(400, f"bad event {event!r}")
+            if action not in ("check_in", "check_out"):
+                raise ApiError(400, f"unknown action {action!r}")
+            parsed.append((emp_id, action, now))
+        # Only today's events can be applied: the writer's session table describes today alone
+        today = datetime.now().strftime('%Y-%m-%d')
+        results, stale = [], []
+        for i, (emp_id, action, now) in enumerate(parsed):
+            if now is not None and now.strftime('%Y-%m-%d') != today:
+                stale.append(i)
+                results.append(False)
+                continue
+            if action == "check_in":
+                written = self.attendance.check_in(emp_id, now)
+                if written:
+                    self.stats.record_check_in(emp_id, now)
+            else:
+                written = self.attendance.check_out(emp_id, now)
+            results.append(written)
+        if body.get("wait"):
+            await asyncio.get_running_loop().run_in_executor(None, self.attendance.flush)
+        return 200, {"accepted": len(results) - len(stale), "written": sum(results), "results": results,
+                     "stale": stale}
+
+    def stats_body(self):
+        total, present = self.stats.snapshot()
+        return {"total": total, "present": present, "version": self.stats.version,
+                "queue_depth": self.attendance.events.qsize(), "events_written": self.attendance.events_written,
+                "commits": self.attendance.commits}
+
+    async def get_stats(self, query, body):
+        return 200, self.stats_body()
+
+    async def stream_stats(self, query, body):
+        return 200, None    # Handled by serve_stream
+
+    async def get_sessions(self, query, body):
+        # Camera nodes refresh their own session table from this (see RemoteAttendance)
+        with self.attendance.lock:
+            return 200, {"day": self.attendance.day, "open": list(self.attendance.open_sessions)}
+
+    async def get_logs(self, query, body):
+        after = None
+        if query.get("after"):
+            try:
+                ts, row_id = query["after"].split(",")
+                after = (int(ts), int(row_id))
+            except ValueError:
+                raise ApiError(400, "after must be <ts_in>,<id>")
+        limit = min(int(query.get("limit") or PAGE_SIZE), 1000)
+        rows, next_key = await self.read(attendance_page, after, limit, query.get("date_from"),
+                                         query.get("date_to"), query.get("name"), query.get("designation"))
+        keys = ("name", "email", "designation", "date", "time_in", "time_out")
+        return 200, {"rows": [dict(zip(keys, r)) for r in rows],
+                     "next": f"{next_key[0]},{next_key[1]}" if next_key else None}
+
+    async def get_employees(self, query, body):
+        limit = min(int(query.get("limit") or PAGE_SIZE), 1000)
+        rows, next_key = await self.read(employee_page, int(query.get("after") or 0), limit)
+        keys = ("id", "name", "email", "phone", "designation")
+        return 200, {"rows": [dict(zip(keys, r)) for r in rows], "next": next_key}
+
+    async def add_employee(self, query, body):
+        fields = employee_fields(body)
+        try:
+            encodings = [np.frombuffer(base64.b64decode(e), dtype=np.float64) for e in body.get("encodings") or []]
+            photo = base64.b64decode(body["photo"]) if body.get("photo") else None
+        except (TypeError, ValueError):
+            raise ApiError(400, "encodings and photo must be base64")
+        if not encodings or any(len(e) != 128 for e in encodings) or len(encodings) > MAX_TEMPLATES:
+            raise ApiError(400, f"need 1 to {MAX_TEMPLATES} encodings of 128 float64 values")
+        # The thumbnail is made here rather than on the writer thread, which must stay quick
+        thumbnail = make_thumbnail(photo) if photo else None
+
+        def insert(conn):
+            cur = conn.cursor()
+            image_hash = store_image_bytes(cur, photo, thumbnail) if photo else None
+            cur.execute("""INSERT INTO employees (name, email, phone, designation, encoding, image_hash)
+                           VALUES (?, ?, ?, ?, ?, ?)""", fields + (centroid(encodings).tobytes(), image_hash))
+            emp_id = cur.lastrowid
+            save_templates(cur, emp_id, encodings, source="api")
+            return emp_id
+        try:
+            emp_id = await self.write(insert)
+        except sqlite3.IntegrityError:
+            raise ApiError(409, "name, email or phone already registered")
+        self.attendance.add_employee(emp_id)
+        self.stats.record_registration()
+        return 201, {"id": emp_id}
+
+    async def delete_employee(self, query, body, emp_id):
+        emp_id = int(emp_id)
+
+        def delete(conn):
+            cur = conn.cursor()
+            cur.execute("SELECT image_hash FROM employees WHERE id=?", (emp_id,))
+            row = cur.fetchone()
+            if row is None:
+                return False
+            cur.execute("DELETE FROM employees WHERE id=?", (emp_id,))
+            if row[0]:
+                release_image(cur, row[0])
+            return True
+        if not await self.write(delete):
+            raise ApiError(404, f"no employee {emp_id}")
+        self.attendance.remove_employee(emp_id)
+        self.stats.record_removal(emp_id)
+        return 200, {"deleted": emp_id}
+
+    async def get_gallery_keys(self, query, body):
+        def keys(conn):
+            # The cheap aggregate first: most polls from camera nodes find nothing changed
+            if query.get("fingerprint") == ",".join(str(v) for v in db_fingerprint(conn)):
+                return None
+            return [[k, emp_id] for k, emp_id in gallery_keys(conn).items()]
+        rows = await self.read(keys)
+        return 200, {"keys": rows}
+
+    async def get_gallery_employees(self, query, body):
+        try:
+            ids = [int(i) for i in (query.get("ids") or "").split(",") if i]
+        except ValueError:
+            raise ApiError(400, "ids must be comma-separated employee ids")
+        if len(ids) > MAX_GALLERY_IDS:
+            raise ApiError(400, f"at most {MAX_GALLERY_IDS} ids per request")
+
+        def templates(conn):
+            found = {}
+            for emp_id in ids:
+                for _, name, encoding in gallery_rows(conn, emp_id):
+                    if encoding is not None and len(encoding) == ENCODING_SIZE * 8:
+                        found.setdefault(emp_id, (name, []))[1].append(base64.b64encode(encoding).decode())
+            return found
+        found = await self.read(templates)
+        return 200, {"employees": [{"id": emp_id, "name": name, "encodings": encodings}
+                                   for emp_id, (name, encodings) in found.items()]}
+
+    async def get_metrics(self, query, body):
+        return 200, self.metrics.to_prometheus()
+
+    async def health(self, query, body):
+        return 200, {"ok": True}
+
+    # --- HTTP ---
+
+    def route(self, method, path):
+        allowed = False
+        for route_method, pattern, name, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                if route_method == method:
+                    return name, handler, match.groups()
+                allowed = True
+        raise ApiError(405 if allowed else 404, f"{method} {path} not supported" if allowed else f"no route {path}")
+
+    async def send(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload).encode(), "application/json"
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                     .encode() + data)
+        await writer.drain()
+
+    async def serve_stream(self, writer):
+        """Pushes the stats body as a server-sent event whenever it changes, until the client goes away."""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        self.streams += 1
+        last = None
+        try:
+            while True:
+                body = self.stats_body()
+                if body != last:
+                    writer.write(f"data: {json.dumps(body)}\n\n".encode())
+                    await writer.drain()
+                    last = body
+                await asyncio.sleep(STREAM_INTERVAL)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.streams -= 1
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send(writer, 400, {"error": "bad request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    await self.send(writer, 400, {"error": "bad Content-Length"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.send(writer, 413, {"error": "body too large"}, False)
+                    break
+                raw = await reader.readexactly(length) if length else b""
+
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                start = time.perf_counter()
+                name = "unrouted"
+                try:
+                    name, handler, args = self.route(method, url.path)
+                    if name == "stats_stream":
+                        await self.serve_stream(writer)
+                        break
+                    body = json.loads(raw) if raw else {}
+                    if not isinstance(body, dict):
+                        raise ApiError(400, "body must be a JSON object")
+                    status, payload = await handler(query, body, *args)
+                except ApiError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError as e:     # Bad JSON or a non-numeric query parameter
+                    status, payload = 400, {"error": str(e)}
+                except Exception as e:
+                    print(f"API error on {method} {url.path}: {e}")
+                    status, payload = 500, {"error": "internal error"}
+                self.timings.add(name, time.perf_counter() - start)
+                await self.send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass    # Client went away, or the server is shutting down
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self, ready=None):
+        self.attendance.start()
+        self.stats.start()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"VisionGuard API on http://{self.host}:{self.port} ({self.db_path})")
+        if ready:
+            ready.set()
+        try:
+            # SIGTERM closes the listener so the writer still commits what is queued
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            pass    # Windows, or not on the main thread (e.g. embedded in a test or another app)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.stats.stop()
+            self.attendance.close()
+            self.readers.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the attendance database over a local HTTP API.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 to accept camera nodes on the network")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument("--readers", type=int, default=4, help="read-only connections for queries")
+    args = parser.parse_args()
+
+    init_db(args.db)
+    try:
+        asyncio.run(ApiServer(args.db, args.host, args.port, args.readers).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import cv2
+
+COOLDOWN_SECONDS = 60       # No new check-in after a successful check-out for this long
+CHECKOUT_HOLD_SECONDS = 2   # How long a face must stay in the center zone to check out
+ZONE_SIZE = 180             # Width/height of the centered check-out zone in pixels
+
+
+def checkout_zone(w, h, size=ZONE_SIZE):
+    cx, cy = w // 2, h // 2
+    return (cx - size//2, cy - size//2, cx + size//2, cy + size//2)
+
+
+class CameraState:
+    """
+    Check-in / centered check-out rules for one camera.
+
+    Anyone recognised is checked in. Holding the face inside the center zone for
+    CHECKOUT_HOLD_SECONDS checks them out and starts a COOLDOWN_SECONDS cooldown during
+    which they are ignored. Each camera keeps its own zone timers and cooldowns.
+
+    Zone timers are keyed by track id when the recognizer tracks faces, so a timer
+    belongs to one continuously seen face and ends when that track is lost.
+    Without tracking they fall back to the employee id.
+    """
+
+    def __init__(self, camera_id=0, zone_size=ZONE_SIZE):
+        self.camera_id = camera_id
+        self.zone_size = zone_size
+        self.tracking = {}      # track (or employee) id -> (employee id, time they entered the zone)
+        self.cooldowns = {}     # employee id -> time of their last check-out
+
+    def apply(self, now_ts, shape, faces, db_action):
+        """
+        Applies the rules to one recognised frame. `db_action(emp_id, action)` is called
+        with "check_in" / "check_out". Returns the overlay to draw:
+        [(state, name, (top, right, bottom, left))] with state in
+        "cooldown", "seen", "zone" or "logout".
+        """
+        h, w = shape
+        zone = checkout_zone(w, h, self.zone_size)
+        overlay = []
+
+        # Timers of tracks that are gone cannot continue
+        seen = {track_id for _, _, _, track_id in faces if track_id is not None}
+        for key in [k for k in self.tracking if k[0] == "track" and k[1] not in seen]:
+            del self.tracking[key]
+
+        for emp_id, name, (t, r, b, l), track_id in faces:
+            if emp_id is None: continue
+            key = ("track", track_id) if track_id is not None else ("employee", emp_id)
+
+            if emp_id in self.cooldowns:
+                if now_ts - self.cooldowns[emp_id] < COOLDOWN_SECONDS:
+                    overlay.append(("cooldown", name, (t, r, b, l)))
+                    continue
+                else: del self.cooldowns[emp_id]
+
+            db_action(emp_id, "check_in")
+            state = "seen"
+            fx, fy = (l+r)//2, (t+b)//2
+            if (zone[0] < fx < zone[2] and zone[1] < fy < zone[3]):
+                state = "zone"
+                # A track re-identified as someone else starts a fresh timer
+                if key not in self.tracking or self.tracking[key][0] != emp_id:
+                    self.tracking[key] = (emp_id, now_ts)
+                else:
+                    if now_ts - self.tracking[key][1] >= CHECKOUT_HOLD_SECONDS:
+                        db_action(emp_id, "check_out")
+                        self.cooldowns[emp_id] = now_ts
+                        del self.tracking[key]
+                        state = "logout"
+            else:
+                if key in self.tracking: del self.tracking[key]
+            overlay.append((state, name, (t, r, b, l)))
+
+        return overlay
+
+
+def draw_overlay(display, overlay, zone_size=ZONE_SIZE, scale=1.0):
+    """
+    Draws the check-out zone and the per-face overlay on a BGR frame in place.
+    `scale` is the display size relative to the camera frame the boxes refer to.
+    """
+    h, w, _ = display.shape
+    zone = checkout_zone(w, h, int(zone_size * scale))
+    cx, cy = w // 2, h // 2
+    cv2.rectangle(display, (zone[0], zone[1]), (zone[2], zone[3]), (255, 255, 255), 1)
+    for state, name, box in overlay:
+        t, r, b, l = box if scale == 1.0 else (int(v * scale) for v in box)
+        if state == "cooldown":
+            cv2.putText(display, f"{name} (Cooldown)", (l, t-10), 1, 1, (255, 165, 0), 2)
+            continue
+        if state in ("zone", "logout"):
+            cv2.rectangle(display, (zone[0], zone[1]), (zone[2], zone[3]), (0, 255, 0), 3)
+        if state == "logout":
+            cv2.putText(display, "LOGOUT SUCCESS", (cx-100, cy), 1, 1.5, (0, 255, 0), 2)
+        cv2.rectangle(display, (l, t), (r, b), (0, 255, 0), 2)
+        cv2.putText(display, name, (l, t-10), 1, 1, (0, 255, 0), 2)
@@ -0,0 +1,317 @@
+import sqlite3
+import threading
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+
+from database import DB_PATH
+from metrics import StageTimings
+
+
+class AttendanceWriter:
+    """
+    Owns one long-lived SQLite connection (WAL mode) for attendance writes.
+
+    check_in()/check_out() take an employee id and are answered from an in-memory
+    "open session" table, so the
+    redundant check-ins the camera produces on every frame never touch the database.
+    Only real state transitions are queued; a background thread writes them in small
+    batched transactions.
+
+    Other writes can share the connection through submit() (api_server sends roster
+    changes this way), so one process never has two SQLite writers.
+    """
+
+    def __init__(self, db_path=DB_PATH, flush_interval=0.5, batch_size=64):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self.employees = set()  # employee ids that may be checked in
+        self.open_sessions = {} # employee id -> True while checked in today
+        self.day = None
+
+        self.events = queue.Queue()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+        # Counters for the benchmark / diagnostics
+        self.events_written = 0
+        self.commits = 0
+        self.commit_latencies = deque(maxlen=1000)
+        self.timings = StageTimings()   # "commit" per batch transaction
+
+    def start(self):
+        """Seeds the in-memory state from the database and starts the flush thread."""
+        conn = self._connect()
+        self._seed(conn)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, args=(conn,), daemon=True)
+        self.thread.start()
+        return self
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _seed(self, conn):
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM employees")
+        self.employees = {r[0] for r in cur.fetchall()}
+        self._load_day(cur, datetime.now().strftime('%Y-%m-%d'))
+
+    def _load_day(self, cur, day):
+        # The last session of each person decides whether they are still checked in
+        cur.execute("SELECT employee_id, ts_out FROM attendance WHERE date=? ORDER BY id", (day,))
+        last = {}
+        for emp_id, ts_out in cur.fetchall():
+            last[emp_id] = ts_out
+        self.open_sessions = {emp_id: True for emp_id, ts_out in last.items() if ts_out is None}
+        self.day = day
+
+    # --- Roster changes (keep the cache in sync with the employees table) ---
+
+    def add_employee(self, emp_id):
+        with self.lock:
+            self.employees.add(emp_id)
+
+    def remove_employee(self, emp_id):
+        with self.lock:
+            self.employees.discard(emp_id)
+            self.open_sessions.pop(emp_id, None)
+
+    # --- Attendance events ---
+
+    def check_in(self, emp_id, now=None):
+        """Returns True if this opened a new session (i.e. something will be written)."""
+        return self._event("check_in", emp_id, now)
+
+    def check_out(self, emp_id, now=None):
+        """Returns True if this closed an open session."""
+        return self._event("check_out", emp_id, now)
+
+    def _event(self, action, emp_id, now):
+        now = now or datetime.now()
+        date, ts = now.strftime('%Y-%m-%d'), int(now.timestamp())
+        with self.lock:
+            if emp_id not in self.employees:
+                return False
+            if self.day and date < self.day:
+                # Late event for an earlier day: the session table only describes today
+                return False
+            if date != self.day:
+                # Midnight rollover: yesterday's open sessions are not continued
+                self.open_sessions = {}
+                self.day = date
+            is_open = emp_id in self.open_sessions
+            if action == "check_in" and not is_open:
+                self.open_sessions[emp_id] = True
+                self.events.put(("check_in", emp_id, date, ts))
+                return True
+            if action == "check_out" and is_open:
+                del self.open_sessions[emp_id]
+                self.events.put(("check_out", emp_id, date, ts))
+                return True
+        return False
+
+    def register_metrics(self, metrics):
+        metrics.register(self.timings, component="db")
+        metrics.gauge("db_queue_depth", self.events.qsize)
+        metrics.gauge("db_events_written", lambda: self.events_written)
+        metrics.gauge("db_commits", lambda: self.commits)
+
+    def submit(self, fn):
+        """
+        Runs fn(conn) on the writer thread inside the next batch's transaction and
+        returns a Future with its result, resolved once the batch has committed.
+        fn runs under a savepoint: if it raises, only its own changes are undone.
+        """
+        future = Future()
+        self.events.put(("call", fn, future))
+        return future
+
+    def is_checked_in(self, emp_id):
+        return emp_id in self.open_sessions
+
+    # --- Background flushing ---
+
+    def _run(self, conn):
+        while self.running or not self.events.empty():
+            batch = self._next_batch()
+            if batch:
+                self._write(conn, batch)
+        conn.close()
+
+    def _next_batch(self):
+        batch = []
+        try:
+            batch.append(self.events.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        # Give a burst of events a moment to coalesce into one transaction
+        deadline = time.monotonic() + 0.005
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.events.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _savepoint(conn, fn):
+        """Runs fn() inside the batch's transaction; on error only its own changes are undone. Returns (result, error)."""
+        if not conn.in_transaction:
+            conn.execute("BEGIN")   # Else the savepoint would be the transaction and commit on release
+        conn.execute("SAVEPOINT event")
+        try:
+            result = fn()
+            conn.execute("RELEASE event")
+            return result, None
+        except Exception as e:
+            conn.execute("ROLLBACK TO event")
+            conn.execute("RELEASE event")
+            return None, e
+
+    @staticmethod
+    def _apply(conn, action, emp_id, date, ts):
+        if action == "check_in":
+            conn.execute("INSERT INTO attendance (employee_id, date, ts_in) VALUES (?,?,?)", (emp_id, date, ts))
+        else:
+            conn.execute("""UPDATE attendance SET ts_out=? WHERE id=(
+                                SELECT id FROM attendance WHERE employee_id=? AND date=? ORDER BY id DESC LIMIT 1)
+                            AND ts_out IS NULL""", (ts, emp_id, date))
+
+    def _revert(self, action, emp_id, date, ts):
+        # The event was not written, so the session table must not claim it was
+        with self.lock:
+            if date != self.day:
+                return
+            if action == "check_in":
+                self.open_sessions.pop(emp_id, None)
+            elif emp_id in self.employees:
+                self.open_sessions[emp_id] = True
+
+    def _write(self, conn, batch):
+        start = time.perf_counter()
+        done = []
+        calls = []      # (future, result, exception), resolved after the commit
+        try:
+            with conn:
+                for event in batch:
+                    if event[0] == "flush":
+                        done.append(event[1])
+                        continue
+                    if event[0] == "call":
+                        calls.append((event[2],) + self._savepoint(conn, lambda: event[1](conn)))
+                        continue
+                    _, error = self._savepoint(conn, lambda: self._apply(conn, *event))
+                    if error is None:
+                        self.events_written += 1
+                    else:
+                        print(f"Attendance write error for employee {event[1]}: {error}")
+                        self._revert(*event)
+        except sqlite3.Error as e:
+            print(f"Attendance write error: {e}")
+            # The whole batch was rolled back (e.g. the commit itself failed)
+            calls = [(event[2], None, e) for event in batch if event[0] == "call"]
+            for event in batch:
+                if event[0] in ("check_in", "check_out"):
+                    self._revert(*event)
+            done = [event[1] for event in batch if event[0] == "flush"]
+        for future, result, error in calls:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        self.commits += 1
+        self.commit_latencies.append(time.perf_counter() - start)
+        self.timings.add("commit", self.commit_latencies[-1])
+        for waiter in done:
+            waiter.set()
+
+    def flush(self, timeout=5.0):
+        """Blocks until every event queued so far has been committed."""
+        if not self.running:
+            return
+        waiter = threading.Event()
+        self.events.put(("flush", waiter))
+        waiter.wait(timeout)
+
+    def close(self):
+        if not self.running:
+            return
+        self.flush()
+        self.running = False
+        self.thread.join()
+
+
+class BulkAttendanceWriter:
+    """
+    Applies check-in/check-out events that carry their own timestamps (backfills from
+    recordings) and writes the resulting sessions in one transaction on commit().
+
+    Follows the same rules as AttendanceWriter: a check-in opens a session unless the
+    person already has an open one that day, a check-out closes the open one. The
+    last existing session of each (employee, day) is looked up once, on first use.
+    With readonly=True the database is opened read-only and commit() cannot be used.
+    """
+
+    def __init__(self, db_path=DB_PATH, readonly=False):
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) if readonly else sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.employees = {r[0] for r in self.conn.execute("SELECT id FROM employees")}
+        self.sessions = {}      # (employee id, date) -> last session dict
+        self.new_rows = []
+        self.closed_rows = []   # existing sessions that got a check-out
+
+    def _last_session(self, emp_id, date):
+        key = (emp_id, date)
+        if key not in self.sessions:
+            row = self.conn.execute("SELECT id, ts_in, ts_out FROM attendance WHERE employee_id=? AND date=? ORDER BY id DESC LIMIT 1",
+                                    (emp_id, date)).fetchone()
+            self.sessions[key] = {"id": row[0], "ts_in": row[1], "ts_out": row[2]} if row else None
+        return self.sessions[key]
+
+    def check_in(self, emp_id, ts):
+        if emp_id not in self.employees:
+            return False
+        date = datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+        last = self._last_session(emp_id, date)
+        if last is None or last["ts_out"] is not None:
+            session = {"id": None, "employee_id": emp_id, "date": date, "ts_in": int(ts), "ts_out": None}
+            self.new_rows.append(session)
+            self.sessions[(emp_id, date)] = session
+            return True
+        return False
+
+    def check_out(self, emp_id, ts):
+        if emp_id not in self.employees:
+            return False
+        date = datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+        last = self._last_session(emp_id, date)
+        if last is not None and last["ts_out"] is None:
+            last["ts_out"] = int(ts)
+            if last["id"] is not None:
+                self.closed_rows.append(last)
+            return True
+        return False
+
+    def commit(self):
+        """Writes everything in one transaction; returns (sessions inserted, sessions closed)."""
+        with self.conn:
+            self.conn.executemany("INSERT INTO attendance (employee_id, date, ts_in, ts_out) VALUES (?,?,?,?)",
+                                  [(s["employee_id"], s["date"], s["ts_in"], s["ts_out"]) for s in self.new_rows])
+            self.conn.executemany("UPDATE attendance SET ts_out=? WHERE id=? AND ts_out IS NULL",
+                                  [(s["ts_out"], s["id"]) for s in self.closed_rows])
+        counts = (len(self.new_rows), len(self.closed_rows))
+        self.new_rows, self.closed_rows, self.sessions = [], [], {}
+        return counts
+
+    def close(self):
+        self.conn.close()
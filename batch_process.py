@@ -0,0 +1,189 @@
+"""
+Offline attendance from recorded video files or image directories.
+
+    python batch_process.py entrance.mp4 lobby.mp4 --start "2026-10-17 07:30:00"
+    python batch_process.py snapshots/ --stride 2 --workers 8
+
+Recognition runs in a process pool: long videos are cut into segments so every core
+stays busy, and frames are decoded one at a time through generators so memory stays
+flat on multi-hour recordings. The parent applies the same zone / cooldown rules as
+the live dashboard (one CameraState per input) in timestamp order and writes the
+resulting attendance in a single transaction. Also useful as a reproducible
+performance harness: per-worker frames/sec are reported at the end.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+import cv2
+
+from database import DB_PATH, SCHEMA_VERSION, get_version, init_db
+from gallery import FaceGallery
+from tracker import FaceTracker
+from detection import DetectionPolicy
+from templates import gallery_rows
+from attendance_rules import CameraState
+from attendance_writer import BulkAttendanceWriter
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+_snapshot = None        # Gallery snapshot, loaded once per worker process
+
+
+def list_images(directory):
+    """Image files in the order of the timestamps they are stamped with (mtime, then name)."""
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(files, key=lambda f: (os.path.getmtime(f), f))
+
+
+def make_tasks(inputs, segment_frames, start):
+    """Splits every input into (camera id, path, kind, first, last, fps, start ts) segments."""
+    tasks = []
+    for camera_id, path in enumerate(inputs):
+        if os.path.isdir(path):
+            count = len(list_images(path))
+            kind, fps, start_ts = "images", None, None
+        else:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                print(f"Skipping {path}: cannot be opened")
+                continue
+            count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            cap.release()
+            kind = "video"
+            # Without --start, assume the file was last written when the recording ended
+            start_ts = start.timestamp() if start else os.path.getmtime(path) - count / fps
+        for first in range(0, count, segment_frames):
+            tasks.append((camera_id, path, kind, first, min(count, first + segment_frames), fps, start_ts))
+    return tasks
+
+
+def iter_video(path, first, last, stride, fps, start_ts):
+    """Yields (timestamp, frame) for every `stride`-th frame in [first, last)."""
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    for index in range(first, last):
+        if (index - first) % stride:
+            if not cap.grab():      # Skipped frames are not decoded
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield start_ts + index / fps, frame
+    cap.release()
+
+
+def iter_images(path, first, last, stride):
+    for file in list_images(path)[first:last:stride]:
+        frame = cv2.imread(file)
+        if frame is not None:
+            yield os.path.getmtime(file), frame
+
+
+def connect(db_path, readonly=False):
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) if readonly else sqlite3.connect(db_path)
+
+
+def init_worker(db_path, readonly):
+    global _snapshot
+    gallery = FaceGallery()
+    conn = connect(db_path, readonly)
+    gallery.load(gallery_rows(conn))
+    conn.close()
+    _snapshot = gallery.snapshot()
+
+
+def process_segment(args):
+    """Worker: recognises one segment. Returns (camera id, [(ts, shape, faces)], frames, seconds, pid)."""
+    (camera_id, path, kind, first, last, fps, start_ts), stride, detect_every, task_no = args
+    # Fixed scale: the attendance a recording produces must not depend on how busy the machine is
+    tracker = FaceTracker(detect_every, DetectionPolicy(adaptive=False))
+    frames = iter_video(path, first, last, stride, fps, start_ts) if kind == "video" else iter_images(path, first, last, stride)
+    results = []
+    start = time.perf_counter()
+    for ts, frame in frames:
+        faces = tracker.process(frame, _snapshot)
+        # Track ids restart in every worker, so namespace them by segment
+        faces = [(emp_id, name, box, (task_no, track_id)) for emp_id, name, box, track_id in faces]
+        results.append((ts, frame.shape[:2], faces))
+    return camera_id, results, tracker.frames, time.perf_counter() - start, os.getpid()
+
+
+def run(inputs, db_path=DB_PATH, workers=None, stride=1, segment_frames=1500, start=None,
+        detect_every=1, dry_run=False):
+    tasks = make_tasks(inputs, segment_frames, start)
+    states = {}             # camera id -> CameraState
+    events = []             # (ts, employee id, action) from every camera
+    per_worker = {}         # pid -> [frames, seconds]
+    total_frames = 0
+    wall = time.perf_counter()
+
+    with Pool(workers, initializer=init_worker, initargs=(db_path, dry_run)) as pool:
+        jobs = [(task, stride, detect_every, n) for n, task in enumerate(tasks)]
+        # imap keeps segment order, so each camera's frames reach its rules in order
+        for camera_id, results, frames, seconds, pid in pool.imap(process_segment, jobs):
+            state = states.setdefault(camera_id, CameraState(camera_id))
+            for ts, shape, faces in results:
+                state.apply(ts, shape, faces, lambda emp_id, action, ts=ts: events.append((ts, emp_id, action)))
+            stats = per_worker.setdefault(pid, [0, 0.0])
+            stats[0] += frames
+            stats[1] += seconds
+            total_frames += frames
+
+    # Cameras were processed one after another; attendance must see them interleaved in time.
+    # Repeats are only dropped after the merge, by the writer: a check-in at one camera
+    # still counts after a check-out at another.
+    events.sort(key=lambda e: e[0])
+    writer = BulkAttendanceWriter(db_path, readonly=dry_run)
+    for ts, emp_id, action in events:
+        if action == "check_in":
+            writer.check_in(emp_id, ts)
+        else:
+            writer.check_out(emp_id, ts)
+    inserted, closed = (len(writer.new_rows), len(writer.closed_rows)) if dry_run else writer.commit()
+    writer.close()
+
+    elapsed = time.perf_counter() - wall
+    for pid, (frames, seconds) in sorted(per_worker.items()):
+        print(f"worker {pid}: {frames} frames in {seconds:.1f} s ({frames / seconds if seconds else 0:.1f} fps)")
+    print(f"{total_frames} frames from {len(inputs)} input(s) in {elapsed:.1f} s "
+          f"({total_frames / elapsed if elapsed else 0:.1f} fps overall)")
+    print(f"{'Would write' if dry_run else 'Wrote'} {inserted} new sessions, closed {closed} existing ones")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill attendance from recorded videos or image folders.")
+    parser.add_argument("inputs", nargs="+", help="video files and/or directories of images (one per camera)")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--stride", type=int, default=1, help="process every Nth frame")
+    parser.add_argument("--segment-frames", type=int, default=1500, help="frames per work item")
+    parser.add_argument("--start", type=lambda s: datetime.strptime(s, '%Y-%m-%d %H:%M:%S'),
+                        help="wall-clock time of the first video frame, 'YYYY-MM-DD HH:MM:SS'")
+    parser.add_argument("--detect-every", type=int, default=1,
+                        help="run the detector on every Nth processed frame and track in between")
+    parser.add_argument("--dry-run", action="store_true", help="recognise and report, but write nothing")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        # Nothing may be written, not even a migration: the database must already be current
+        if not os.path.exists(args.db):
+            raise SystemExit(f"{args.db} does not exist")
+        conn = connect(args.db, readonly=True)
+        version = get_version(conn)
+        conn.close()
+        if version != SCHEMA_VERSION:
+            raise SystemExit(f"{args.db} is at schema version {version}, not {SCHEMA_VERSION}; migrate it with database.py first")
+    else:
+        init_db(args.db)
+    run(args.inputs, args.db, args.workers, args.stride, args.segment_frames, args.start,
+        args.detect_every, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Load test for api_server.py: attendance events per second and request latency.
+
+    python -m benchmarks.api_load [--people 1000] [--days 30] [--seconds 20] [--writers 8] [--batch 20]
+                                  [--readers 2] [--url http://127.0.0.1:8765] [--out results.json]
+
+Builds a temporary attendance.db with synthetic people and history and starts the
+server on it in a subprocess (or targets --url, whose employees are used as they
+are). --writers threads then post batches of check-in / check-out events for
+random employees as fast as the server answers, --readers threads alternate
+between /stats and a page of /logs, and one client follows /stats/stream. Each
+thread has its own keep-alive connection, as a kiosk or camera node would.
+
+Reports events and requests per second, client-side p50 / p95 / p99 per endpoint,
+stream updates received and the server's writer counters (events written,
+commits), and writes everything to JSON with --out.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from api_client import ApiClient
+from database import init_db
+from metrics import percentile
+from benchmarks.replay import fill, git_revision
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, port, readers):
+    server = subprocess.Popen([sys.executable, "-m", "api_server", "--db", db_path, "--port", str(port),
+                               "--readers", str(readers)], cwd=ROOT, stdout=subprocess.DEVNULL)
+    client = ApiClient(f"http://127.0.0.1:{port}", timeout=1.0)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"api_server exited with {server.returncode}")
+        try:
+            client.call("GET", "/health")
+            client.close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("api_server did not start within 30 s")
+
+
+class Worker(threading.Thread):
+    """Sends requests until `deadline` and keeps each endpoint's latencies in ms."""
+
+    def __init__(self, url, deadline, seed):
+        super().__init__(daemon=True)
+        self.client = ApiClient(url)
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.latencies = {}
+        self.events = 0
+        self.written = 0
+        self.errors = 0
+
+    def timed(self, endpoint, fn):
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except (OSError, RuntimeError):
+            self.errors += 1
+            return None
+        self.latencies.setdefault(endpoint, []).append((time.perf_counter() - start) * 1000)
+        return result
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            self.step()
+        self.client.close()
+
+
+class EventWriter(Worker):
+    def __init__(self, url, deadline, seed, emp_ids, batch):
+        super().__init__(url, deadline, seed)
+        self.emp_ids = emp_ids
+        self.batch = batch
+
+    def step(self):
+        events = [(self.rng.choice(self.emp_ids), self.rng.choice(("check_in", "check_out")), None)
+                  for _ in range(self.batch)]
+        results = self.timed("POST /events", lambda: self.client.events(events))
+        if results is not None:
+            self.events += len(results)
+            self.written += sum(results)
+
+
+class Reader(Worker):
+    def step(self):
+        if self.rng.random() < 0.5:
+            self.timed("GET /stats", self.client.stats)
+        else:
+            self.timed("GET /logs", lambda: self.client.logs(limit=50))
+
+
+def follow_stream(url, received):
+    try:
+        for _ in ApiClient(url).stream_stats():
+            received.append(time.monotonic())
+    except OSError:
+        pass    # The server went away at the end of the run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--people", type=int, default=1000, help="synthetic employees")
+    parser.add_argument("--days", type=int, default=30, help="days of synthetic attendance history")
+    parser.add_argument("--seconds", type=float, default=20, help="length of the timed run")
+    parser.add_argument("--writers", type=int, default=8, help="threads posting events")
+    parser.add_argument("--batch", type=int, default=20, help="events per POST /events")
+    parser.add_argument("--readers", type=int, default=2, help="threads querying /stats and /logs")
+    parser.add_argument("--server-readers", type=int, default=4, help="read-only connections in the server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSON results file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    server = None
+    try:
+        # 1. Server and employees to send events for
+        if args.url:
+            url = args.url
+        else:
+            db_path = os.path.join(tmp, "attendance.db")
+            init_db(db_path)
+            history = fill(db_path, args.people, args.days, args.seed)
+            print(f"{args.people} people, {history:,} attendance rows")
+            port = free_port()
+            server = start_server(db_path, port, args.server_readers)
+            url = f"http://127.0.0.1:{port}"
+        client = ApiClient(url)
+        emp_ids, after = [], None
+        while True:
+            page = client.employees(after=after, limit=1000)
+            emp_ids += [row["id"] for row in page["rows"]]
+            after = page["next"]
+            if after is None:
+                break
+        if not emp_ids:
+            raise SystemExit(f"{url} has no employees to send events for")
+        before = client.stats()
+
+        # 2. Timed run
+        stream_updates = []
+        threading.Thread(target=follow_stream, args=(url, stream_updates), daemon=True).start()
+        deadline = time.monotonic() + args.seconds
+        workers = [EventWriter(url, deadline, args.seed + i, emp_ids, args.batch) for i in range(args.writers)]
+        workers += [Reader(url, deadline, args.seed + 1000 + i) for i in range(args.readers)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        client.events([], wait=True)
+        after_stats = client.stats()
+
+        # 3. Report
+        latencies = {}
+        for w in workers:
+            for endpoint, values in w.latencies.items():
+                latencies.setdefault(endpoint, []).extend(values)
+        endpoints = {}
+        for endpoint, values in sorted(latencies.items()):
+            values.sort()
+            endpoints[endpoint] = {"requests": len(values), "per_s": round(len(values) / elapsed, 1),
+                                   "p50_ms": round(percentile(values, 50), 2),
+                                   "p95_ms": round(percentile(values, 95), 2),
+                                   "p99_ms": round(percentile(values, 99), 2)}
+        events = sum(w.events for w in workers)
+        written = sum(w.written for w in workers)
+        requests = sum(len(v) for v in latencies.values())
+        server_written = after_stats["events_written"] - before["events_written"]
+        commits = after_stats["commits"] - before["commits"]
+        results = {"revision": git_revision(), "url": None if server else url, "seconds": round(elapsed, 2),
+                   "writers": args.writers, "batch": args.batch, "readers": args.readers,
+                   "events": events, "events_per_s": round(events / elapsed, 1),
+                   "events_written": written, "requests_per_s": round(requests / elapsed, 1),
+                   "errors": sum(w.errors for w in workers), "stream_updates": len(stream_updates),
+                   "server": {"events_written": server_written, "commits": commits,
+                              "events_per_commit": round(server_written / commits, 1) if commits else None},
+                   "endpoints": endpoints}
+
+        print(f"{events:,} events in {elapsed:.1f} s: {results['events_per_s']:,} events/s "
+              f"({written:,} changed a session), {results['requests_per_s']:,} requests/s, {results['errors']} errors")
+        print(f"{'endpoint':<16} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for endpoint, e in endpoints.items():
+            print(f"{endpoint:<16} {e['requests']:>9} {e['per_s']:>8} {e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8}")
+        print(f"server: {server_written:,} rows written in {commits:,} commits; "
+              f"{len(stream_updates)} stream updates received")
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"results written to {args.out}")
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Attendance write benchmark against a temporary database.
+
+    python -m benchmarks.attendance [--people 200] [--events 20000] [--transition-rate 0.02]
+
+Replays a stream of camera events (mostly redundant check-ins, a few real
+check-in/check-out transitions) through the old connect-per-call db_action logic
+and through AttendanceWriter, and reports events/sec and commit latency.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from database import init_db, SCHEMA_VERSION
+from attendance_writer import AttendanceWriter
+
+
+def seed_employees(db_path, people):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO employees (name, email, phone, designation) VALUES (?,?,?,?)",
+                     [(f"person{i}", f"p{i}@example.com", f"555{i:07d}", "Staff") for i in range(people)])
+    conn.commit()
+    conn.close()
+
+
+def make_events(people, count, transition_rate, seed=0):
+    rng = random.Random(seed)
+    return [("check_out" if rng.random() < transition_rate else "check_in", f"person{rng.randrange(people)}")
+            for _ in range(count)]
+
+
+def legacy_db_action(db_path, name, action):
+    """The pre-writer db_action (schema v1): new connection, two lookups and a commit per call."""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    date, now = datetime.now().strftime('%Y-%m-%d'), datetime.now().strftime('%H:%M:%S')
+    cur.execute("SELECT email, designation FROM employees WHERE name=?", (name,))
+    row = cur.fetchone()
+    if row:
+        cur.execute("SELECT id, time_out FROM attendance WHERE name=? AND date=? ORDER BY id DESC LIMIT 1", (name, date))
+        last = cur.fetchone()
+        if action == "check_in" and (not last or last[1]):
+            cur.execute("INSERT INTO attendance (name, email, designation, date, time_in) VALUES (?,?,?,?,?)", (name, row[0], row[1], date, now))
+        elif action == "check_out" and last and not last[1]:
+            cur.execute("UPDATE attendance SET time_out=? WHERE id=?", (now, last[0]))
+    conn.commit()
+    conn.close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def fresh_db(tmp, label, people, target=SCHEMA_VERSION):
+    path = os.path.join(tmp, f"{label}.db")
+    init_db(path, target)
+    seed_employees(path, people)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=200)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--legacy-events", type=int, default=2000, help="the old path is slow, so replay fewer events")
+    parser.add_argument("--transition-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    events = make_events(args.people, args.events, args.transition_rate)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = fresh_db(tmp, "legacy", args.people, target=1)
+        legacy = events[:args.legacy_events]
+        start = time.perf_counter()
+        for action, name in legacy:
+            legacy_db_action(path, name, action)
+        legacy_rate = len(legacy) / (time.perf_counter() - start)
+
+        path = fresh_db(tmp, "writer", args.people)
+        writer = AttendanceWriter(path).start()
+        start = time.perf_counter()
+        for action, name in events:
+            emp_id = int(name[len("person"):]) + 1
+            if action == "check_in":
+                writer.check_in(emp_id)
+            else:
+                writer.check_out(emp_id)
+        accepted = time.perf_counter() - start
+        writer.flush()
+        total = time.perf_counter() - start
+        latencies = [t * 1000 for t in writer.commit_latencies]
+        writer.close()
+
+    print(f"legacy db_action : {legacy_rate:>12,.0f} events/s")
+    print(f"writer (accept)  : {len(events) / accepted:>12,.0f} events/s")
+    print(f"writer (durable) : {len(events) / total:>12,.0f} events/s")
+    print(f"rows written     : {writer.events_written} in {writer.commits} commits")
+    print(f"commit latency   : p50 {percentile(latencies, 50):.2f} ms  p95 {percentile(latencies, 95):.2f} ms  "
+          f"max {max(latencies, default=0):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Gallery startup benchmark: decoding every template from SQLite vs. the memory-mapped cache.
+
+    python -m benchmarks.gallery_cache [--people 100000] [--templates 1] [--changes 20]
+
+Fills a temporary database with synthetic employees and templates, then times
+FaceGallery.load(gallery_rows()) (what startup did before), building the cache once,
+loading from an up-to-date cache, and loading after `changes` people were
+registered and as many deleted (the incremental sync path).
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from database import init_db
+from gallery import FaceGallery
+from gallery_cache import GalleryCache
+from templates import gallery_rows
+
+
+def fill(path, people, templates, seed=0):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    for start in range(0, people, 1000):
+        count = min(people, start + 1000) - start
+        conn.executemany("INSERT INTO employees (name, email, phone, designation) VALUES (?,?,?,?)",
+                         [(f"person{i}", f"p{i}@example.com", f"555{i:07d}", "Staff")
+                          for i in range(start, start + count)])
+        first = conn.execute("SELECT max(id) FROM employees").fetchone()[0] - count + 1
+        conn.executemany("INSERT INTO face_templates (employee_id, encoding) VALUES (?, ?)",
+                         [(first + i, rng.normal(0, 0.09, 128).tobytes())
+                          for i in range(count) for _ in range(templates)])
+    conn.commit()
+    conn.close()
+
+
+def change(path, count, seed=1):
+    """Registers `count` people and deletes as many existing ones."""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    with conn:
+        conn.execute("DELETE FROM employees WHERE id IN (SELECT id FROM employees ORDER BY id LIMIT ?)", (count,))
+        for i in range(count):
+            cur = conn.execute("INSERT INTO employees (name, email, phone, designation) VALUES (?,?,?,?)",
+                               (f"new{seed}_{i}", f"n{seed}_{i}@example.com", f"7{seed:02d}{i:07d}", "Staff"))
+            conn.execute("INSERT INTO face_templates (employee_id, encoding) VALUES (?, ?)",
+                         (cur.lastrowid, rng.normal(0, 0.09, 128).tobytes()))
+    conn.close()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=100000)
+    parser.add_argument("--templates", type=int, default=1, help="templates per person")
+    parser.add_argument("--changes", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "attendance.db")
+        init_db(path)
+        fill(path, args.people, args.templates)
+
+        def from_db():
+            conn = sqlite3.connect(path)
+            gallery = FaceGallery()
+            gallery.load(gallery_rows(conn))
+            conn.close()
+            return gallery
+
+        db_ms, expected = timed(from_db)
+        rows = [("decode every row", db_ms, "")]
+        for label, prepare in (("cache rebuild", None),
+                               ("cache hit", None),
+                               (f"sync {args.changes}+{args.changes}", lambda: change(path, args.changes))):
+            if prepare:
+                prepare()
+            gallery = FaceGallery()
+            ms, status = timed(lambda: GalleryCache(path).load_into(gallery))
+            rows.append((label, ms, status))
+        if len(expected) != args.people or len(gallery) != args.people:
+            print(f"warning: gallery sizes differ ({len(expected)} vs {len(gallery)})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{args.people} people, {args.templates} template(s) each")
+    print(f"{'':<20} {'ms':>9}  status")
+    for label, ms, status in rows:
+        print(f"{label:<20} {ms:>9.1f}  {status}")
+
+
+if __name__ == "__main__":
+    main()
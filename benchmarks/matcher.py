@@ -0,0 +1,76 @@
+"""
+Face matching benchmark on synthetic encodings.
+
+    python -m benchmarks.matcher [--sizes 100 10000 100000] [--faces 4] [--rounds 20]
+
+Compares the old per-frame path (a Python list of arrays fed to a face_distance
+style scan, one face at a time) with FaceMatcher's batched exact scan and its
+k-means bucket index. Queries are noisy copies of gallery rows, so recall is the
+fraction that still resolves to the row they came from.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from matcher import FaceMatcher, ENCODING_SIZE
+
+
+def synthetic_gallery(n, seed=0):
+    rng = np.random.default_rng(seed)
+    encs = rng.normal(0, 0.09, size=(n, ENCODING_SIZE))    # ~1.0 norm like dlib encodings
+    return encs
+
+
+def list_scan(known_encs, enc):
+    """What compare_faces does per face: stack the list, then one norm over it."""
+    return np.linalg.norm(np.array(known_encs) - enc, axis=1)
+
+
+def timed(fn, rounds):
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def run(n, faces, rounds, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    encs = synthetic_gallery(n, seed)
+    labels = list(range(n))
+    truth = rng.choice(n, faces, replace=False)
+    queries = encs[truth] + rng.normal(0, 0.02, size=(faces, ENCODING_SIZE))
+
+    known_list = [row for row in encs]
+    row = {"size": n}
+    row["list_ms"] = timed(lambda: [list_scan(known_list, q).argmin() for q in queries], rounds)
+
+    exact = FaceMatcher(encs, labels, index_min_size=n + 1)
+    row["exact_ms"] = timed(lambda: exact.match(queries), rounds)
+    row["exact_recall"] = np.mean([m[0] == t for m, t in zip(exact.match(queries), truth)])
+
+    start = time.perf_counter()
+    indexed = FaceMatcher(encs, labels, index_min_size=0)
+    row["index_build_s"] = time.perf_counter() - start
+    row["index_ms"] = timed(lambda: indexed.match(queries), rounds)
+    row["index_recall"] = np.mean([m[0] == t for m, t in zip(indexed.match(queries), truth)])
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--faces", type=int, default=4, help="faces per simulated frame")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'list ms':>9} {'exact ms':>9} {'index ms':>9} {'build s':>8} {'exact rc':>9} {'index rc':>9}")
+    for n in args.sizes:
+        r = run(n, args.faces, args.rounds)
+        print(f"{r['size']:>8} {r['list_ms']:>9.3f} {r['exact_ms']:>9.3f} {r['index_ms']:>9.3f} "
+              f"{r['index_build_s']:>8.2f} {r['exact_recall']:>9.2f} {r['index_recall']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Attendance query benchmark, schema v1 vs v2, on a multi-year synthetic history.
+
+    python -m benchmarks.queries [--people 300] [--years 3] [--rounds 50]
+
+Builds a v1 database, times the hot queries (per-event session lookup, daily
+present count, one day's log), migrates it in place to the current schema and
+times the equivalent queries again.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from database import init_db, migrate, SCHEMA_VERSION
+
+
+def fill_v1(path, people, years, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO employees (name, email, phone, designation) VALUES (?,?,?,?)",
+                     [(f"person{i}", f"p{i}@example.com", f"555{i:07d}", "Staff") for i in range(people)])
+    start = date.today() - timedelta(days=365 * years)
+    rows = []
+    for d in range(365 * years):
+        day = (start + timedelta(days=d)).isoformat()
+        for i in range(people):
+            if rng.random() < 0.9:
+                h = 8 + rng.randrange(2)
+                rows.append((f"person{i}", f"p{i}@example.com", "Staff", day,
+                             f"{h:02d}:{rng.randrange(60):02d}:00", f"{h + 8:02d}:{rng.randrange(60):02d}:00"))
+        if len(rows) > 100_000:
+            conn.executemany("INSERT INTO attendance (name, email, designation, date, time_in, time_out) VALUES (?,?,?,?,?,?)", rows)
+            rows = []
+    conn.executemany("INSERT INTO attendance (name, email, designation, date, time_in, time_out) VALUES (?,?,?,?,?,?)", rows)
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+    conn.close()
+    return count
+
+
+def timed(conn, sql, params_fn, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        conn.execute(sql, params_fn(i)).fetchall()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+QUERIES = {
+    1: {
+        "session lookup": ("SELECT id, time_out FROM attendance WHERE name=? AND date=? ORDER BY id DESC LIMIT 1",
+                           lambda i, day, n: (f"person{i % n}", day)),
+        "present count": ("SELECT COUNT(DISTINCT name) FROM attendance WHERE date=?", lambda i, day, n: (day,)),
+        "day log": ("SELECT name, email, designation, date, time_in, time_out FROM attendance WHERE date=?",
+                    lambda i, day, n: (day,)),
+    },
+    2: {
+        "session lookup": ("SELECT id, ts_out FROM attendance WHERE employee_id=? AND date=? ORDER BY id DESC LIMIT 1",
+                           lambda i, day, n: (i % n + 1, day)),
+        "present count": ("SELECT COUNT(DISTINCT employee_id) FROM attendance WHERE date=?", lambda i, day, n: (day,)),
+        "day log": ("SELECT name, email, designation, date, time_in, time_out FROM attendance_log WHERE date=? ORDER BY ts_in",
+                    lambda i, day, n: (day,)),
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=300)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    day = (date.today() - timedelta(days=1)).isoformat()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "attendance.db")
+        init_db(path, target=1)
+        count = fill_v1(path, args.people, args.years)
+        print(f"{count:,} attendance rows, {args.people} employees, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        results = {}
+        conn = sqlite3.connect(path)
+        for label, (sql, params) in QUERIES[1].items():
+            results[label] = [timed(conn, sql, lambda i: params(i, day, args.people), args.rounds)]
+
+        start = time.perf_counter()
+        migrate(conn, SCHEMA_VERSION)
+        print(f"migration v1 -> v{SCHEMA_VERSION}: {time.perf_counter() - start:.2f} s")
+
+        for label, (sql, params) in QUERIES[2].items():
+            results[label].append(timed(conn, sql, lambda i: params(i, day, args.people), args.rounds))
+        conn.close()
+
+    print(f"{'query':<16} {'v1 ms':>10} {'v2 ms':>10} {'speedup':>9}")
+    for label, (v1, v2) in results.items():
+        print(f"{label:<16} {v1:>10.3f} {v2:>10.3f} {v1 / v2:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Dashboard preview rendering benchmark at 720p and 1080p.
+
+    python -m benchmarks.render [--frames 200] [--label 1180x640]
+
+Compares the old update_camera path (frame.copy(), overlay at full resolution,
+BGR -> RGB, Image.fromarray, a new ImageTk.PhotoImage per frame that Tk then clips
+to the label) with FrameRenderer (resize into a reused buffer at label size,
+overlay in place, one conversion, PhotoImage.paste). Frames are synthetic with a
+few faces in the overlay. Without a display the Tk step is left out of both paths.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+from attendance_rules import draw_overlay
+from render import FrameRenderer
+
+
+def synthetic_frames(width, height, count, seed=0, distinct=8):
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    # A few shifted copies of the same noise, cycled, so memory stays small at 1080p
+    variants = [np.roll(base, i * 7, axis=1) for i in range(distinct)]
+    return [variants[i % distinct] for i in range(count)]
+
+
+def synthetic_overlay(width, height):
+    boxes = [(height // 3, width // 3 + 120, height // 3 + 120, width // 3),
+             (height // 2, width // 2 + 90, height // 2 + 90, width // 2),
+             (height // 4, width - 200, height // 4 + 100, width - 300)]
+    return [(state, f"Person {i}", box) for i, (state, box) in enumerate(zip(("seen", "zone", "cooldown"), boxes))]
+
+
+def old_path(frames, overlay, root):
+    start = time.perf_counter()
+    for frame in frames:
+        display = frame.copy()
+        draw_overlay(display, overlay)
+        img = Image.fromarray(cv2.cvtColor(display, cv2.COLOR_BGR2RGB))
+        if root:
+            ImageTk.PhotoImage(image=img)
+    return (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def new_path(frames, overlay, root, label_size):
+    renderer = FrameRenderer(max_fps=0)
+    start = time.perf_counter()
+    for frame in frames:
+        rgb = renderer.compose(frame, overlay, label_size)
+        if root:
+            renderer.to_photo(rgb)
+        else:
+            Image.fromarray(rgb)
+    return (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--label", default="1180x640", help="preview label size, WIDTHxHEIGHT")
+    args = parser.parse_args()
+    label_size = tuple(int(v) for v in args.label.split("x"))
+
+    root = None
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+    except Exception as e:
+        print(f"No display ({e}); timing without the Tk image step")
+
+    print(f"{'input':<10} {'old ms/frame':>13} {'new ms/frame':>13} {'speedup':>8}")
+    for name, (w, h) in (("720p", (1280, 720)), ("1080p", (1920, 1080))):
+        frames = synthetic_frames(w, h, args.frames)
+        overlay = synthetic_overlay(w, h)
+        old_ms = old_path(frames, overlay, root)
+        new_ms = new_path(frames, overlay, root, label_size)
+        print(f"{name:<10} {old_ms:>13.2f} {new_ms:>13.2f} {old_ms / new_ms:>7.1f}x")
+    if root:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    main()
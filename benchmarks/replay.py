@@ -0,0 +1,445 @@
+"""
+Camera-free replay benchmark of the recognition and attendance pipeline.
+
+    python -m benchmarks.replay [clip.mp4 ...] [--people 1000] [--days 30] [--seconds 60]
+                                [--out results.json] [--compare previous.json]
+
+Builds a temporary attendance.db with a synthetic gallery (one template per
+person) and `days` of attendance history, or copies --db, and loads the gallery
+through GalleryCache as the dashboard does. Every frame then goes through what
+update_camera and the recognition workers do: FaceTracker (or recognize_frame
+in "every" mode) with a DetectionPolicy, the gallery snapshot, CameraState's
+zone / cooldown rules and db_action into AttendanceWriter, with timestamps
+taken from the frame number so cooldowns and check-out holds are reproducible.
+
+Without clips the frames are synthetic: people walk past in lanes, the ones in
+the middle lane stop in the check-out zone, and every face is drawn as a box
+whose colour encodes who it is. MarkerProfile stands in for dlib and reads those
+boxes back, so detection and encoding cost next to nothing and the run measures
+everything around them; runs on recorded clips use the real detector.
+
+Reports FPS over the timed part of each frame (rendering or decoding the frame is
+not included), per-stage latency percentiles, attendance writes per second and
+peak memory, and writes everything to JSON. --compare prints the change against
+an earlier JSON file, e.g. one from the previous commit.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import cv2
+import numpy as np
+
+from attendance_rules import CameraState, CHECKOUT_HOLD_SECONDS
+from attendance_writer import AttendanceWriter
+from database import init_db
+from detection import DetectionPolicy, DetectionProfile
+from gallery import FaceGallery
+from gallery_cache import GalleryCache
+from matcher import ENCODING_SIZE
+from metrics import StageTimings
+from recognition import recognize_frame
+from stats import DailyStats
+from templates import gallery_rows
+from tracker import FaceTracker
+
+FORMAT = 1
+MARKER = 255            # Red value only synthetic faces use; the background stays below BACKGROUND_MAX
+BACKGROUND_MAX = 200
+LANE_GAP = 250          # Vertical distance between walking lanes, pixels
+
+
+def fill(path, people, days, seed=0):
+    """Synthetic employees with one template each, plus `days` of history before today."""
+    rng = np.random.default_rng(seed)
+    history = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO employees (name, email, phone, designation) VALUES (?,?,?,?)",
+                     [(f"person{i}", f"p{i}@example.com", f"555{i:07d}", "Staff") for i in range(people)])
+    ids = [r[0] for r in conn.execute("SELECT id FROM employees ORDER BY id")]
+    conn.executemany("INSERT INTO face_templates (employee_id, encoding) VALUES (?, ?)",
+                     [(emp_id, rng.normal(0, 0.09, ENCODING_SIZE).tobytes()) for emp_id in ids])
+    conn.execute("UPDATE employees SET encoding = (SELECT encoding FROM face_templates t WHERE t.employee_id = employees.id)")
+    start = date.today() - timedelta(days=days)
+
+    def rows():
+        for d in range(days):
+            day = start + timedelta(days=d)
+            midnight = datetime(day.year, day.month, day.day).timestamp()
+            for emp_id in ids:
+                if history.random() < 0.9:
+                    ts_in = int(midnight + 8 * 3600 + history.randrange(7200))
+                    yield emp_id, day.isoformat(), ts_in, ts_in + 8 * 3600 + history.randrange(3600)
+
+    conn.executemany("INSERT INTO attendance (employee_id, date, ts_in, ts_out) VALUES (?,?,?,?)", rows())
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+    conn.close()
+    return count
+
+
+class SyntheticScene:
+    """
+    People walking past the camera, fully determined by `seed`.
+
+    Visitors arrive every `arrival_s` seconds (with jitter) into one of three lanes;
+    middle-lane visitors stop in the check-out zone for a little longer than
+    CHECKOUT_HOLD_SECONDS. They are drawn from the first `crowd` employees, so the
+    same people come back (and hit their cooldown); `unknown_rate` are strangers.
+    Visitor i is drawn as a filled box of colour (B, G, R) = (i & 255, i >> 8, MARKER).
+    """
+
+    def __init__(self, emp_ids, width=1280, height=720, fps=15, seconds=60, face_px=120, arrival_s=1.5,
+                 crowd=50, unknown_rate=0.1, seed=0):
+        rng = random.Random(seed)
+        self.width, self.height, self.fps, self.face_px = width, height, fps, face_px
+        self.frames = int(seconds * fps)
+        self.lanes = [height // 2, height // 2 - LANE_GAP, height // 2 + LANE_GAP]
+        self.visitors = [None]      # marker -> (start frame, lane, walk frames, hold frames, employee id)
+        crowd = emp_ids[:crowd]
+        lane_free = [0] * len(self.lanes)
+        arrival = 0.0
+        while len(self.visitors) < 65536:
+            arrival += arrival_s * fps * rng.uniform(0.5, 1.5)
+            lane = 0 if rng.random() < 0.4 else rng.randrange(1, len(self.lanes))
+            start = max(int(arrival), lane_free[lane])
+            if start >= self.frames:
+                break
+            walk = int(fps * rng.uniform(3.0, 5.0))
+            hold = int(fps * (CHECKOUT_HOLD_SECONDS + 1.0)) if lane == 0 else 0
+            emp_id = None if rng.random() < unknown_rate or not crowd else rng.choice(crowd)
+            self.visitors.append((start, lane, walk, hold, emp_id))
+            lane_free[lane] = start + walk + hold + int(fps * 0.5)
+        rng_bg = np.random.default_rng(seed)
+        self.backgrounds = [rng_bg.integers(0, BACKGROUND_MAX, size=(height, width, 3), dtype=np.uint8)
+                            for _ in range(4)]
+
+    def identity(self, marker):
+        return self.visitors[marker][4] if 0 < marker < len(self.visitors) else None
+
+    def faces(self, frame_no):
+        """[(marker, (top, right, bottom, left))] of everyone in view."""
+        faces, half = [], self.face_px // 2
+        for marker in range(1, len(self.visitors)):
+            start, lane, walk, hold, _ = self.visitors[marker]
+            t = frame_no - start
+            if t < 0 or t >= walk + hold:
+                continue
+            # Walk to the middle, wait there for `hold` frames, walk on
+            span = self.width + self.face_px
+            if t < walk // 2:
+                cx = -half + span * t / walk
+            elif t < walk // 2 + hold:
+                cx = self.width / 2
+            else:
+                cx = -half + span * (t - hold) / walk
+            cx, cy = int(cx), self.lanes[lane]
+            box = (cy - half, min(self.width, cx + half), cy + half, max(0, cx - half))
+            if box[1] - box[3] >= 8:
+                faces.append((marker, box))
+        return faces
+
+    def render(self, frame_no):
+        frame = self.backgrounds[frame_no % len(self.backgrounds)].copy()
+        for marker, (top, right, bottom, left) in self.faces(frame_no):
+            frame[top:bottom, left:right] = (marker & 255, marker >> 8, MARKER)
+        return frame
+
+    def __iter__(self):
+        for frame_no in range(self.frames):
+            yield self.render(frame_no)
+
+
+class MarkerProfile(DetectionProfile):
+    """
+    Stand-in for dlib on SyntheticScene frames: locate() finds the colour-coded boxes
+    in the (shrunk, possibly cropped) detection image and encode() returns the
+    visitor's gallery encoding plus a little noise, or a random one for strangers.
+    """
+
+    def __init__(self, scene, encodings, noise=0.02, seed=0):
+        super().__init__()
+        self.scene = scene
+        self.encodings = encodings      # employee id -> encoding
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+
+    def locate(self, rgb):
+        mask = (rgb[:, :, 0] == MARKER).astype(np.uint8)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h, area in stats[1:] if area >= 4]
+
+    def encode(self, rgb, locs):
+        encodings = []
+        for top, right, bottom, left in locs:
+            _, g, b = rgb[min(rgb.shape[0] - 1, (top + bottom) // 2), min(rgb.shape[1] - 1, (left + right) // 2)]
+            known = self.encodings.get(self.scene.identity(int(g) << 8 | int(b)))
+            base = known if known is not None else self.rng.normal(0, 0.09, ENCODING_SIZE)
+            encodings.append(base + self.rng.normal(0, self.noise, ENCODING_SIZE))
+        return encodings
+
+
+def clip_frames(path):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 15
+
+    def frames():
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+        cap.release()
+    return frames(), fps
+
+
+def replay(frames, fps, snapshot, db_path, policy, detect_every, start_ts):
+    """One camera's worth of update_camera + recognition worker, single-threaded and in order."""
+    timings = StageTimings()
+    writer = AttendanceWriter(db_path).start()
+    stats = DailyStats(db_path)
+    stats.reconcile()
+    state = CameraState()
+    tracker = FaceTracker(detect_every, policy) if detect_every else None
+    clock = {"now": None}
+    counts = Counter()
+
+    def db_action(emp_id, action):
+        # Same calls as VisionGuardPro.db_action, with the frame's timestamp
+        with timings.stage("db_action"):
+            if action == "check_in":
+                updated = writer.check_in(emp_id, clock["now"])
+            else:
+                updated = writer.check_out(emp_id, clock["now"])
+            if updated:
+                counts[action] += 1
+                if action == "check_in":
+                    stats.record_check_in(emp_id, clock["now"])
+
+    busy = 0.0
+    frame_no = 0
+    for frame_no, frame in enumerate(frames, start=1):
+        ts = start_ts + frame_no / fps
+        clock["now"] = datetime.fromtimestamp(ts)
+        start = time.perf_counter()
+        with timings.stage("frame"):
+            with timings.stage("recognize"):
+                if tracker:
+                    faces = tracker.process(frame, snapshot)
+                else:
+                    faces = recognize_frame(frame, snapshot, policy)
+            with timings.stage("rules"):
+                state.apply(ts, frame.shape[:2], faces, db_action)
+        busy += time.perf_counter() - start
+        counts["faces"] += len(faces)
+        counts["recognized"] += sum(1 for f in faces if f[0] is not None)
+    writer.close()
+
+    stages = {**policy.timings.as_dict(), **timings.as_dict()}
+    commit = writer.timings.as_dict().get("commit", {})
+    commit_s = commit.get("ms", 0) * commit.get("calls", 0) / 1000
+    return {
+        "frames": frame_no,
+        "fps": round(frame_no / busy, 1) if busy else 0.0,
+        "final_scale": round(policy.scale, 3),
+        "encodes": tracker.encodes if tracker else None,
+        "faces": counts["faces"],
+        "recognized": counts["recognized"],
+        "check_ins": counts["check_in"],
+        "check_outs": counts["check_out"],
+        "stages": stages,
+        "db": {"events": writer.events_written, "commits": writer.commits,
+               "ops_per_s": round(writer.events_written / commit_s) if commit_s else None,
+               "commit": commit},
+    }
+
+
+def db_burst(db_path, emp_ids, events, start_ts):
+    """Attendance writes alone: `events` check-in / check-out transitions through AttendanceWriter."""
+    start = time.perf_counter()
+    writer = AttendanceWriter(db_path).start()
+    seed_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for i in range(events // 2):
+        emp_id = emp_ids[i % len(emp_ids)]
+        writer.check_in(emp_id, datetime.fromtimestamp(start_ts + i))
+        writer.check_out(emp_id, datetime.fromtimestamp(start_ts + i + 0.5))
+    writer.close()
+    elapsed = time.perf_counter() - start
+    stats = DailyStats(db_path)
+    start = time.perf_counter()
+    stats.reconcile()
+    reconcile_ms = (time.perf_counter() - start) * 1000
+    return {"events": writer.events_written, "commits": writer.commits,
+            "ops_per_s": round(writer.events_written / elapsed) if elapsed else None,
+            "commit": writer.timings.as_dict().get("commit", {}),
+            "writer_start_ms": round(seed_ms, 2), "stats_reconcile_ms": round(reconcile_ms, 2)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:     # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def compare(results, path):
+    with open(path) as f:
+        previous = json.load(f)
+    before = {(r["source"], r["mode"]): r for r in previous.get("runs", [])}
+    print(f"\ncompared with {path} (revision {previous.get('revision')})")
+    print(f"{'source':<24} {'mode':<8} {'fps':>16} {'frame p95 ms':>20} {'db ops/s':>18}")
+
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return f"{'-':>6} -> {new if new is not None else '-':>6}"
+        return f"{old:>6} -> {new:>6} ({(new - old) / old * 100:+.0f}%)"
+    for run in results["runs"]:
+        old = before.get((run["source"], run["mode"]))
+        if not old:
+            continue
+        print(f"{run['source'][:24]:<24} {run['mode']:<8} {change(old['fps'], run['fps']):>16} "
+              f"{change(old['stages']['frame']['p95_ms'], run['stages']['frame']['p95_ms']):>20} "
+              f"{change(old['db']['ops_per_s'], run['db']['ops_per_s']):>18}")
+    old, new = previous.get("db_burst", {}).get("ops_per_s"), results["db_burst"]["ops_per_s"]
+    print(f"{'db burst':<33} {'':>16} {'':>20} {change(old, new):>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("clips", nargs="*", help="recorded clips (default: a synthetic scene)")
+    parser.add_argument("--db", help="copy this database instead of generating one")
+    parser.add_argument("--people", type=int, default=1000, help="synthetic gallery size")
+    parser.add_argument("--days", type=int, default=30, help="days of synthetic attendance history")
+    parser.add_argument("--seconds", type=float, default=60, help="length of the synthetic scene")
+    parser.add_argument("--fps", type=int, default=15, help="frame rate of the synthetic scene")
+    parser.add_argument("--size", default="1280x720", help="synthetic frame size, WIDTHxHEIGHT")
+    parser.add_argument("--crowd", type=int, default=50, help="distinct people walking past")
+    parser.add_argument("--unknown-rate", type=float, default=0.1)
+    parser.add_argument("--modes", nargs="+", default=["tracked", "every"], choices=["tracked", "every"])
+    parser.add_argument("--detect-every", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--db-events", type=int, default=10000, help="writes in the attendance-only run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report peak Python allocations (tracemalloc; slows every run down)")
+    parser.add_argument("--out", help="JSON results file (default: replay-<revision>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to compare with")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+    revision = git_revision()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        # 1. Database and gallery, loaded the way the dashboard loads them
+        base = os.path.join(tmp, "base.db")
+        start = time.perf_counter()
+        if args.db:
+            shutil.copy(args.db, base)
+            init_db(base)
+            history = sqlite3.connect(base).execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+        else:
+            init_db(base)
+            history = fill(base, args.people, args.days, args.seed)
+        fill_s = time.perf_counter() - start
+        gallery = FaceGallery()
+        start = time.perf_counter()
+        load_status = GalleryCache(base, os.path.join(tmp, "gallery_cache")).load_into(gallery)
+        load_ms = (time.perf_counter() - start) * 1000
+        snapshot = gallery.snapshot()
+        conn = sqlite3.connect(base)
+        emp_ids = [r[0] for r in conn.execute("SELECT id FROM employees ORDER BY id")]
+        conn.close()
+        setup = {"people": len(gallery), "history_rows": history, "fill_s": round(fill_s, 2),
+                 "gallery_load_ms": round(load_ms, 1), "gallery_load": load_status}
+        print(f"{len(gallery)} people, {history:,} attendance rows; gallery loaded in {load_ms:.0f} ms ({load_status})")
+
+        # 2. Replays, each against a fresh copy of the database
+        start_ts = datetime.combine(date.today(), datetime.min.time()).timestamp() + 9 * 3600
+        runs = []
+        sources = args.clips or ["synthetic"]
+        for source in sources:
+            for mode in args.modes:
+                db_path = os.path.join(tmp, f"run{len(runs)}.db")
+                shutil.copy(base, db_path)
+                if source == "synthetic":
+                    scene = SyntheticScene(emp_ids, width, height, args.fps, args.seconds, crowd=args.crowd,
+                                           unknown_rate=args.unknown_rate, seed=args.seed)
+                    conn = sqlite3.connect(base)
+                    encodings = {}
+                    for emp_id in {v[4] for v in scene.visitors[1:] if v[4] is not None}:
+                        rows = gallery_rows(conn, emp_id)
+                        if rows:
+                            encodings[emp_id] = np.frombuffer(rows[0][2], dtype=np.float64)
+                    conn.close()
+                    profile = MarkerProfile(scene, encodings, seed=args.seed)
+                    frames, fps = iter(scene), args.fps
+                else:
+                    profile = "fast"
+                    frames, fps = clip_frames(source)
+                if mode == "tracked":
+                    policy = DetectionPolicy(profile, budget_ms=args.budget_ms)
+                else:
+                    policy = DetectionPolicy(profile, adaptive=False, roi=False)
+                result = replay(frames, fps, snapshot, db_path, policy,
+                                args.detect_every if mode == "tracked" else 0, start_ts)
+                runs.append({"source": os.path.basename(source), "mode": mode, **result})
+                s = result["stages"]
+                print(f"{os.path.basename(source)[:24]:<24} {mode:<8} {result['frames']:>6} frames "
+                      f"{result['fps']:>8.1f} fps  frame p50/p95/p99 {s['frame']['p50_ms']:.2f}/"
+                      f"{s['frame']['p95_ms']:.2f}/{s['frame']['p99_ms']:.2f} ms  "
+                      f"in/out {result['check_ins']}/{result['check_outs']}  db {result['db']['ops_per_s']} ops/s")
+                print("    " + " ".join(f"{name}={t['p95_ms']:.2f}" for name, t in sorted(s.items()))
+                      + " (p95 ms)")
+
+        # 3. Attendance writes on their own
+        db_path = os.path.join(tmp, "burst.db")
+        shutil.copy(base, db_path)
+        burst = db_burst(db_path, emp_ids, args.db_events, start_ts)
+        print(f"db burst: {burst['events']} writes in {burst['commits']} commits, {burst['ops_per_s']} ops/s, "
+              f"writer start {burst['writer_start_ms']} ms, stats reconcile {burst['stats_reconcile_ms']} ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    memory = {"max_rss_mb": max_rss_mb(), "peak_python_mb": None}
+    if args.trace_memory:
+        memory["peak_python_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+        tracemalloc.stop()
+    print(f"peak memory: {memory['max_rss_mb']} MB RSS"
+          + (f", {memory['peak_python_mb']} MB Python" if args.trace_memory else ""))
+
+    results = {"format": FORMAT, "revision": revision, "created": datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(), "platform": platform.platform(),
+               "args": vars(args), "setup": setup, "runs": runs, "db_burst": burst, "memory": memory}
+    out = args.out or f"replay-{revision or 'local'}.json"
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
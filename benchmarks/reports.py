@@ -0,0 +1,78 @@
+"""
+Report export benchmark over millions of synthetic attendance rows.
+
+    python -m benchmarks.reports [--people 2000] [--days 1000]
+
+Fills a temporary database (about people x days x 0.9 sessions), then runs the
+streaming report to CSV, summary CSV and the columnar format and reports rows/sec,
+output sizes and peak Python memory.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from database import init_db
+from reports import run_report
+
+
+def fill(path, people, days, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO employees (name, email, phone, designation) VALUES (?,?,?,?)",
+                     [(f"person{i}", f"p{i}@example.com", f"555{i:07d}", rng.choice(["Staff", "Engineer", "Manager"]))
+                      for i in range(people)])
+    start = date.today() - timedelta(days=days)
+
+    def rows():
+        for d in range(days):
+            day = start + timedelta(days=d)
+            midnight = datetime(day.year, day.month, day.day).timestamp()
+            for emp in range(1, people + 1):
+                if rng.random() < 0.9:
+                    ts_in = int(midnight + 8 * 3600 + rng.randrange(7200))
+                    ts_out = ts_in + 8 * 3600 + rng.randrange(3600) if rng.random() < 0.97 else None
+                    yield emp, day.isoformat(), ts_in, ts_out
+
+    conn.executemany("INSERT INTO attendance (employee_id, date, ts_in, ts_out) VALUES (?,?,?,?)", rows())
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+    conn.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "attendance.db")
+        init_db(path)
+        start = time.perf_counter()
+        count = fill(path, args.people, args.days)
+        print(f"generated {count:,} rows in {time.perf_counter() - start:.1f} s")
+
+        out = {name: os.path.join(tmp, name) for name in ("daily.csv", "summary.csv", "daily.vgc")}
+        conn = sqlite3.connect(path)
+        tracemalloc.start()
+        start = time.perf_counter()
+        days, employees = run_report(conn, "0000-01-01", "9999-12-31", out["daily.csv"], out["summary.csv"], out["daily.vgc"])
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        conn.close()
+
+        print(f"report: {count:,} rows -> {days:,} daily rows, {employees} summaries in {elapsed:.1f} s "
+              f"({count / elapsed:,.0f} rows/s), peak Python memory {peak / 1e6:.1f} MB")
+        for name, p in out.items():
+            print(f"  {name:<12} {os.path.getsize(p) / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
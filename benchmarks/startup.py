@@ -0,0 +1,78 @@
+"""
+Startup / gallery load benchmark, profile images inline (v2) vs. image table (v3).
+
+    python -m benchmarks.startup [--people 5000] [--image-kb 60] [--rounds 5]
+
+Fills a v2 database with employees whose rows carry a JPEG-sized image BLOB,
+times the queries run at startup and on the Manage Staff tab, migrates to v3
+and times them again.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from database import init_db, migrate, SCHEMA_VERSION
+from gallery import FaceGallery
+
+
+def fill(path, people, image_kb, seed=0):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    for start in range(0, people, 500):
+        rows = []
+        for i in range(start, min(people, start + 500)):
+            enc = rng.normal(0, 0.09, 128).tobytes()
+            image = b'\xff\xd8' + rng.bytes(image_kb * 1024)
+            rows.append((f"person{i}", f"p{i}@example.com", f"555{i:07d}", "Staff", enc, image))
+        conn.executemany("INSERT INTO employees (name, email, phone, designation, encoding, image) VALUES (?,?,?,?,?,?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def measure(path, rounds):
+    """Returns (gallery load ms, staff list ms), best of `rounds`."""
+    gallery_ms, staff_ms = [], []
+    for _ in range(rounds):
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        FaceGallery().load(conn.execute("SELECT id, name, encoding FROM employees").fetchall())
+        gallery_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        conn.execute("SELECT id, name, email, phone, designation FROM employees").fetchall()
+        staff_ms.append((time.perf_counter() - start) * 1000)
+        conn.close()
+    return min(gallery_ms), min(staff_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=5000)
+    parser.add_argument("--image-kb", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "attendance.db")
+        init_db(path, target=2)
+        fill(path, args.people, args.image_kb)
+        before = measure(path, args.rounds)
+
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        migrate(conn, SCHEMA_VERSION)
+        migration_s = time.perf_counter() - start
+        conn.close()
+        after = measure(path, args.rounds)
+
+    print(f"{args.people} employees with {args.image_kb} KB photos, migration took {migration_s:.2f} s")
+    print(f"{'':<16} {'inline ms':>10} {'separate ms':>12}")
+    print(f"{'gallery load':<16} {before[0]:>10.1f} {after[0]:>12.1f}")
+    print(f"{'staff list':<16} {before[1]:>10.1f} {after[1]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
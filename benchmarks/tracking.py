@@ -0,0 +1,88 @@
+"""
+Track-then-recognize benchmark on recorded clips.
+
+    python -m benchmarks.tracking clip1.mp4 [clip2.mp4 ...] [--db data/attendance.db] [--detect-every 5]
+
+Processes every frame of each clip as fast as possible: with detect + encode on
+every frame (the old update_camera path), through FaceTracker at the fixed default
+scale, and through FaceTracker with the adaptive scale and ROI detection. Reports
+end-to-end FPS, encoder calls per second and the average time of each stage. Faces are matched against the
+gallery in --db when it exists, otherwise against an empty gallery.
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import cv2
+
+from database import DB_PATH
+from gallery import FaceGallery
+from recognition import recognize_frame
+from tracker import FaceTracker
+from detection import DetectionPolicy
+from templates import gallery_rows
+
+
+def load_snapshot(db_path):
+    gallery = FaceGallery()
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        gallery.load(gallery_rows(conn))
+        conn.close()
+    return gallery.snapshot()
+
+
+def frames(path):
+    cap = cv2.VideoCapture(path)
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+    cap.release()
+
+
+def run_baseline(path, snapshot):
+    policy = DetectionPolicy(adaptive=False, roi=False)
+    count = encodes = 0
+    start = time.perf_counter()
+    for frame in frames(path):
+        encodes += len(recognize_frame(frame, snapshot, policy))
+        count += 1
+    return count, encodes, time.perf_counter() - start, policy
+
+
+def run_tracked(path, snapshot, detect_every, policy):
+    tracker = FaceTracker(detect_every, policy)
+    start = time.perf_counter()
+    for frame in frames(path):
+        tracker.process(frame, snapshot)
+    return tracker.frames, tracker.encodes, time.perf_counter() - start, policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("clips", nargs="+")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--detect-every", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    snapshot = load_snapshot(args.db)
+
+    print(f"{'clip':<30} {'mode':<9} {'frames':>7} {'fps':>8} {'encodes':>8} {'enc/s':>8} {'scale':>6}  stages (avg ms)")
+    for clip in args.clips:
+        runs = (("every", lambda: run_baseline(clip, snapshot)),
+                ("tracked", lambda: run_tracked(clip, snapshot, args.detect_every,
+                                                DetectionPolicy(adaptive=False, roi=False))),
+                ("adaptive", lambda: run_tracked(clip, snapshot, args.detect_every,
+                                                 DetectionPolicy(budget_ms=args.budget_ms))))
+        for mode, run in runs:
+            count, encodes, elapsed, policy = run()
+            stages = " ".join(f"{name}={t['ms']:.1f}" for name, t in sorted(policy.timings.as_dict().items()))
+            print(f"{os.path.basename(clip)[:30]:<30} {mode:<9} {count:>7} {count / elapsed:>8.1f} "
+                  f"{encodes:>8} {encodes / elapsed:>8.1f} {policy.scale:>6.3f}  {stages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Bulk enrollment from a CSV and a folder of photos.
+
+    python bulk_import.py people.csv photos/ [--workers 8] [--jitters 5] [--dry-run]
+
+The CSV needs name, email, phone and designation columns and may have a photo
+column (a file or a sub-folder of photos/, relative to it). Without one, the photo
+is looked up by file or folder name: the email, the name (spaces or underscores)
+or the phone number. A folder gives one face template per usable photo.
+
+Rows are validated like register_user_gui, checked for duplicates against the CSV
+itself and against the database in one set-based query, encoded in a process
+pool, and inserted in a single transaction. Usable encodings are appended to a
+checkpoint file as they finish, so an interrupted run resumes where it stopped; rows
+without a photo or face are retried every run. The checkpoint is removed once
+everything is committed.
+"""
+import argparse
+import base64
+import csv
+import json
+import os
+import sqlite3
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from database import DB_PATH, init_db
+from detection import DetectionPolicy, DetectionProfile
+from image_store import make_thumbnail, store_image_bytes
+from templates import save_templates, centroid, MAX_TEMPLATES
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+FIELDS = ("name", "email", "phone", "designation")
+DETECT_MAX_SIDE = 1024      # Photos are shrunk to this for detection; encoding uses full resolution
+
+_policy = None              # Per worker process
+
+
+def read_rows(csv_path):
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        for row_no, row in enumerate(reader, start=2):     # Line numbers as shown in a spreadsheet
+            yield row_no, {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+
+
+def row_key(row):
+    return f"{row['name']}|{row['email']}|{row['phone']}"
+
+
+def photo_index(photo_dir):
+    """File / folder stem (lower case) -> path, built once instead of probing per person."""
+    index = {}
+    for entry in os.scandir(photo_dir):
+        stem, ext = os.path.splitext(entry.name)
+        if entry.is_dir() or ext.lower() in IMAGE_EXTENSIONS:
+            index.setdefault((entry.name if entry.is_dir() else stem).lower(), entry.path)
+    return index
+
+
+def find_photos(row, photo_dir, index):
+    if row.get("photo"):
+        path = os.path.join(photo_dir, row["photo"])
+    else:
+        candidates = (row["email"], row["name"], row["name"].replace(" ", "_"), row["phone"])
+        path = next((index[c.lower()] for c in candidates if c and c.lower() in index), None)
+    if path is None or not os.path.exists(path):
+        return []
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return [path]
+
+
+def photo_bytes(path):
+    """JPEG bytes for the profile image: the file itself if it already is one."""
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        with open(path, 'rb') as f:
+            return f.read()
+    success, buffer = cv2.imencode('.jpg', cv2.imread(path))
+    return buffer.tobytes() if success else None
+
+
+def init_worker(jitters):
+    global _policy
+    _policy = DetectionPolicy(DetectionProfile("hog", upsample=1, num_jitters=jitters), adaptive=False, roi=False)
+
+
+def encode_person(task):
+    """Worker: (key, photo paths) -> (key, status, [encoding bytes], profile photo, thumbnail)."""
+    key, paths = task
+    encodings, profile_photo, thumbnail = [], None, None
+    for path in paths[:MAX_TEMPLATES]:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        _policy.fixed_scale = min(1.0, DETECT_MAX_SIDE / max(img.shape[:2]))
+        boxes = _policy.detect(img).boxes
+        if not boxes:
+            continue
+        # Group photos sometimes have someone in the background; the largest face is the subject
+        box = max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+        encs = _policy.profile.encode(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), [box])
+        if not encs:
+            continue
+        encodings.append(encs[0].tobytes())
+        if profile_photo is None:
+            profile_photo = path
+            image = photo_bytes(path)
+            thumbnail = make_thumbnail(image) if image else None
+    if not encodings:
+        return key, "no_face" if paths else "no_photo", [], None, None
+    return key, "ok", encodings, profile_photo, thumbnail
+
+
+def load_checkpoint(path):
+    """Encodings finished by an earlier run. Only usable faces count: missing photos may have been fixed since."""
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue    # A line cut short by an interruption; that person is simply redone
+                if entry.get("status") == "ok":
+                    done[entry["key"]] = entry
+    return done
+
+
+def check_duplicates(conn, rows):
+    """
+    Returns {row_no: reason} for rows clashing with an earlier CSV row or an existing
+    employee. The database side is one join against a temp table, not a query per row.
+    """
+    clashes = {}
+    seen = {"name": set(), "email": set(), "phone": set()}
+    for row_no, row in rows:
+        for field in ("name", "email", "phone"):
+            if row[field] in seen[field]:
+                clashes[row_no] = f"duplicate {field} in CSV"
+                break
+        else:
+            for field in ("name", "email", "phone"):
+                seen[field].add(row[field])
+
+    conn.execute("CREATE TEMP TABLE import_rows (row_no INTEGER PRIMARY KEY, name TEXT, email TEXT, phone TEXT)")
+    conn.executemany("INSERT INTO import_rows VALUES (?, ?, ?, ?)",
+                     [(row_no, r["name"], r["email"], r["phone"]) for row_no, r in rows])
+    for row_no, field in conn.execute("""
+            SELECT r.row_no, CASE WHEN e.name = r.name THEN 'name' WHEN e.email = r.email THEN 'email' ELSE 'phone' END
+            FROM import_rows r JOIN employees e ON e.name = r.name OR e.email = r.email OR e.phone = r.phone"""):
+        clashes.setdefault(row_no, f"{field} already registered")
+    conn.execute("DROP TABLE import_rows")
+    return clashes
+
+
+def run(csv_path, photo_dir, db_path=DB_PATH, workers=None, jitters=5, checkpoint=None, dry_run=False):
+    start = time.perf_counter()
+    checkpoint = checkpoint or csv_path + ".checkpoint"
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+
+    # 1. Validation: every field is required, as in the registration form
+    rows, problems = [], []
+    for row_no, row in read_rows(csv_path):
+        missing = [f for f in FIELDS if not row.get(f)]
+        if missing:
+            problems.append((row_no, f"missing {', '.join(missing)}"))
+        else:
+            rows.append((row_no, row))
+
+    # 2. Duplicates, set-based
+    clashes = check_duplicates(conn, rows)
+    problems += sorted(clashes.items())
+    rows = [(row_no, row) for row_no, row in rows if row_no not in clashes]
+
+    # 3. Encodings in a process pool, resuming from the checkpoint
+    done = load_checkpoint(checkpoint)
+    index = photo_index(photo_dir)
+    tasks = [(row_key(row), find_photos(row, photo_dir, index)) for _, row in rows if row_key(row) not in done]
+    if done:
+        print(f"Resuming: {len(done)} people already encoded, {len(tasks)} to go")
+    encode_start = time.perf_counter()
+    next_report = encode_start + 2.0
+    with open(checkpoint, "a") as log, Pool(workers, initializer=init_worker, initargs=(jitters,)) as pool:
+        for n, (key, status, encodings, photo, thumbnail) in enumerate(
+                pool.imap_unordered(encode_person, tasks, chunksize=4), start=1):
+            entry = {"key": key, "status": status, "photo": photo,
+                     "encodings": [base64.b64encode(e).decode() for e in encodings],
+                     "thumbnail": base64.b64encode(thumbnail).decode() if thumbnail else None}
+            if status == "ok":
+                log.write(json.dumps(entry) + "\n")
+            done[key] = entry
+            now = time.perf_counter()
+            if now >= next_report or n == len(tasks):
+                log.flush()
+                rate = n / (now - encode_start) * 60
+                print(f"encoded {n}/{len(tasks)} ({rate:.0f} people/min)")
+                next_report = now + 2.0
+
+    # 4. One transaction for everyone with a usable face
+    imported = 0
+    for row_no, row in rows:
+        entry = done[row_key(row)]
+        if entry["status"] != "ok":
+            problems.append((row_no, "no photo found" if entry["status"] == "no_photo" else "no face in photo(s)"))
+    ready = [(row_no, row, done[row_key(row)]) for row_no, row in rows if done[row_key(row)]["status"] == "ok"]
+    if not dry_run and ready:
+        cur = conn.cursor()
+        try:
+            with conn:
+                for n, (row_no, row, entry) in enumerate(ready, start=1):
+                    encodings = [np.frombuffer(base64.b64decode(e), dtype=np.float64) for e in entry["encodings"]]
+                    image = photo_bytes(entry["photo"])
+                    thumbnail = base64.b64decode(entry["thumbnail"]) if entry["thumbnail"] else None
+                    image_hash = store_image_bytes(cur, image, thumbnail) if image else None
+                    cur.execute("""INSERT INTO employees (name, email, phone, designation, encoding, image_hash)
+                                   VALUES (?, ?, ?, ?, ?, ?)""",
+                                (row["name"], row["email"], row["phone"], row["designation"],
+                                 centroid(encodings).tobytes(), image_hash))
+                    save_templates(cur, cur.lastrowid, encodings, source="import")
+                    if n % 500 == 0:
+                        print(f"inserted {n}/{len(ready)}")
+            imported = len(ready)
+            os.remove(checkpoint)
+        except sqlite3.Error as e:
+            # Nothing was written; the checkpoint keeps the encodings for the next attempt
+            print(f"Import rolled back: {e}")
+    conn.close()
+
+    elapsed = time.perf_counter() - start
+    for row_no, reason in sorted(problems):
+        print(f"line {row_no}: skipped, {reason}")
+    verb = "Would import" if dry_run else "Imported"
+    print(f"{verb} {len(ready) if dry_run else imported} people, skipped {len(problems)}, in {elapsed:.1f} s "
+          f"({(len(ready) if dry_run else imported) / elapsed * 60 if elapsed else 0:.0f} people/min)")
+    return imported, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Register many employees at once from a CSV and a photo folder.")
+    parser.add_argument("csv", help="columns: name, email, phone, designation[, photo]")
+    parser.add_argument("photos", help="folder with one photo (or one sub-folder of photos) per person")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--jitters", type=int, default=5, help="num_jitters per encoding (higher is slower but steadier)")
+    parser.add_argument("--checkpoint", help="progress file (default: <csv>.checkpoint)")
+    parser.add_argument("--dry-run", action="store_true", help="validate and encode, but insert nothing")
+    args = parser.parse_args()
+
+    init_db(args.db)
+    run(args.csv, args.photos, args.db, args.workers, args.jitters, args.checkpoint, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
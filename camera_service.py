@@ -0,0 +1,218 @@
+"""
+Recognition service for several entrance cameras in one process.
+
+    python camera_service.py --source 0 --source 1 --source rtsp://door-2/stream
+    python camera_service.py --source clip.mp4 --headless
+
+Every source gets its own capture thread; all of them share one recognition worker
+pool, one face gallery and one attendance writer. Check-in / check-out rules run per
+camera. Without --headless each camera is previewed in an OpenCV window.
+
+With --metrics-dir, stage percentiles, queue depths, FPS and drop counts are written
+there as metrics.json and metrics.prom every --metrics-every seconds;
+--profile-seconds N also writes a cProfile capture of the first N seconds.
+
+With --api URL attendance events go to api_server.py instead of this process's own
+writer. The gallery is still loaded from --db (a local copy or shared read-only file)
+and then follows the server's roster changes; automatic template enrollment is off
+because it would write to the database.
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import cv2
+
+from database import DB_PATH, init_db
+from gallery import FaceGallery
+from attendance_writer import AttendanceWriter
+from api_client import RemoteAttendance, RemoteGallerySync
+from pipeline import RecognitionPipeline, open_source
+from recognition import recognize_frame
+from tracker import FaceTracker
+from detection import DetectionPolicy, PROFILES, DETECTION_SCALE
+from metrics import Metrics, MetricsDumper
+from templates import AutoEnroller
+from gallery_cache import GalleryCache, gallery_keys
+from attendance_rules import CameraState, draw_overlay
+
+
+class CameraService:
+    def __init__(self, sources, db_path=DB_PATH, workers=None, detect_every=5, policy_options=None,
+                 auto_enroll=True, api_url=None):
+        self.db_path = db_path
+        self.api_url = api_url
+        self.gallery_sync = None
+        self.gallery = FaceGallery()
+        self.enroller = AutoEnroller(self.gallery, db_path) if auto_enroll and not api_url else None
+        self.metrics = Metrics()
+        self.attendance = RemoteAttendance(api_url) if api_url else AttendanceWriter(db_path)
+        self.attendance.register_metrics(self.metrics)
+        self.pipeline = RecognitionPipeline(self.recognize, workers or max(2, (os.cpu_count() or 2) - 1),
+                                            profiler=self.metrics.profiler)
+        self.states = {}        # camera id -> CameraState
+        self.overlays = {}      # camera id -> last overlay
+        self.trackers = {}      # camera id -> FaceTracker (empty when tracking is off)
+        self.policies = {}      # camera id -> DetectionPolicy
+        self.caps = []
+
+        for camera_id, source in enumerate(sources):
+            cap = open_source(source)
+            if not cap.isOpened():
+                print(f"Camera {camera_id}: could not open {source!r}")
+                continue
+            is_file = isinstance(source, str) and os.path.isfile(source)
+            self.pipeline.add_camera(camera_id, cap, is_file)
+            self.states[camera_id] = CameraState(camera_id)
+            # Each entrance gets its own policy: scale adapts to that camera's faces and load
+            self.policies[camera_id] = DetectionPolicy(**(policy_options or {}))
+            self.metrics.register(self.policies[camera_id].timings, component="detection", camera=camera_id)
+            self.metrics.gauge("detection_scale", lambda p=self.policies[camera_id]: p.scale, camera=camera_id)
+            if detect_every:
+                self.trackers[camera_id] = FaceTracker(detect_every, self.policies[camera_id],
+                                                       on_encoding=self.enroller.observe if self.enroller else None)
+            self.overlays[camera_id] = []
+            self.caps.append(cap)
+        self.pipeline.register_metrics(self.metrics)
+
+    def recognize(self, camera_id, frame):
+        tracker = self.trackers.get(camera_id)
+        if tracker:
+            return tracker.process(frame, self.gallery.snapshot())
+        return recognize_frame(frame, self.gallery.snapshot(), self.policies[camera_id])
+
+    def load_faces(self):
+        cache = GalleryCache(self.db_path)
+        status = cache.load_into(self.gallery)
+        print(f"Gallery: {len(self.gallery)} people ({status})")
+        if self.api_url:
+            conn = sqlite3.connect(self.db_path)
+            known = gallery_keys(conn)
+            conn.close()
+            self.gallery_sync = RemoteGallerySync(self.api_url, self.gallery, known).start()
+        else:
+            cache.watch(self.gallery)
+
+    def db_action(self, emp_id, action):
+        if action == "check_in":
+            self.attendance.check_in(emp_id)
+        else:
+            self.attendance.check_out(emp_id)
+
+    def start(self):
+        self.load_faces()
+        self.attendance.start()
+        if self.enroller:
+            self.enroller.start()
+        self.pipeline.start()
+
+    def step(self):
+        """Applies every finished recognition result; returns how many there were."""
+        results = self.pipeline.poll_results()
+        for camera_id, seq, ts, shape, faces in results:
+            self.overlays[camera_id] = self.states[camera_id].apply(ts, shape, faces, self.db_action)
+        return len(results)
+
+    def show_previews(self):
+        for camera_id in self.states:
+            packet = self.pipeline.latest_frame(camera_id)
+            if packet:
+                display = packet[2].copy()
+                draw_overlay(display, self.overlays[camera_id])
+                cv2.imshow(f"VisionGuard camera {camera_id}", display)
+        return cv2.waitKey(1) & 0xFF != ord('q')
+
+    def counters(self):
+        counters = {camera_id: stats.as_dict() for camera_id, stats in self.pipeline.stats.items()}
+        for camera_id, policy in self.policies.items():
+            counters[camera_id]["detection"] = policy.counters()
+        return counters
+
+    def print_counters(self):
+        for camera_id, c in self.counters().items():
+            print(f"camera {camera_id}: capture {c['capture_fps']:5.1f} fps | recognition {c['recognition_fps']:5.1f} fps | "
+                  f"latency {c['latency_ms']:6.1f} ms | frames {c['frames']} | dropped {c['dropped']}")
+            detection = c["detection"]
+            stages = " | ".join(f"{name} {t['ms']:.1f} ms" for name, t in sorted(detection["stages"].items()))
+            print(f"    scale {detection['scale']:.3f} | {stages}")
+
+    def run(self, headless=True, report_every=5.0, metrics_dir=None, metrics_every=10.0, profile_seconds=0):
+        self.start()
+        dumper = None
+        if metrics_dir:
+            dumper = MetricsDumper(self.metrics, metrics_dir, metrics_every)
+            dumper.start()
+            if profile_seconds:
+                self.metrics.profiler.start(profile_seconds, os.path.join(metrics_dir, "profile.prof"))
+        next_report = time.monotonic() + report_every
+        try:
+            while not self.pipeline.idle():
+                with self.metrics.profiler.section():
+                    self.step()
+                if not headless and not self.show_previews():
+                    break
+                if headless:
+                    time.sleep(0.01)
+                if time.monotonic() >= next_report:
+                    self.print_counters()
+                    next_report += report_every
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            if dumper:
+                dumper.stop()
+                self.metrics.dump(metrics_dir)
+
+    def stop(self):
+        self.pipeline.stop()
+        self.step()
+        for cap in self.caps:
+            cap.release()
+        self.attendance.close()
+        if self.enroller:
+            self.enroller.stop()
+        if self.gallery_sync:
+            self.gallery_sync.stop()
+        cv2.destroyAllWindows()
+        self.print_counters()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run face recognition attendance for several cameras.")
+    parser.add_argument("--source", action="append", required=True,
+                        help="device index, video file or stream URL (repeat for more cameras)")
+    parser.add_argument("--workers", type=int, help="recognition worker threads (default: cores - 1)")
+    parser.add_argument("--headless", action="store_true", help="no preview windows, only periodic counters")
+    parser.add_argument("--detect-every", type=int, default=5,
+                        help="run the face detector every N frames and track in between (0 = detect and encode every frame)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast", help="detector / encoder settings")
+    parser.add_argument("--scale", type=float, default=DETECTION_SCALE, help="(starting) detection scale")
+    parser.add_argument("--budget-ms", type=float, default=50.0,
+                        help="full-frame detection time the adaptive scale aims to stay under")
+    parser.add_argument("--min-face-px", type=int, default=48, help="smallest face height the detector must still see")
+    parser.add_argument("--fixed-scale", action="store_true", help="always detect at --scale")
+    parser.add_argument("--no-roi", action="store_true", help="always scan the whole frame")
+    parser.add_argument("--no-auto-enroll", action="store_true",
+                        help="do not add face templates from confident live recognitions")
+    parser.add_argument("--metrics-dir", help="write metrics.json / metrics.prom here")
+    parser.add_argument("--metrics-every", type=float, default=10.0, help="seconds between metrics dumps")
+    parser.add_argument("--profile-seconds", type=float, default=0,
+                        help="cProfile the first N seconds into --metrics-dir/profile.prof")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--api", metavar="URL", help="send attendance to this api_server.py instead of writing --db")
+    args = parser.parse_args()
+
+    policy_options = {"profile": args.profile, "scale": args.scale, "budget_ms": args.budget_ms,
+                      "min_face_px": args.min_face_px, "adaptive": not args.fixed_scale, "roi": not args.no_roi}
+    if not args.api:
+        init_db(args.db)
+    CameraService(args.source, args.db, args.workers, args.detect_every, policy_options,
+                  not args.no_auto_enroll, args.api).run(
+        headless=args.headless, metrics_dir=args.metrics_dir, metrics_every=args.metrics_every,
+        profile_seconds=args.profile_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,260 @@
 import sqlite3
 import os
+import argparse
+import hashlib
+import time
 
-def init_db():
-    if not os.path.exists('data'):
-        os.makedirs('data')
+DB_PATH = 'data/attendance.db'
 
-    conn = sqlite3.connect('data/attendance.db')
-    cursor = conn.cursor()
-    
-    # 1. Enable Foreign Key support in SQLite (required for Cascade)
-    cursor.execute("PRAGMA foreign_keys = ON")
+# Bump this and add an (upgrade, downgrade) pair to MIGRATIONS for every schema change.
+SCHEMA_VERSION = 5
 
-    # 2. Employee Table (Primary Table)
-    cursor.execute('''CREATE TABLE IF NOT EXISTS employees 
-        (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-         name TEXT UNIQUE, 
-         email TEXT UNIQUE, 
-         phone TEXT UNIQUE, 
-         designation TEXT, 
-         encoding BLOB, 
+# Read-side view with the columns the UI and reports display (v2+)
+ATTENDANCE_LOG_VIEW = '''CREATE VIEW attendance_log AS
+    SELECT a.id, a.employee_id, e.name, e.email, e.designation, a.date,
+           strftime('%H:%M:%S', a.ts_in, 'unixepoch', 'localtime') AS time_in,
+           strftime('%H:%M:%S', a.ts_out, 'unixepoch', 'localtime') AS time_out,
+           a.ts_in, a.ts_out
+    FROM attendance a JOIN employees e ON e.id = a.employee_id'''
+
+def create_v1(cursor):
+    # 1. Employee Table (Primary Table)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS employees
+        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+         name TEXT UNIQUE,
+         email TEXT UNIQUE,
+         phone TEXT UNIQUE,
+         designation TEXT,
+         encoding BLOB,
          image BLOB)''')
-    
-    # 3. Attendance Table (Child Table)
+
+    # 2. Attendance Table (Child Table)
     # References employees(name). If name is deleted in employees, it's deleted here too.
-    cursor.execute('''CREATE TABLE IF NOT EXISTS attendance 
-        (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-         name TEXT, 
-         email TEXT, 
-         designation TEXT, 
-         date TEXT, 
-         time_in TEXT, 
+    cursor.execute('''CREATE TABLE IF NOT EXISTS attendance
+        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+         name TEXT,
+         email TEXT,
+         designation TEXT,
+         date TEXT,
+         time_in TEXT,
          time_out TEXT,
          FOREIGN KEY(name) REFERENCES employees(name) ON DELETE CASCADE)''')
-    
-    conn.commit()
+
+# --- v2: attendance keyed by employee id, epoch timestamps, indexes ---
+
+def upgrade_v2(cursor):
+    # date stays as the local calendar day ('YYYY-MM-DD') so per-day lookups can use an index;
+    # ts_in / ts_out are epoch seconds. Name, email and designation now live only in employees.
+    cursor.execute('''CREATE TABLE attendance_v2
+        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+         employee_id INTEGER NOT NULL,
+         date TEXT NOT NULL,
+         ts_in INTEGER NOT NULL,
+         ts_out INTEGER,
+         FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE)''')
+    # The 'utc' modifier treats the stored local wall-clock time as local and converts it
+    cursor.execute('''INSERT INTO attendance_v2 (id, employee_id, date, ts_in, ts_out)
+        SELECT a.id, e.id, a.date,
+               CAST(strftime('%s', a.date || ' ' || a.time_in, 'utc') AS INTEGER),
+               CASE WHEN a.time_out IS NULL OR a.time_out = '' THEN NULL
+                    ELSE CAST(strftime('%s', a.date || ' ' || a.time_out, 'utc') AS INTEGER) END
+        FROM attendance a JOIN employees e ON e.name = a.name''')
+    cursor.execute("DROP TABLE attendance")
+    cursor.execute("ALTER TABLE attendance_v2 RENAME TO attendance")
+    cursor.execute("CREATE INDEX idx_attendance_employee_date ON attendance(employee_id, date)")
+    cursor.execute("CREATE INDEX idx_attendance_date ON attendance(date)")
+    cursor.execute(ATTENDANCE_LOG_VIEW)
+
+def downgrade_v2(cursor):
+    cursor.execute('''CREATE TABLE attendance_v1
+        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+         name TEXT,
+         email TEXT,
+         designation TEXT,
+         date TEXT,
+         time_in TEXT,
+         time_out TEXT,
+         FOREIGN KEY(name) REFERENCES employees(name) ON DELETE CASCADE)''')
+    cursor.execute('''INSERT INTO attendance_v1 (id, name, email, designation, date, time_in, time_out)
+        SELECT id, name, email, designation, date, time_in, time_out FROM attendance_log''')
+    cursor.execute("DROP VIEW attendance_log")
+    cursor.execute("DROP TABLE attendance")
+    cursor.execute("ALTER TABLE attendance_v1 RENAME TO attendance")
+
+# --- v3: profile images moved out of employees into a content-addressed table ---
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest() if data else None
+
+def rebuild_employees(cursor, columns_sql, select_sql):
+    """Recreates employees with new columns, keeping ids and the AUTOINCREMENT counter."""
+    cursor.execute("DROP VIEW attendance_log")
+    cursor.execute(f"CREATE TABLE employees_new ({columns_sql})")
+    cursor.execute(select_sql)
+    cursor.execute('''UPDATE sqlite_sequence SET seq =
+        (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('employees', 'employees_new'))
+        WHERE name = 'employees_new' ''')
+    cursor.execute("DROP TABLE employees")
+    cursor.execute("ALTER TABLE employees_new RENAME TO employees")
+    cursor.execute(ATTENDANCE_LOG_VIEW)
+
+def upgrade_v3(cursor):
+    # Images are keyed by the SHA-256 of the JPEG bytes. Thumbnails for migrated rows
+    # are created lazily the first time the UI shows them (see image_store.py).
+    cursor.connection.create_function("sha256", 1, sha256_hex, deterministic=True)
+    cursor.execute('''CREATE TABLE images
+        (hash TEXT PRIMARY KEY,
+         image BLOB NOT NULL,
+         thumbnail BLOB)''')
+    cursor.execute('''INSERT OR IGNORE INTO images (hash, image)
+        SELECT sha256(image), image FROM employees WHERE image IS NOT NULL''')
+    rebuild_employees(cursor, '''id INTEGER PRIMARY KEY AUTOINCREMENT,
+         name TEXT UNIQUE,
+         email TEXT UNIQUE,
+         phone TEXT UNIQUE,
+         designation TEXT,
+         encoding BLOB,
+         image_hash TEXT REFERENCES images(hash)''',
+        '''INSERT INTO employees_new (id, name, email, phone, designation, encoding, image_hash)
+           SELECT id, name, email, phone, designation, encoding, sha256(image) FROM employees''')
+
+def downgrade_v3(cursor):
+    rebuild_employees(cursor, '''id INTEGER PRIMARY KEY AUTOINCREMENT,
+         name TEXT UNIQUE,
+         email TEXT UNIQUE,
+         phone TEXT UNIQUE,
+         designation TEXT,
+         encoding BLOB,
+         image BLOB''',
+        '''INSERT INTO employees_new (id, name, email, phone, designation, encoding, image)
+           SELECT e.id, e.name, e.email, e.phone, e.designation, e.encoding, i.image
+           FROM employees e LEFT JOIN images i ON i.hash = e.image_hash''')
+    cursor.execute("DROP TABLE images")
+
+# --- v4: indexes for the paged History Logs / Manage Staff views ---
+
+def upgrade_v4(cursor):
+    # Newest-first keyset pagination walks this index; rowid breaks ties
+    cursor.execute("CREATE INDEX idx_attendance_ts_in ON attendance(ts_in)")
+    cursor.execute("CREATE INDEX idx_employees_designation ON employees(designation)")
+
+def downgrade_v4(cursor):
+    cursor.execute("DROP INDEX idx_attendance_ts_in")
+    cursor.execute("DROP INDEX idx_employees_designation")
+
+# --- v5: several face templates per employee ---
+
+def upgrade_v5(cursor):
+    # employees.encoding stays as the centroid of an employee's templates, so anything
+    # that only knows one encoding per person keeps working
+    cursor.execute('''CREATE TABLE face_templates
+        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+         employee_id INTEGER NOT NULL,
+         encoding BLOB NOT NULL,
+         quality REAL,
+         source TEXT NOT NULL DEFAULT 'enroll',
+         created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+         FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE)''')
+    cursor.execute("CREATE INDEX idx_face_templates_employee ON face_templates(employee_id)")
+    cursor.execute('''INSERT INTO face_templates (employee_id, encoding, source)
+        SELECT id, encoding, 'enroll' FROM employees WHERE encoding IS NOT NULL''')
+
+def downgrade_v5(cursor):
+    cursor.execute("DROP TABLE face_templates")
+
+MIGRATIONS = {
+    2: (upgrade_v2, downgrade_v2),
+    3: (upgrade_v3, downgrade_v3),
+    4: (upgrade_v4, downgrade_v4),
+    5: (upgrade_v5, downgrade_v5),
+}
+
+def get_version(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        # Databases created before migrations existed are v1 if they have the tables at all
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='employees'").fetchone()
+        return 1 if exists else 0
+    return version
+
+def backup_db(conn, path):
+    """Copies the database to `path`, or next to it with a timestamp if `path` exists. Returns the path used."""
+    # An earlier backup may be the only copy of data a failed migration lost; never overwrite one
+    root, ext = os.path.splitext(path)
+    n = 1
+    while os.path.exists(path):
+        path = f"{root}.{time.strftime('%Y%m%d-%H%M%S')}" + (f".{n}" if n > 1 else "") + ext
+        n += 1
+    dest = sqlite3.connect(path)
+    conn.backup(dest)
+    dest.close()
+    print(f"Backup written to {path}")
+    return path
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """
+    Moves the schema one version at a time up (or down) to `target`.
+    Every step runs in its own transaction, so a failed step leaves the previous version intact.
+    """
+    current = get_version(conn)
+    if target > SCHEMA_VERSION or target < 1:
+        raise ValueError(f"Unknown schema version {target}")
+
+    # Table rebuilds must not trigger cascades; the pragma is ignored inside a transaction
+    conn.isolation_level = None
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        while current != target:
+            step = current + 1 if target > current else current
+            upgrade, downgrade = MIGRATIONS[step]
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if target > current:
+                    upgrade(cursor)
+                    current = step
+                else:
+                    downgrade(cursor)
+                    current = step - 1
+                cursor.execute(f"PRAGMA user_version = {current}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            print(f"Database schema is now at version {current}.")
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.isolation_level = ''
+    return current
+
+def init_db(db_path=DB_PATH, target=SCHEMA_VERSION):
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # 1. Enable Foreign Key support in SQLite (required for Cascade)
+    cursor.execute("PRAGMA foreign_keys = ON")
+
+    # 2. Create the original tables on a fresh database, then migrate forward
+    current = get_version(conn)
+    if current == 0:
+        create_v1(cursor)
+        cursor.execute("PRAGMA user_version = 1")
+        conn.commit()
+    elif current < target:
+        backup_db(conn, f"{db_path}.v{current}.bak")
+
+    migrate(conn, target)
     conn.close()
     print("Database Initialized with Cascading Delete support.")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create or migrate the attendance database.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--migrate-to", type=int, default=SCHEMA_VERSION,
+                        help="schema version to move to (use a lower number to roll back)")
+    args = parser.parse_args()
+    init_db(args.db, args.migrate_to)
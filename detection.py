@@ -0,0 +1,216 @@
+"""
+Face detection policy for the recognition hot path.
+
+A DetectionPolicy decides, frame by frame, how far a frame is shrunk before the
+detector sees it (AdaptiveScale), whether only the region around the current tracks
+is searched, and which dlib settings are used (PROFILES: fast for live monitoring,
+accurate for enrollment). Every stage is timed (metrics.StageTimings) so each entrance camera
+can be tuned from its own counters.
+
+face_recognition (dlib and its model files) takes about a second to import, so it is
+only imported on first use; GUIs call preload() to do that on a background thread.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from metrics import StageTimings
+
+DETECTION_SCALE = 0.25  # Frames are shrunk to a quarter before HOG detection
+ROI_MAX_AREA = 0.5      # A crop larger than this share of the frame is not worth it
+
+_face_recognition = None
+_import_lock = threading.Lock()
+
+
+def face_recognition_module():
+    global _face_recognition
+    if _face_recognition is None:
+        with _import_lock:
+            if _face_recognition is None:
+                import face_recognition
+                _face_recognition = face_recognition
+    return _face_recognition
+
+
+def preload():
+    """Starts importing face_recognition in the background; the first detection then does not wait for it."""
+    thread = threading.Thread(target=face_recognition_module, daemon=True)
+    thread.start()
+    return thread
+
+
+class DetectionProfile:
+    """dlib settings for one use of the detector and encoder."""
+
+    def __init__(self, model="hog", upsample=1, num_jitters=1, landmarks="small"):
+        self.model = model              # "hog" (CPU) or "cnn" (only fast with a CUDA build of dlib)
+        self.upsample = upsample        # Upsampling finds smaller faces at ~4x the cost per step
+        self.num_jitters = num_jitters  # Re-sampled crops averaged into every encoding
+        self.landmarks = landmarks      # "small" (5-point) or "large" (68-point) alignment
+
+    def locate(self, rgb):
+        return face_recognition_module().face_locations(rgb, self.upsample, self.model)
+
+    def encode(self, rgb, locs):
+        return face_recognition_module().face_encodings(rgb, locs, self.num_jitters, self.landmarks)
+
+
+PROFILES = {
+    # Live monitoring: a single pass per face, as cheap as dlib gets
+    "fast": DetectionProfile("hog", upsample=1, num_jitters=1),
+    # Enrollment: the stored encoding is matched against for months, so average jitters
+    "accurate": DetectionProfile("hog", upsample=1, num_jitters=10),
+    "cnn": DetectionProfile("cnn", upsample=1, num_jitters=5),
+}
+
+
+def prepare(frame, scale=DETECTION_SCALE):
+    """BGR camera frame (or crop) -> small contiguous RGB image for dlib."""
+    # Shrink first so the colour conversion only touches the small image
+    if scale != 1:
+        frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    return np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), dtype=np.uint8)
+
+
+def to_full_frame(box, scale=DETECTION_SCALE, origin=(0, 0)):
+    """Detection-image box -> full-frame box; `origin` is the (top, left) of the crop."""
+    top, right, bottom, left = box
+    oy, ox = origin
+    return (int(top / scale) + oy, int(right / scale) + ox, int(bottom / scale) + oy, int(left / scale) + ox)
+
+
+class AdaptiveScale:
+    """
+    Chooses the detection scale from the last full-frame detection time and the
+    faces seen over the last `window` detections:
+
+    1. over `budget_ms` -> shrink, but never so far that the smallest recent face
+       drops below `min_face_px` (HOG with one upsample misses faces under ~40 px)
+    2. smallest recent face below `min_face_px` -> grow
+    3. every recent face far larger than needed -> shrink to save CPU
+    4. plenty of headroom -> grow, so faces further from the camera get detected
+    """
+
+    def __init__(self, scale=DETECTION_SCALE, min_scale=0.2, max_scale=1.0, budget_ms=50.0,
+                 min_face_px=48, step=1.25, window=30):
+        self.scale = scale
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.budget_ms = budget_ms
+        self.min_face_px = min_face_px
+        self.step = step
+        self.faces = deque(maxlen=window)   # Smallest face height (full-frame px) per detection, or None
+
+    def update(self, detect_ms, face_heights):
+        """`detect_ms` is None for ROI detections, whose cost says nothing about the full frame."""
+        self.faces.append(min(face_heights) if face_heights else None)
+        seen = [h for h in self.faces if h]
+        smallest = min(seen) if seen else None
+        floor = min(self.max_scale, self.min_face_px / smallest) if smallest else self.min_scale
+        ceiling = 3 * self.min_face_px / smallest if smallest else self.max_scale
+        headroom = detect_ms is not None and detect_ms * self.step ** 2 < 0.8 * self.budget_ms
+
+        scale = self.scale
+        if detect_ms is not None and detect_ms > self.budget_ms and scale / self.step >= floor:
+            scale /= self.step
+        elif scale < floor:
+            scale *= self.step
+        elif scale > ceiling and scale / self.step >= floor:
+            scale /= self.step
+        elif headroom and scale * self.step <= ceiling:
+            scale *= self.step
+        self.scale = min(self.max_scale, max(self.min_scale, scale))
+        return self.scale
+
+
+class Detection:
+    """One detector pass: the RGB image it ran on, how it maps to the frame and what it found."""
+
+    def __init__(self, image, scale, origin, locs):
+        self.image = image
+        self.scale = scale
+        self.origin = origin
+        self.locs = locs
+        self.boxes = [to_full_frame(loc, scale, origin) for loc in locs]
+
+    def to_image(self, box):
+        """Full-frame box -> coordinates in this detection's image."""
+        oy, ox = self.origin
+        top, right, bottom, left = box
+        s = self.scale
+        return (round((top - oy) * s), round((right - ox) * s), round((bottom - oy) * s), round((left - ox) * s))
+
+
+class DetectionPolicy:
+    """
+    Detection settings and state for one camera (or one enrollment session).
+
+    With `roi` enabled and faces already being tracked, only a crop around the tracked
+    boxes is searched, with a whole-frame scan at least every `full_every` detector
+    runs so newcomers are still picked up. Boxes are always returned in full-frame
+    coordinates. Not thread-safe on its own: use one policy per camera.
+    """
+
+    def __init__(self, profile="fast", scale=DETECTION_SCALE, adaptive=True, budget_ms=50.0,
+                 min_face_px=48, roi=True, full_every=3, roi_margin=1.0):
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self.fixed_scale = scale
+        self.scaler = AdaptiveScale(scale, budget_ms=budget_ms, min_face_px=min_face_px) if adaptive else None
+        self.roi = roi
+        self.full_every = full_every
+        self.roi_margin = roi_margin
+        self.since_full = 0
+        self.timings = StageTimings()
+
+    @property
+    def scale(self):
+        return self.scaler.scale if self.scaler else self.fixed_scale
+
+    def region(self, boxes, shape):
+        """(top, right, bottom, left) crop around the boxes, or None to scan the whole frame."""
+        if not self.roi or not boxes or self.since_full >= self.full_every - 1:
+            return None
+        h, w = shape[:2]
+        pad = self.roi_margin * max(b[2] - b[0] for b in boxes)
+        top = max(0, int(min(b[0] for b in boxes) - pad))
+        right = min(w, int(max(b[1] for b in boxes) + pad))
+        bottom = min(h, int(max(b[2] for b in boxes) + pad))
+        left = max(0, int(min(b[3] for b in boxes) - pad))
+        if bottom <= top or right <= left or (bottom - top) * (right - left) > ROI_MAX_AREA * h * w:
+            return None
+        return top, right, bottom, left
+
+    def detect(self, frame, boxes=()):
+        """Runs the detector on `frame`, searching around `boxes` (full-frame) when possible."""
+        region = self.region(boxes, frame.shape)
+        scale = self.scale
+        with self.timings.stage("prepare"):
+            if region:
+                top, right, bottom, left = region
+                image, origin = prepare(frame[top:bottom, left:right], scale), (top, left)
+            else:
+                image, origin = prepare(frame, scale), (0, 0)
+
+        start = time.perf_counter()
+        locs = self.profile.locate(image)
+        elapsed = time.perf_counter() - start
+        self.timings.add("detect_roi" if region else "detect", elapsed)
+        self.since_full = self.since_full + 1 if region else 0
+
+        detection = Detection(image, scale, origin, locs)
+        if self.scaler:
+            self.scaler.update(None if region else elapsed * 1000, [b[2] - b[0] for b in detection.boxes])
+        return detection
+
+    def encode(self, detection, boxes=None):
+        """128-D encodings for full-frame `boxes` found by `detection` (default: all of them)."""
+        locs = detection.locs if boxes is None else [detection.to_image(b) for b in boxes]
+        with self.timings.stage("encode"):
+            return self.profile.encode(detection.image, locs) if locs else []
+
+    def counters(self):
+        return {"scale": round(self.scale, 3), "stages": self.timings.as_dict()}
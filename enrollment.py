@@ -0,0 +1,118 @@
+"""
+Multi-sample enrollment: capture a short burst of frames, score every face and keep
+the best few, spread over slightly different head poses.
+
+Quality combines face size, sharpness (variance of the Laplacian) and how frontal
+the face is; the pose spread comes from a yaw estimate based on the 5-point
+landmarks. Only the selected samples are run through the (slow) accurate encoder.
+"""
+import time
+
+import cv2
+
+from detection import PROFILES, face_recognition_module
+
+BURST_FRAMES = 20       # Frames captured after the user presses 'S'
+BURST_SECONDS = 2.5     # ...spread over this long, so a slow head turn is covered
+KEEP_SAMPLES = 5        # Templates stored per enrollment
+MIN_FACE_PX = 80        # Face height in the full-resolution frame
+MIN_SHARPNESS = 40.0    # Variance of the Laplacian below this is motion blur / out of focus
+YAW_BIN = 0.1           # Samples whose yaw differs by less than this count as the same pose
+
+
+class Sample:
+    def __init__(self, frame, box, size, sharpness, yaw):
+        self.frame = frame
+        self.box = box          # (top, right, bottom, left) in the full frame
+        self.size = size
+        self.sharpness = sharpness
+        self.yaw = yaw          # ~0 frontal, negative/positive turned left/right
+        self.quality = (min(1.0, size / 160) * min(1.0, sharpness / 150)
+                        * (1.0 - 0.5 * min(1.0, abs(yaw) / 0.6)))
+        self.encoding = None
+
+
+def sharpness(frame, box):
+    top, right, bottom, left = box
+    crop = cv2.cvtColor(frame[max(0, top):bottom, max(0, left):right], cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(crop, cv2.CV_64F).var()) if crop.size else 0.0
+
+
+def estimate_yaw(landmarks):
+    """Horizontal nose offset from the eye midpoint, in inter-ocular distances."""
+    def mean_x(points):
+        return sum(p[0] for p in points) / len(points)
+    left, right = mean_x(landmarks["left_eye"]), mean_x(landmarks["right_eye"])
+    eye_distance = abs(right - left) or 1.0
+    return (mean_x(landmarks["nose_tip"]) - (left + right) / 2) / eye_distance
+
+
+def score_frame(frame, box):
+    """Sample for the face at `box`, or None when it is too small or blurred to be worth scoring."""
+    size = box[2] - box[0]
+    if size < MIN_FACE_PX:
+        return None
+    sharp = sharpness(frame, box)
+    if sharp < MIN_SHARPNESS:
+        return None
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    landmarks = face_recognition_module().face_landmarks(rgb, [box], model="small")
+    if not landmarks:
+        return None
+    return Sample(frame, box, size, sharp, estimate_yaw(landmarks[0]))
+
+
+def select_samples(samples, keep=KEEP_SAMPLES):
+    """The best sample of every distinct pose first (best first), then the best of the rest."""
+    ranked = sorted(samples, key=lambda s: s.quality, reverse=True)
+    chosen, poses = [], set()
+    for s in ranked:
+        pose = round(s.yaw / YAW_BIN)
+        if pose not in poses:
+            poses.add(pose)
+            chosen.append(s)
+    chosen = chosen[:keep]
+    for s in ranked:
+        if len(chosen) >= keep:
+            break
+        if s not in chosen:
+            chosen.append(s)
+    return chosen
+
+
+def capture_burst(cam, policy, window, frames=BURST_FRAMES, seconds=BURST_SECONDS):
+    """
+    Reads `frames` frames over `seconds`, showing progress in `window`, and returns a
+    Sample for every frame with exactly one usable face.
+    """
+    samples = []
+    interval = seconds / frames
+    for i in range(frames):
+        start = time.monotonic()
+        ret, frame = cam.read()
+        if not ret:
+            break
+        boxes = policy.detect(frame).boxes
+        display = frame.copy()
+        cv2.putText(display, f"Capturing {i + 1}/{frames} - turn your head slowly", (20, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        cv2.imshow(window, display)
+        cv2.waitKey(1)
+        if len(boxes) == 1:
+            sample = score_frame(frame, boxes[0])
+            if sample:
+                samples.append(sample)
+        time.sleep(max(0, interval - (time.monotonic() - start)))
+    return samples
+
+
+def encode_samples(samples, profile="accurate"):
+    """Runs the encoder on the selected samples only; drops samples it cannot encode."""
+    profile = PROFILES[profile]
+    encoded = []
+    for s in samples:
+        encs = profile.encode(cv2.cvtColor(s.frame, cv2.COLOR_BGR2RGB), [s.box])
+        if encs:
+            s.encoding = encs[0]
+            encoded.append(s)
+    return encoded
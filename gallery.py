@@ -0,0 +1,232 @@
+import threading
+
+import numpy as np
+
+from matcher import FaceMatcher, DEFAULT_TOLERANCE, ENCODING_SIZE
+
+MIN_CAPACITY = 64
+
+
+class GallerySnapshot:
+    """
+    Immutable view of the gallery at one version.
+    Recognition threads grab one with FaceGallery.snapshot() and match against it
+    without holding any lock; later edits publish a new snapshot instead.
+    """
+
+    def __init__(self, version, matcher, names):
+        self.version = version
+        self.matcher = matcher
+        self.names = names      # employee id -> name
+
+    def __len__(self):
+        return len(self.names)
+
+    def match(self, encodings):
+        """Returns [(employee_id or None, name or None, distance)] for every encoding."""
+        results = []
+        for emp_id, dist in self.matcher.match(encodings):
+            if emp_id is None:
+                results.append((None, None, dist))
+            else:
+                results.append((emp_id, self.names[emp_id], dist))
+        return results
+
+
+def as_encodings(encodings):
+    """One encoding (bytes or array) or a list of them -> list of float arrays."""
+    if isinstance(encodings, (bytes, bytearray, memoryview)):
+        return [np.frombuffer(encodings, dtype=np.float64)]
+    if isinstance(encodings, np.ndarray) and encodings.ndim == 1:
+        return [encodings]
+    return [np.frombuffer(e, dtype=np.float64) if isinstance(e, (bytes, bytearray, memoryview)) else e
+            for e in encodings]
+
+
+class FaceGallery:
+    """
+    In-memory set of known faces, keyed by employee id.
+
+    Every identity has one or more templates (see templates.py). All templates sit in
+    one matrix whose row labels are employee ids, so matching a frame against every
+    template of every person is still a single batched distance computation, and
+    the closest template decides the identity.
+
+    Encodings are appended to a pre-allocated float32 buffer, so add() never copies
+    the existing rows and remove() only flips rows off in the validity mask. Rows
+    are compacted once more than half of them are dead. Every change bumps
+    `version` and swaps in a new GallerySnapshot in a single assignment.
+
+    Large galleries keep their k-means centroids and the bucket of every row from one
+    snapshot to the next, so a change only assigns the new rows; the gallery is
+    re-clustered once its size has moved far from what the centroids were made for.
+    """
+
+    def __init__(self, threshold=DEFAULT_TOLERANCE):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix = np.empty((MIN_CAPACITY, ENCODING_SIZE), dtype=np.float32)
+        self._ids = np.zeros(MIN_CAPACITY, dtype=np.int64)
+        self._alive = np.zeros(MIN_CAPACITY, dtype=bool)
+        self._buckets = np.full(MIN_CAPACITY, -1, dtype=np.int64)  # k-means bucket per row, -1 = not assigned
+        self._centroids = None
+        self._n = 0
+        self._live = 0
+        self._alive_shared = False  # True once the current mask is part of a published snapshot
+        self._rows = {}     # employee id -> rows (templates) in the buffer
+        self._names = {}    # employee id -> name
+        self.version = 0
+        self._snapshot = GallerySnapshot(0, FaceMatcher([], [], threshold), {})
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, emp_id):
+        return emp_id in self._rows
+
+    def templates(self, emp_id):
+        return len(self._rows.get(emp_id, ()))
+
+    def snapshot(self):
+        return self._snapshot
+
+    def load(self, rows):
+        """
+        Replaces the whole gallery with [(employee_id, name, encoding bytes/array)].
+        An employee id may appear on several rows, one per template.
+        """
+        rows = list(rows)
+        with self._lock:
+            self._allocate(max(MIN_CAPACITY, 2 * len(rows)))
+            self._centroids = None
+            for emp_id, name, enc in rows:
+                self._append(emp_id, name, enc)
+            self._publish()
+
+    def load_arrays(self, matrix, ids, names, centroids=None, buckets=None):
+        """
+        Bulk load() from a (rows, 128) matrix, the employee id of every row and
+        {employee id: name}, e.g. straight from the memory-mapped gallery_cache files.
+        `centroids` and the `buckets` of the rows skip clustering the gallery again.
+        """
+        n = len(ids)
+        with self._lock:
+            self._allocate(max(MIN_CAPACITY, 2 * n))
+            self._centroids = centroids
+            if centroids is not None and buckets is not None:
+                self._buckets[:n] = buckets
+            self._matrix[:n] = matrix
+            self._ids[:n] = ids
+            self._alive[:n] = True
+            self._n = self._live = n
+            for row, emp_id in enumerate(self._ids[:n].tolist()):
+                self._rows.setdefault(emp_id, []).append(row)
+            self._names = {emp_id: names[emp_id] for emp_id in self._rows}
+            self._publish()
+
+    def add(self, emp_id, name, encodings):
+        """Adds an identity with one encoding or a list of templates, replacing any existing one."""
+        with self._lock:
+            self._retire(emp_id)
+            for encoding in as_encodings(encodings):
+                self._append(emp_id, name, encoding)
+            self._publish()
+
+    def remove(self, emp_id):
+        with self._lock:
+            if self._retire(emp_id):
+                self._publish()
+
+    def update(self, emp_id, name=None, encoding=None):
+        """Renames an identity and/or replaces its templates (one encoding or a list)."""
+        with self._lock:
+            if emp_id not in self._rows:
+                return
+            name = name if name is not None else self._names[emp_id]
+            if encoding is None:
+                self._names[emp_id] = name
+            else:
+                self._retire(emp_id)
+                for enc in as_encodings(encoding):
+                    self._append(emp_id, name, enc)
+            self._publish()
+
+    def _allocate(self, capacity):
+        self._matrix = np.empty((capacity, ENCODING_SIZE), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._buckets = np.full(capacity, -1, dtype=np.int64)
+        self._alive_shared = False
+        self._n = 0
+        self._live = 0
+        self._rows = {}
+        self._names = {}
+
+    def _own_alive(self):
+        # Copy-on-write: snapshots already handed out keep their own mask.
+        # Copied once per change, not once per row, so load() stays linear.
+        if self._alive_shared:
+            self._alive = self._alive.copy()
+            self._alive_shared = False
+
+    def _append(self, emp_id, name, encoding):
+        if isinstance(encoding, (bytes, bytearray, memoryview)):
+            encoding = np.frombuffer(encoding, dtype=np.float64)
+        if self._n == len(self._matrix):
+            self._compact(max(MIN_CAPACITY, 2 * (self._live + 1)))
+        row = self._n
+        # Rows >= n are outside every published snapshot, so writing them in place is safe
+        self._matrix[row] = encoding
+        self._ids[row] = emp_id
+        self._buckets[row] = -1
+        self._own_alive()
+        self._alive[row] = True
+        self._rows.setdefault(emp_id, []).append(row)
+        self._names[emp_id] = name
+        self._n += 1
+        self._live += 1
+
+    def _retire(self, emp_id):
+        rows = self._rows.pop(emp_id, None)
+        if rows is None:
+            return False
+        del self._names[emp_id]
+        self._own_alive()
+        self._alive[rows] = False
+        self._live -= len(rows)
+        if self._n > MIN_CAPACITY and self._live < self._n // 2:
+            self._compact(len(self._matrix))
+        return True
+
+    def _compact(self, capacity):
+        """Moves the live rows into a fresh buffer; old snapshots keep the old one."""
+        live = np.flatnonzero(self._alive[:self._n])
+        matrix = np.empty((capacity, ENCODING_SIZE), dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        alive = np.zeros(capacity, dtype=bool)
+        buckets = np.full(capacity, -1, dtype=np.int64)
+        matrix[:len(live)] = self._matrix[live]
+        ids[:len(live)] = self._ids[live]
+        alive[:len(live)] = True
+        buckets[:len(live)] = self._buckets[live]
+        self._matrix, self._ids, self._alive, self._n = matrix, ids, alive, len(live)
+        self._buckets = buckets
+        self._alive_shared = False
+        self._rows = {}
+        for row, emp_id in enumerate(ids[:self._n].tolist()):
+            self._rows.setdefault(emp_id, []).append(row)
+
+    def _publish(self):
+        n = self._n
+        centroids = self._centroids
+        if centroids is not None and not len(centroids) // 2 <= int(np.sqrt(self._live)) <= 2 * len(centroids):
+            centroids = None    # Grown or shrunk too far for these buckets: cluster again
+        matcher = FaceMatcher(self._matrix[:n], self._ids[:n].tolist(), self.threshold,
+                              valid=self._alive[:n], centroids=centroids,
+                              assign=self._buckets[:n] if centroids is not None else None)
+        if matcher.centroids is not None:
+            self._centroids = matcher.centroids
+            self._buckets[:n] = matcher.assign
+        self._alive_shared = True
+        self.version += 1
+        self._snapshot = GallerySnapshot(self.version, matcher, dict(self._names))
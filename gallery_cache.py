@@ -0,0 +1,348 @@
+"""
+On-disk copy of the face gallery for fast startup.
+
+Decoding every template BLOB from SQLite into its own array takes seconds at 100k
+identities. The cache keeps the same data as memory-mapped .npy matrices that
+FaceGallery.load_arrays() takes in one bulk copy:
+
+    encodings.npy   float32 (capacity, 128)
+    keys.npy        int64 template id per row (-employee id for employees without
+                    templates, 0 for unused / deleted rows)
+    employees.npy   int64 employee id per row
+    buckets.npy     int64 k-means bucket per row and centroids.npy, so the matcher
+                    index is not clustered again at every start (see FaceMatcher)
+    names.json      names as one JSON list, in the order of name_ids.npy (int64)
+    names.log       JSON lines [employee id, name] added since names.json was written
+    meta.json       format version, used rows, the fingerprint of the keys and the
+                    keys of rows whose encoding could not be decoded
+
+The cache is valid when its fingerprint (count, sum and sum of squares of the live
+keys) equals the database's. Rows with a BLOB that is not ENCODING_SIZE float64s are
+left out of the matrices but kept in meta.json's "skipped" and in the fingerprint:
+the database's fingerprint counts them too (it is computed from the employee index
+without reading BLOBs), so one corrupt row must not force a rebuild at every start.
+Template and employee ids are AUTOINCREMENT and never
+reused, so any insert or delete by any process changes it. When they differ, only
+the rows that were added or deleted are applied to the files (sync()), the way
+FaceGallery itself appends rows and flips dead ones; the files are compacted once
+half the rows are dead. Renaming an employee is not detected (the app has no
+rename), delete the directory to force a rebuild.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from database import DB_PATH
+from matcher import ENCODING_SIZE, INDEX_MIN_SIZE, assign_buckets, kmeans
+
+FORMAT = 1
+MIN_CAPACITY = 1024
+LOCK_STALE_SECONDS = 30     # A lock file older than this was left by a crashed process
+CHUNK = 500                 # Ids per IN (...) query
+
+TEMPLATE_ROWS = """SELECT t.id, e.id, e.name, t.encoding FROM face_templates t
+                   JOIN employees e ON e.id = t.employee_id"""
+LEGACY_ROWS = """SELECT -e.id, e.id, e.name, e.encoding FROM employees e
+                 WHERE e.encoding IS NOT NULL
+                   AND NOT EXISTS (SELECT 1 FROM face_templates t WHERE t.employee_id = e.id)"""
+KEYS = """SELECT t.id AS k FROM face_templates t JOIN employees e ON e.id = t.employee_id
+          UNION ALL
+          SELECT -e.id FROM employees e WHERE e.encoding IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM face_templates t WHERE t.employee_id = e.id)"""
+KEY_EMPLOYEES = """SELECT t.id, e.id FROM face_templates t JOIN employees e ON e.id = t.employee_id
+                   UNION ALL
+                   SELECT -e.id, e.id FROM employees e WHERE e.encoding IS NOT NULL
+                     AND NOT EXISTS (SELECT 1 FROM face_templates t WHERE t.employee_id = e.id)"""
+
+
+def fingerprint(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return [int(len(keys)), int(keys.sum()), int((keys * keys).sum())]
+
+
+def db_fingerprint(conn):
+    count, total, squares = conn.execute(f"SELECT count(*), sum(k), sum(k * k) FROM ({KEYS})").fetchone()
+    return [count, total or 0, squares or 0]
+
+
+def gallery_keys(conn):
+    """{template key: employee id} for every gallery row, keyed like keys.npy."""
+    return dict(conn.execute(KEY_EMPLOYEES).fetchall())
+
+
+def cluster(matrix):
+    """(centroids, bucket per row) for a gallery big enough to be indexed, else (None, -1s)."""
+    if len(matrix) < INDEX_MIN_SIZE:
+        return None, np.full(len(matrix), -1, dtype=np.int64)
+    centroids = kmeans(matrix, max(1, int(np.sqrt(len(matrix)))))
+    return centroids, assign_buckets(matrix, centroids)
+
+
+def decode(rows):
+    """
+    [(key, employee id, name, encoding bytes)] -> (float32 matrix, keys, employee ids,
+    keys of the rows skipped for a bad BLOB).
+    """
+    bad = [r for r in rows if r[3] is None or len(r[3]) != ENCODING_SIZE * 8]
+    for key, emp_id, _, encoding in bad:
+        print(f"Gallery cache: skipping {'template ' + str(key) if key > 0 else 'encoding'} of employee {emp_id}: "
+              f"{len(encoding) if encoding is not None else 'no'} bytes, expected {ENCODING_SIZE * 8}")
+    rows = [r for r in rows if r[3] is not None and len(r[3]) == ENCODING_SIZE * 8]
+    matrix = np.frombuffer(b"".join(r[3] for r in rows), dtype=np.float64).reshape(-1, ENCODING_SIZE)
+    return (matrix.astype(np.float32), np.array([r[0] for r in rows], dtype=np.int64),
+            np.array([r[1] for r in rows], dtype=np.int64), {r[0] for r in bad})
+
+
+class GalleryCache:
+    def __init__(self, db_path=DB_PATH, directory=None):
+        self.db_path = db_path
+        self.directory = directory or os.path.join(os.path.dirname(db_path) or '.', 'gallery_cache')
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.fingerprint = None
+        self.encodings = None
+        self.keys = None
+        self.employees = None
+        self.buckets = None
+        self.centroids = None
+        self.names = {}
+        self.skipped = set()    # keys of rows with an undecodable encoding
+        self.watcher = None
+        self.synced_version = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # --- Cross-process lock (the dashboard and camera_service may share a database) ---
+
+    def _acquire(self):
+        path = self._path("lock")
+        os.makedirs(self.directory, exist_ok=True)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) < LOCK_STALE_SECONDS:
+                        return False
+                    os.remove(path)
+                except OSError:
+                    return False
+        return False
+
+    def _release(self):
+        try:
+            os.remove(self._path("lock"))
+        except OSError:
+            pass
+
+    # --- Files ---
+
+    def _close(self):
+        self.encodings = self.keys = self.employees = self.buckets = self.centroids = None
+
+    def _open(self):
+        try:
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("format") != FORMAT:
+                return False
+            self.encodings = np.load(self._path("encodings.npy"), mmap_mode="r+")
+            self.keys = np.load(self._path("keys.npy"), mmap_mode="r+")
+            self.employees = np.load(self._path("employees.npy"), mmap_mode="r+")
+            self.buckets = np.load(self._path("buckets.npy"), mmap_mode="r+")
+            self.centroids = np.load(self._path("centroids.npy"))
+            self.rows, self.fingerprint = meta["rows"], meta["fingerprint"]
+            self.skipped = set(meta.get("skipped", []))
+            if (self.encodings.shape[1:] != (ENCODING_SIZE,) or not self.rows <= len(self.encodings)
+                    == len(self.keys) == len(self.employees) == len(self.buckets)):
+                raise ValueError("cache files do not match")
+            if not len(self.centroids):
+                self.centroids = None
+            # A list of plain strings parses several times faster than [id, name] pairs
+            with open(self._path("names.json"), encoding="utf-8") as f:
+                self.names = dict(zip(np.load(self._path("name_ids.npy")).tolist(), json.load(f)))
+            with open(self._path("names.log"), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        emp_id, name = json.loads(line)
+                    except ValueError:
+                        continue    # Torn last line; its name is missing and the check below rebuilds
+                    self.names[emp_id] = name
+            live = self.employees[:self.rows][self.keys[:self.rows] != 0]
+            if not set(np.unique(live).tolist()) <= self.names.keys():
+                raise ValueError("cache names are incomplete")
+            return True
+        except (OSError, ValueError, KeyError):
+            self._close()
+            return False
+
+    def _write_meta(self):
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"format": FORMAT, "rows": self.rows, "fingerprint": self.fingerprint,
+                       "skipped": sorted(self.skipped)}, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def _fingerprint(self):
+        live = self.keys[:self.rows]
+        return fingerprint(np.concatenate([live[live != 0], np.array(sorted(self.skipped), dtype=np.int64)]))
+
+    def _write(self, matrix, keys, employees, names, capacity, skipped):
+        """Rewrites every file; the meta file goes first and last so a crash in between means 'rebuild'."""
+        self._close()
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self._path("meta.json")):
+            os.remove(self._path("meta.json"))
+        n = len(keys)
+        centroids, buckets = cluster(matrix)
+        np.save(self._path("centroids.npy"), centroids if centroids is not None
+                else np.empty((0, ENCODING_SIZE), dtype=np.float32))
+        for name, dtype, shape, data in (("encodings.npy", np.float32, (capacity, ENCODING_SIZE), matrix),
+                                         ("keys.npy", np.int64, (capacity,), keys),
+                                         ("employees.npy", np.int64, (capacity,), employees),
+                                         ("buckets.npy", np.int64, (capacity,), buckets)):
+            tmp = self._path(name + ".tmp")
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+            out[:n] = data
+            out.flush()
+            del out
+            os.replace(tmp, self._path(name))
+        name_ids = sorted(set(employees.tolist()))
+        np.save(self._path("name_ids.npy"), np.array(name_ids, dtype=np.int64))
+        with open(self._path("names.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump([names[emp_id] for emp_id in name_ids], f)
+        os.replace(self._path("names.json.tmp"), self._path("names.json"))
+        open(self._path("names.log"), "w").close()
+        self.rows = n
+        self.skipped = set(skipped)
+        self.fingerprint = fingerprint(np.concatenate([keys, np.array(sorted(skipped), dtype=np.int64)]))
+        self._write_meta()
+        self._open()
+
+    # --- Building and syncing ---
+
+    def rebuild(self, conn):
+        """Writes the cache from scratch; the only path that reads every BLOB."""
+        rows = conn.execute(f"{TEMPLATE_ROWS} UNION ALL {LEGACY_ROWS}").fetchall()
+        names = {r[1]: r[2] for r in rows}
+        matrix, keys, employees, skipped = decode(rows)
+        self._write(matrix, keys, employees, names, max(MIN_CAPACITY, 2 * len(keys)), skipped)
+
+    def _fetch(self, conn, keys):
+        rows = []
+        templates = sorted(k for k in keys if k > 0)
+        legacy = sorted(-k for k in keys if k < 0)
+        for i in range(0, len(templates), CHUNK):
+            chunk = templates[i:i + CHUNK]
+            rows += conn.execute(f"{TEMPLATE_ROWS} WHERE t.id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        for i in range(0, len(legacy), CHUNK):
+            chunk = legacy[i:i + CHUNK]
+            rows += conn.execute(f"{LEGACY_ROWS} AND e.id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        return rows
+
+    def sync(self, conn):
+        """Applies the templates added and deleted since the cache was written. Returns (added, removed)."""
+        if db_fingerprint(conn) == self.fingerprint:
+            return 0, 0
+        db_keys = {r[0] for r in conn.execute(KEYS)}
+        live = self.keys[:self.rows]
+        cache_keys = set(live[live != 0].tolist()) | self.skipped
+        added, removed = db_keys - cache_keys, cache_keys - db_keys
+
+        if removed:
+            self.keys[np.flatnonzero(np.isin(live, list(removed)))] = 0
+        rows = self._fetch(conn, added)
+        matrix, keys, employees, bad = decode(rows)
+        skipped = (self.skipped - removed) | bad
+        new_names = {r[1]: r[2] for r in rows if self.names.get(r[1]) != r[2]}
+
+        alive = np.flatnonzero(self.keys[:self.rows] != 0)
+        if self.rows + len(keys) > len(self.keys) or len(alive) < self.rows // 2:
+            # Out of room or mostly dead rows: compact into fresh files
+            names = {**self.names, **new_names}
+            self._write(np.concatenate([self.encodings[alive], matrix]), np.concatenate([self.keys[alive], keys]),
+                        np.concatenate([self.employees[alive], employees]), names,
+                        max(MIN_CAPACITY, 2 * (len(alive) + len(keys))), skipped)
+            return len(added), len(removed)
+
+        n, end = self.rows, self.rows + len(keys)
+        self.encodings[n:end] = matrix
+        self.keys[n:end] = keys
+        self.employees[n:end] = employees
+        if self.centroids is not None and len(keys):
+            self.buckets[n:end] = assign_buckets(matrix, self.centroids)
+        else:
+            self.buckets[n:end] = -1
+        for arr in (self.encodings, self.keys, self.employees, self.buckets):
+            arr.flush()
+        if new_names:
+            with open(self._path("names.log"), "a", encoding="utf-8") as f:
+                for emp_id, name in new_names.items():
+                    f.write(json.dumps([emp_id, name]) + "\n")
+            self.names.update(new_names)
+        self.rows = end
+        self.skipped = skipped
+        self.fingerprint = self._fingerprint()
+        self._write_meta()
+        return len(added), len(removed)
+
+    def load_into(self, gallery):
+        """
+        Brings the cache up to date with the database and bulk-loads it into `gallery`.
+        Returns "hit", "synced", "rebuilt" or "uncached" (another process holds the lock;
+        the gallery is then loaded straight from the database).
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with self.lock:
+                if not self._acquire():
+                    from templates import gallery_rows
+                    gallery.load(gallery_rows(conn))
+                    return "uncached"
+                try:
+                    status = "hit"
+                    if not self._open():
+                        self.rebuild(conn)
+                        status = "rebuilt"
+                    elif any(self.sync(conn)):
+                        status = "synced"
+                    live = self.keys[:self.rows] != 0
+                    rows = slice(0, self.rows) if live.all() else np.flatnonzero(live)
+                    gallery.load_arrays(self.encodings[rows], self.employees[rows], self.names,
+                                        self.centroids, self.buckets[rows])
+                    self.synced_version = gallery.version
+                    return status
+                finally:
+                    self._release()
+        finally:
+            conn.close()
+
+    def watch(self, gallery, interval=2.0):
+        """Background thread that syncs the files whenever the gallery changed (registration, deletion, re-enroll)."""
+        def run():
+            while True:
+                time.sleep(interval)
+                if gallery.version == self.synced_version:
+                    continue
+                version = gallery.version
+                try:
+                    conn = sqlite3.connect(self.db_path)
+                    with self.lock:
+                        if self.keys is not None and self._acquire():
+                            try:
+                                self.sync(conn)
+                                self.synced_version = version
+                            finally:
+                                self._release()
+                    conn.close()
+                except (sqlite3.Error, OSError, ValueError) as e:
+                    print(f"Gallery cache sync error: {e}")
+        if self.watcher is None:
+            self.watcher = threading.Thread(target=run, daemon=True)
+            self.watcher.start()
@@ -0,0 +1,81 @@
+import sqlite3
+import hashlib
+
+import cv2
+import numpy as np
+
+from database import DB_PATH
+
+THUMB_SIZE = 160        # Longest side of the thumbnail shown in Manage Staff
+
+
+def make_thumbnail(image_bytes):
+    """Returns a small JPEG of an encoded image, or None if it cannot be decoded."""
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    scale = THUMB_SIZE / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    success, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return buffer.tobytes() if success else None
+
+
+def store_image(cursor, frame):
+    """
+    Encodes a BGR frame as JPEG, stores it with its thumbnail and returns its content hash.
+    Runs on the caller's cursor so it commits together with the employee row.
+    """
+    success, buffer = cv2.imencode('.jpg', frame)
+    if not success:
+        return None
+    return store_image_bytes(cursor, buffer.tobytes())
+
+
+def store_image_bytes(cursor, image_bytes, thumbnail=None):
+    """Same as store_image for an already encoded image; pass `thumbnail` if it was made elsewhere."""
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    cursor.execute("INSERT OR IGNORE INTO images (hash, image, thumbnail) VALUES (?, ?, ?)",
+                   (image_hash, image_bytes, thumbnail or make_thumbnail(image_bytes)))
+    return image_hash
+
+
+def load_thumbnail(emp_id, db_path=DB_PATH):
+    """
+    Returns the JPEG thumbnail for an employee, or None if they have no photo.
+    Rows migrated from the old schema get their thumbnail generated on first use.
+    """
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("""SELECT i.hash, i.thumbnail FROM employees e JOIN images i ON i.hash = e.image_hash
+                   WHERE e.id=?""", (emp_id,))
+    row = cur.fetchone()
+    thumb = None
+    if row:
+        image_hash, thumb = row
+        if thumb is None:
+            cur.execute("SELECT image FROM images WHERE hash=?", (image_hash,))
+            thumb = make_thumbnail(cur.fetchone()[0])
+            if thumb:
+                cur.execute("UPDATE images SET thumbnail=? WHERE hash=?", (thumb, image_hash))
+                conn.commit()
+    conn.close()
+    return thumb
+
+
+def load_image(emp_id, db_path=DB_PATH):
+    """Returns the full-resolution JPEG for an employee, or None."""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("""SELECT i.image FROM employees e JOIN images i ON i.hash = e.image_hash
+                   WHERE e.id=?""", (emp_id,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def release_image(cursor, image_hash):
+    """Deletes an image once no employee refers to it any more (call after deleting an employee)."""
+    cursor.execute("DELETE FROM images WHERE hash=? AND NOT EXISTS (SELECT 1 FROM employees WHERE image_hash=?)",
+                   (image_hash, image_hash))
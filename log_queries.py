@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+import queue
+
+from database import DB_PATH
+
+PAGE_SIZE = 200
+
+
+def attendance_page(conn, after=None, limit=PAGE_SIZE, date_from=None, date_to=None, name=None, designation=None):
+    """
+    One page of attendance, newest first, using keyset pagination on (ts_in, id).
+    `after` is the key returned with the previous page. Unfiltered, it walks
+    idx_attendance_ts_in and stops after `limit` rows. A date range is looked up on
+    idx_attendance_date and a designation on idx_employees_designation; a name is
+    matched with LIKE '%x%', which scans the whole employees table. The attendance
+    rows of the matching people come from the (employee_id, date) index. A filtered
+    page sorts every matching row in a temp b-tree before the first one is returned,
+    so its cost grows with the size of the match, not with `limit`.
+    Returns (rows, next key or None when there are no more rows).
+    """
+    where, params = [], []
+    if date_from:
+        where.append("date >= ?"); params.append(date_from)
+    if date_to:
+        where.append("date <= ?"); params.append(date_to)
+    if name:
+        where.append("employee_id IN (SELECT id FROM employees WHERE name LIKE ?)"); params.append(f"%{name}%")
+    if designation:
+        where.append("employee_id IN (SELECT id FROM employees WHERE designation = ?)"); params.append(designation)
+    if after:
+        where.append("(ts_in, id) < (?, ?)"); params.extend(after)
+
+    sql = "SELECT id, ts_in, name, email, designation, date, time_in, time_out FROM attendance_log"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY ts_in DESC, id DESC LIMIT ?"
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    next_key = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+    return [r[2:] for r in rows], next_key
+
+
+def employee_page(conn, after=None, limit=PAGE_SIZE):
+    """One page of employees ordered by id. Returns (rows, next key or None)."""
+    rows = conn.execute("SELECT id, name, email, phone, designation FROM employees WHERE id > ? ORDER BY id LIMIT ?",
+                        (after or 0, limit)).fetchall()
+    return rows, (rows[-1][0] if len(rows) == limit else None)
+
+
+class PageLoader:
+    """
+    Runs page queries on a background thread with its own read connection, so the
+    Tk window never blocks on SQLite. submit() returns a ticket; poll() hands back
+    (ticket, rows, next key) for finished queries.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.tickets = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, fetch, after=None):
+        """Queues fetch(conn, after) and returns its ticket."""
+        self.tickets += 1
+        self.requests.put((self.tickets, fetch, after))
+        return self.tickets
+
+    def poll(self):
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        while True:
+            ticket, fetch, after = self.requests.get()
+            if ticket is None:
+                break
+            if ticket < self.tickets:
+                continue    # Superseded by a newer request (e.g. the filter changed)
+            try:
+                rows, next_key = fetch(conn, after)
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                rows, next_key = [], None
+            self.results.put((ticket, rows, next_key))
+        conn.close()
+
+    def close(self):
+        self.requests.put((None, None, None))
@@ -3,16 +3,31 @@ from tkinter import ttk, messagebox
 import customtkinter as ctk
 from tkcalendar import DateEntry
 import cv2
-import face_recognition
 import sqlite3
-import numpy as np
 import os
+import io
 import time
+import threading
 from datetime import datetime
-from PIL import Image, ImageTk
+from functools import partial
+from PIL import Image
 
 # Import registration logic
 from register_logic import register_user_gui
+from database import init_db
+from image_store import load_thumbnail, release_image
+from pipeline import RecognitionPipeline
+from tracker import FaceTracker
+from attendance_rules import CameraState
+from render import FrameRenderer
+from gallery import FaceGallery
+from gallery_cache import GalleryCache
+from detection import preload
+from attendance_writer import AttendanceWriter
+from stats import DailyStats
+from templates import AutoEnroller, gallery_rows
+from log_queries import PageLoader, attendance_page, employee_page
+from metrics import Metrics, StageTimings
 
 # --- THEME COLORS (Light Mode, Dark Mode) ---
 BG_COLOR = ("#F4F7F6", "#1A1A1A")      # Main background
@@ -21,6 +36,10 @@ CARD_COLOR = ("#FFFFFF", "#252525")    # Cards and Form boxes
 TEXT_COLOR = ("#000000", "#FFFFFF")    # General text
 ACCENT_COLOR = "#3498db"               # Blue accent stays blue
 
+# F2 toggles the metrics panel, F3 writes metrics.json / metrics.prom, F4 profiles for PROFILE_SECONDS
+METRICS_DIR = 'data/metrics'
+PROFILE_SECONDS = 10
+
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
@@ -34,29 +53,71 @@ class VisionGuardPro(ctk.CTk):
         # Set window background using the tuple
         self.configure(fg_color=BG_COLOR)
 
-        self.known_names = []
-        self.known_encs = []
+        # dlib loads while the window is built instead of before it
+        preload()
+        self.gallery = FaceGallery()
+        self.gallery_cache = GalleryCache()
+        self.enroller = AutoEnroller(self.gallery).start()
+        self.attendance = AttendanceWriter().start()
+        self.stats = DailyStats().start()
+        self.shown_stats_version = -1
+        self.page_loader = PageLoader()
+        self.paged_tree = None
+        self.page_loading = False
+        self.page_polling = False
         self.cap = None
+        self.pipeline = None
         self.is_monitoring = False
-        self.tracking = {}      
-        self.cooldowns = {}     
+        self.camera_state = CameraState()   # Zone timers and cooldowns for the dashboard camera
+        self.tracker = None
+        self.overlay = []       # Last recognition result drawn on every preview frame
+        self.renderer = None
+
+        self.metrics = Metrics()
+        self.ui_timings = self.metrics.register(StageTimings(), component="ui")
+        self.attendance.register_metrics(self.metrics)
+        self.metrics_panel = None
+        self.metrics_after = None
+        self.show_metrics = False
+        self.bind("<F2>", self.toggle_metrics_panel)
+        self.bind("<F3>", self.dump_metrics)
+        self.bind("<F4>", self.start_profile)
         
         self.total_lbl = None
         self.present_lbl = None
 
-        self.load_faces()
+        # The gallery fills in the background (milliseconds from the cache, longer after
+        # a rebuild); recognition just sees no known faces until then
+        threading.Thread(target=self.load_faces, daemon=True).start()
         self.setup_gui()
         self.show_dashboard()
 
     def load_faces(self):
+        try:
+            start = time.perf_counter()
+            status = self.gallery_cache.load_into(self.gallery)
+            print(f"Gallery: {len(self.gallery)} people in {(time.perf_counter() - start) * 1000:.0f} ms ({status})")
+            # Registrations, deletions and auto-enrolled templates reach the cache files from here on
+            self.gallery_cache.watch(self.gallery)
+        except Exception as e:
+            print(f"Gallery cache error: {e}")
+            try:
+                conn = sqlite3.connect('data/attendance.db')
+                self.gallery.load(gallery_rows(conn))
+                conn.close()
+            except Exception as e:
+                print(f"Database error: {e}")
+
+    def load_face(self, emp_id):
+        """Adds a single newly registered employee and their templates to the gallery (no reload)."""
         try:
             conn = sqlite3.connect('data/attendance.db')
-            cur = conn.cursor()
-            cur.execute("SELECT name, encoding FROM employees")
-            rows = cur.fetchall()
-            self.known_names = [r[0] for r in rows]
-            self.known_encs = [np.frombuffer(r[1], dtype=np.float64) for r in rows]
+            rows = gallery_rows(conn, emp_id)
             conn.close()
+            if rows:
+                self.gallery.add(emp_id, rows[0][1], [r[2] for r in rows])
+                self.attendance.add_employee(emp_id)
+                self.stats.record_registration()
         except Exception as e:
             print(f"Database error: {e}")
 
@@ -101,6 +162,9 @@ class VisionGuardPro(ctk.CTk):
 
     def clear_main_area(self):
         self.is_monitoring = False
+        if self.pipeline:
+            self.pipeline.stop()
+            self.pipeline = None
         if self.cap:
             self.cap.release()
             self.cap = None
@@ -121,11 +185,27 @@ class VisionGuardPro(ctk.CTk):
         cam_frame = ctk.CTkFrame(self.main_container, border_width=2, border_color=ACCENT_COLOR, fg_color="black")
         cam_frame.pack(expand=True, fill="both", padx=40, pady=(0, 40))
 
-        self.cam_label = tk.Label(cam_frame, bg="black")
+        # No border: the renderer sizes the image to the label, a border would make it grow every frame
+        self.cam_label = tk.Label(cam_frame, bg="black", bd=0, highlightthickness=0)
         self.cam_label.pack(expand=True, fill="both", padx=5, pady=5)
+        self.metrics_panel = tk.Label(cam_frame, bg="black", fg="#2ecc71", font=("Courier", 9), justify="left", anchor="nw")
 
         self.cap = cv2.VideoCapture(0)
+        self.overlay = []
+        self.renderer = FrameRenderer()
+        self.metrics.gauge("frames_rendered", lambda r=self.renderer: r.rendered)
+        self.metrics.gauge("renders_throttled", lambda r=self.renderer: r.skipped)
+        self.tracker = FaceTracker(on_encoding=self.enroller.observe)
+        self.pipeline = RecognitionPipeline(self.recognize_frame, profiler=self.metrics.profiler)
+        self.pipeline.add_camera(0, self.cap)
+        self.metrics.register(self.tracker.policy.timings, component="detection", camera=0)
+        self.metrics.gauge("detection_scale", lambda policy=self.tracker.policy: policy.scale, camera=0)
+        self.pipeline.register_metrics(self.metrics)
+        self.pipeline.start()
         self.update_camera()
+        if self.show_metrics:
+            self.metrics_panel.place(x=10, y=10)
+            self.update_metrics_panel()
 
     def create_stat_card(self, parent, title, value, col):
         # Card background switches between White (Light) and Dark Gray (Dark)
@@ -142,95 +222,84 @@ class VisionGuardPro(ctk.CTk):
         return card
 
     def get_daily_stats(self):
-        conn = sqlite3.connect('data/attendance.db')
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM employees")
-        total = cur.fetchone()[0]
-        today = datetime.now().strftime('%Y-%m-%d')
-        cur.execute("SELECT COUNT(DISTINCT name) FROM attendance WHERE date=?", (today,))
-        present = cur.fetchone()[0]
-        conn.close()
-        return total, present
+        # Served from the in-memory counters; DailyStats reconciles with the DB in the background
+        return self.stats.snapshot()
 
     def refresh_stats_ui(self):
+        self.shown_stats_version = self.stats.version
         total, present = self.get_daily_stats()
         if self.total_lbl and self.total_lbl.winfo_exists():
             self.total_lbl.configure(text=str(total))
         if self.present_lbl and self.present_lbl.winfo_exists():
             self.present_lbl.configure(text=str(present))
 
+    def recognize_frame(self, camera_id, frame):
+        """Runs on a pipeline worker thread against the current gallery snapshot."""
+        return self.tracker.process(frame, self.gallery.snapshot())
+
     def update_camera(self):
-        if not self.is_monitoring or not self.cap: return
-        ret, frame = self.cap.read()
-        if ret:
-            h, w, _ = frame.shape
-            display = frame.copy()
-            zw, zh = 180, 180
-            cx, cy = w // 2, h // 2
-            zone = (cx - zw//2, cy - zh//2, cx + zw//2, cy + zh//2)
-            cv2.rectangle(display, (zone[0], zone[1]), (zone[2], zone[3]), (255, 255, 255), 1)
-
-            small = np.ascontiguousarray(cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), (0,0), fx=0.25, fy=0.25), dtype=np.uint8)
-            locs = face_recognition.face_locations(small)
-            encs = face_recognition.face_encodings(small, locs)
-
-            current_names = []
-            now_ts = time.time()
-
-            for (top, right, bottom, left), enc in zip(locs, encs):
-                matches = face_recognition.compare_faces(self.known_encs, enc)
-                if True in matches:
-                    name = self.known_names[matches.index(True)]
-                    current_names.append(name)
-
-                    if name in self.cooldowns:
-                        if now_ts - self.cooldowns[name] < 60:
-                            cv2.putText(display, f"{name} (Cooldown)", (left*4, top*4-10), 1, 1, (255, 165, 0), 2)
-                            continue
-                        else: del self.cooldowns[name]
-
-                    self.db_action(name, "check_in")
-                    t, r, b, l = top*4, right*4, bottom*4, left*4
-                    fx, fy = (l+r)//2, (t+b)//2
-                    if (zone[0] < fx < zone[2] and zone[1] < fy < zone[3]):
-                        cv2.rectangle(display, (zone[0], zone[1]), (zone[2], zone[3]), (0, 255, 0), 3)
-                        if name not in self.tracking: self.tracking[name] = now_ts
-                        else:
-                            if now_ts - self.tracking[name] >= 2:
-                                self.db_action(name, "check_out")
-                                self.cooldowns[name] = now_ts 
-                                if name in self.tracking: del self.tracking[name]
-                                cv2.putText(display, "LOGOUT SUCCESS", (cx-100, cy), 1, 1.5, (0, 255, 0), 2)
-                    else:
-                        if name in self.tracking: del self.tracking[name]
-                    cv2.rectangle(display, (l, t), (r, b), (0, 255, 0), 2)
-                    cv2.putText(display, name, (l, t-10), 1, 1, (0, 255, 0), 2)
-
-            img = Image.fromarray(cv2.cvtColor(display, cv2.COLOR_BGR2RGB))
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.cam_label.imgtk = imgtk
-            self.cam_label.configure(image=imgtk)
+        if not self.is_monitoring or not self.pipeline: return
+
+        with self.metrics.profiler.section(), self.ui_timings.stage("tick"):
+            # 1. Apply whatever the recognition workers finished since the last tick
+            with self.ui_timings.stage("apply_results"):
+                for camera_id, seq, ts, shape, faces in self.pipeline.poll_results():
+                    self.overlay = self.camera_state.apply(ts, shape, faces, self.db_action)
+                if self.stats.version != self.shown_stats_version:
+                    self.refresh_stats_ui()
+
+            # 2. Preview the newest camera frame (runs at camera FPS, independent of recognition).
+            # Nothing is drawn while the window is minimised or when frame and overlay are unchanged.
+            packet = self.pipeline.latest_frame()
+            if packet and self.cam_label.winfo_viewable():
+                seq, _, frame = packet
+                size = (self.cam_label.winfo_width(), self.cam_label.winfo_height())
+                if self.renderer.should_render(seq, self.overlay, size):
+                    with self.ui_timings.stage("render"):
+                        self.renderer.render(self.cam_label, seq, frame, self.overlay)
         self.after(15, self.update_camera)
 
-    def db_action(self, name, action):
-        conn = sqlite3.connect('data/attendance.db')
-        cur = conn.cursor()
-        date, now = datetime.now().strftime('%Y-%m-%d'), datetime.now().strftime('%H:%M:%S')
-        cur.execute("SELECT email, designation FROM employees WHERE name=?", (name,))
-        row = cur.fetchone()
-        updated = False
-        if row:
-            cur.execute("SELECT id, time_out FROM attendance WHERE name=? AND date=? ORDER BY id DESC LIMIT 1", (name, date))
-            last = cur.fetchone()
-            if action == "check_in" and (not last or last[1]):
-                cur.execute("INSERT INTO attendance (name, email, designation, date, time_in) VALUES (?,?,?,?,?)", (name, row[0], row[1], date, now))
-                updated = True
-            elif action == "check_out" and last and not last[1]:
-                cur.execute("UPDATE attendance SET time_out=? WHERE id=?", (now, last[0]))
-                updated = True
-        conn.commit()
-        conn.close()
-        if updated: self.refresh_stats_ui()
+    def db_action(self, emp_id, action):
+        # Answered from the writer's in-memory session state; only real transitions hit the DB
+        with self.ui_timings.stage("db_action"):
+            if action == "check_in":
+                updated = self.attendance.check_in(emp_id)
+            else:
+                updated = self.attendance.check_out(emp_id)
+            if updated and action == "check_in":
+                self.stats.record_check_in(emp_id)
+
+    # --- Metrics panel / dumps / profiling ---
+
+    def toggle_metrics_panel(self, event=None):
+        self.show_metrics = not self.show_metrics
+        if self.metrics_panel and self.metrics_panel.winfo_exists():
+            if self.show_metrics:
+                self.metrics_panel.place(x=10, y=10)
+                self.update_metrics_panel()
+            else:
+                self.metrics_panel.place_forget()
+
+    def update_metrics_panel(self):
+        # Percentiles are computed here, once a second, never on the frame path
+        if self.metrics_after:
+            self.after_cancel(self.metrics_after)
+            self.metrics_after = None
+        if not self.is_monitoring or not self.show_metrics: return
+        if self.metrics_panel and self.metrics_panel.winfo_exists():
+            self.metrics_panel.configure(text=self.metrics.format_panel())
+            self.metrics_after = self.after(1000, self.update_metrics_panel)
+
+    def dump_metrics(self, event=None):
+        try:
+            print(f"Metrics written to {self.metrics.dump(METRICS_DIR)}")
+        except OSError as e:
+            print(f"Metrics dump error: {e}")
+
+    def start_profile(self, event=None):
+        path = os.path.join(METRICS_DIR, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof")
+        if self.metrics.profiler.start(PROFILE_SECONDS, path):
+            print(f"Profiling for {PROFILE_SECONDS} s...")
 
     def show_registration(self):
         self.clear_main_area()
@@ -247,20 +316,28 @@ class VisionGuardPro(ctk.CTk):
 
     def do_registration(self):
         data = [e.get() for e in self.reg_entries]
-        if register_user_gui(*data):
+        emp_id = register_user_gui(*data)
+        if emp_id:
             for entry in self.reg_entries: entry.delete(0, tk.END)
             self.reg_entries[0].focus()
-            self.load_faces()
+            self.load_face(emp_id)
 
     def show_logs(self):
         self.clear_main_area()
         filter_frame = ctk.CTkFrame(self.main_container, fg_color=CARD_COLOR)
         filter_frame.pack(fill="x", pady=(0, 20), padx=20)
-        ctk.CTkLabel(filter_frame, text="Select Date:").grid(row=0, column=0, padx=15, pady=15)
-        self.date_picker = DateEntry(filter_frame, width=15, background='darkblue', foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd')
-        self.date_picker.grid(row=0, column=1, padx=10)
-        ctk.CTkButton(filter_frame, text="Filter Report", width=120, command=self.load_filtered_logs).grid(row=0, column=2, padx=20)
-        ctk.CTkButton(filter_frame, text="Clear", width=100, fg_color="gray", command=self.load_filtered_logs_all).grid(row=0, column=3)
+        ctk.CTkLabel(filter_frame, text="From:").grid(row=0, column=0, padx=(15, 5), pady=15)
+        self.date_from = DateEntry(filter_frame, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd')
+        self.date_from.grid(row=0, column=1, padx=5)
+        ctk.CTkLabel(filter_frame, text="To:").grid(row=0, column=2, padx=(15, 5))
+        self.date_to = DateEntry(filter_frame, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd')
+        self.date_to.grid(row=0, column=3, padx=5)
+        self.name_filter = ctk.CTkEntry(filter_frame, placeholder_text="Name", width=140)
+        self.name_filter.grid(row=0, column=4, padx=(15, 5))
+        self.desig_filter = ctk.CTkEntry(filter_frame, placeholder_text="Designation", width=140)
+        self.desig_filter.grid(row=0, column=5, padx=5)
+        ctk.CTkButton(filter_frame, text="Filter Report", width=120, command=self.load_filtered_logs).grid(row=0, column=6, padx=15)
+        ctk.CTkButton(filter_frame, text="Clear", width=100, fg_color="gray", command=self.load_filtered_logs_all).grid(row=0, column=7, padx=(0, 15))
 
         # Update Treeview colors based on theme
         bg_tree = "#FFFFFF" if ctk.get_appearance_mode() == "Light" else "#2b2b2b"
@@ -271,26 +348,70 @@ class VisionGuardPro(ctk.CTk):
         style.configure("Treeview", background=bg_tree, foreground=fg_tree, fieldbackground=bg_tree, rowheight=35)
         style.map("Treeview", background=[('selected', '#3498db')])
         
-        self.tree = ttk.Treeview(self.main_container, columns=("N", "E", "D", "Dt", "I", "O"), show="headings")
+        tree_frame = ctk.CTkFrame(self.main_container, fg_color="transparent")
+        tree_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        self.tree = ttk.Treeview(tree_frame, columns=("N", "E", "D", "Dt", "I", "O"), show="headings")
         for col, h in zip(self.tree["columns"], ["Name", "Email", "Designation", "Date", "In", "Out"]):
             self.tree.heading(col, text=h)
             self.tree.column(col, anchor="center", width=150)
-        self.tree.pack(fill="both", expand=True, padx=20, pady=10)
+        self.attach_pager_scrollbar(tree_frame, self.tree)
+        self.tree.pack(fill="both", expand=True, side="left")
         self.load_filtered_logs_all()
 
     def load_filtered_logs(self):
-        self.refresh_tree("SELECT name, email, designation, date, time_in, time_out FROM attendance WHERE date=?", (self.date_picker.get(),))
+        self.start_paging(self.tree, partial(attendance_page,
+                                             date_from=self.date_from.get(), date_to=self.date_to.get(),
+                                             name=self.name_filter.get().strip() or None,
+                                             designation=self.desig_filter.get().strip() or None))
 
     def load_filtered_logs_all(self):
-        self.refresh_tree("SELECT name, email, designation, date, time_in, time_out FROM attendance ORDER BY date DESC, time_in DESC")
-
-    def refresh_tree(self, query, params=()):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        conn = sqlite3.connect('data/attendance.db')
-        cur = conn.cursor()
-        cur.execute(query, params)
-        for row in cur.fetchall(): self.tree.insert("", "end", values=row)
-        conn.close()
+        self.name_filter.delete(0, tk.END)
+        self.desig_filter.delete(0, tk.END)
+        self.start_paging(self.tree, attendance_page)
+
+    # --- Paged Treeviews: rows are fetched one keyset page at a time on a background thread ---
+
+    def attach_pager_scrollbar(self, parent, tree):
+        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        tree.configure(yscrollcommand=lambda first, last: self.on_tree_scroll(scrollbar, first, last))
+
+    def on_tree_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        # Fetch the next page once the user gets close to the bottom
+        if float(last) > 0.9: self.load_next_page()
+
+    def start_paging(self, tree, fetch):
+        for i in tree.get_children(): tree.delete(i)
+        self.paged_tree, self.page_fetch, self.page_next = tree, fetch, None
+        self.page_loading = True
+        self.page_ticket = self.page_loader.submit(fetch)
+        self.poll_pages()
+
+    def load_next_page(self):
+        if self.page_loading or self.page_next is None: return
+        self.page_loading = True
+        self.page_ticket = self.page_loader.submit(self.page_fetch, self.page_next)
+        self.poll_pages()
+
+    def poll_pages(self):
+        if self.page_polling: return
+        if not self.paged_tree.winfo_exists():
+            # The view was left mid-load: drop its pages so the next view can load its own
+            self.page_loader.poll()
+            self.page_next, self.page_loading = None, False
+            return
+        for ticket, rows, next_key in self.page_loader.poll():
+            if ticket != self.page_ticket: continue
+            for row in rows: self.paged_tree.insert("", "end", values=row)
+            self.page_next, self.page_loading = next_key, False
+        if self.page_loading:
+            self.page_polling = True
+            self.after(30, self.resume_poll_pages)
+
+    def resume_poll_pages(self):
+        self.page_polling = False
+        self.poll_pages()
 
     def show_manage_staff(self):
         self.clear_main_area()
@@ -306,37 +427,60 @@ class VisionGuardPro(ctk.CTk):
         style.theme_use("clam")
         style.configure("Treeview", background=bg_tree, foreground=fg_tree, fieldbackground=bg_tree, rowheight=35)
 
-        self.emp_tree = ttk.Treeview(content_frame, columns=("ID", "N", "E", "P", "D"), show="headings")
+        tree_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
+        tree_frame.pack(fill="both", expand=True, side="left")
+        self.emp_tree = ttk.Treeview(tree_frame, columns=("ID", "N", "E", "P", "D"), show="headings")
         for col, h in zip(self.emp_tree["columns"], ["ID", "Name", "Email", "Phone", "Designation"]):
             self.emp_tree.heading(col, text=h); self.emp_tree.column(col, width=100, anchor="center")
+        self.attach_pager_scrollbar(tree_frame, self.emp_tree)
         self.emp_tree.pack(fill="both", expand=True, side="left")
+        # Photos are only loaded when a row is selected
+        self.emp_tree.bind("<<TreeviewSelect>>", self.show_employee_photo)
         
         action_frame = ctk.CTkFrame(content_frame, width=180, fg_color=CARD_COLOR)
         action_frame.pack(side="right", fill="y", padx=15)
+        self.photo_lbl = ctk.CTkLabel(action_frame, text="No photo", width=160, height=160)
+        self.photo_lbl.pack(pady=(30, 0), padx=15)
         ctk.CTkButton(action_frame, text="Delete Selected", fg_color="#e74c3c", hover_color="#c0392b", command=self.delete_employee).pack(pady=30, padx=15)
         self.load_all_employees()
 
+    def show_employee_photo(self, event=None):
+        selected = self.emp_tree.selection()
+        if not selected: return
+        thumb = load_thumbnail(self.emp_tree.item(selected[0])['values'][0])
+        if thumb:
+            img = Image.open(io.BytesIO(thumb))
+            photo = ctk.CTkImage(light_image=img, dark_image=img, size=img.size)
+            self.photo_lbl.configure(image=photo, text="")
+        else:
+            self.photo_lbl.configure(image=None, text="No photo")
+
     def load_all_employees(self):
-        for i in self.emp_tree.get_children(): self.emp_tree.delete(i)
-        conn = sqlite3.connect('data/attendance.db')
-        cur = conn.cursor()
-        cur.execute("SELECT id, name, email, phone, designation FROM employees")
-        for row in cur.fetchall(): self.emp_tree.insert("", "end", values=row)
-        conn.close()
+        self.start_paging(self.emp_tree, employee_page)
 
     def delete_employee(self):
         selected = self.emp_tree.selection()
         if not selected: return
-        emp_name = self.emp_tree.item(selected[0])['values'][1]
+        emp_id, emp_name = self.emp_tree.item(selected[0])['values'][:2]
         if messagebox.askyesno("Confirm", f"Delete {emp_name}?"):
             conn = sqlite3.connect('data/attendance.db')
             cur = conn.cursor()
             cur.execute("PRAGMA foreign_keys = ON")
-            cur.execute("DELETE FROM employees WHERE name=?", (emp_name,))
+            cur.execute("SELECT image_hash FROM employees WHERE id=?", (emp_id,))
+            row = cur.fetchone()
+            cur.execute("DELETE FROM employees WHERE id=?", (emp_id,))
+            if row and row[0]: release_image(cur, row[0])
             conn.commit(); conn.close()
-            self.load_all_employees(); self.load_faces(); self.refresh_stats_ui()
+            self.gallery.remove(emp_id)
+            self.attendance.remove_employee(emp_id)
+            self.stats.record_removal(emp_id)
+            self.load_all_employees(); self.refresh_stats_ui()
 
 if __name__ == "__main__":
-    if not os.path.exists('data'): os.makedirs('data')
+    # Creates the database or migrates an existing one in place to the current schema
+    init_db()
     app = VisionGuardPro()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+    app.stats.stop()
+    app.enroller.stop()
+    app.attendance.close()
\ No newline at end of file
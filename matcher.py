@@ -0,0 +1,147 @@
+import numpy as np
+
+ENCODING_SIZE = 128
+DEFAULT_TOLERANCE = 0.6     # Same cut-off face_recognition.compare_faces uses
+INDEX_MIN_SIZE = 5000       # Below this an exact scan is faster than probing buckets
+CHUNK_ROWS = 8192           # Rows per block when assigning the whole gallery to buckets
+
+
+def squared_distances(queries, matrix, matrix_sq_norms=None):
+    """Pairwise squared euclidean distances as one matrix product: |q|^2 + |m|^2 - 2 q.m"""
+    if matrix_sq_norms is None:
+        matrix_sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+    q_sq = np.einsum('ij,ij->i', queries, queries)
+    d = q_sq[:, None] + matrix_sq_norms[None, :] - 2.0 * (queries @ matrix.T)
+    np.maximum(d, 0, out=d)
+    return d
+
+
+def kmeans(data, k, iters=10, sample_per_bucket=64, seed=0):
+    """
+    Plain Lloyd's k-means on a random sample of the rows.
+    Good enough to partition face encodings into buckets; returns the centroids.
+    """
+    rng = np.random.default_rng(seed)
+    if len(data) > k * sample_per_bucket:
+        sample = data[rng.choice(len(data), k * sample_per_bucket, replace=False)]
+    else:
+        sample = data
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = squared_distances(sample, centroids).argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def assign_buckets(matrix, centroids):
+    """Index of the closest centroid for every row, in blocks of CHUNK_ROWS."""
+    assign = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), CHUNK_ROWS):
+        block = matrix[start:start + CHUNK_ROWS]
+        assign[start:start + CHUNK_ROWS] = squared_distances(block, centroids).argmin(axis=1)
+    return assign
+
+
+class FaceMatcher:
+    """
+    Nearest-identity search over all known encodings held in one contiguous matrix.
+
+    match() takes every face found in a frame at once and returns, for each of them,
+    (label, distance) of the closest known encoding, or (None, distance) when even the
+    closest one is further away than the threshold. Once the gallery reaches
+    `index_min_size` rows it is partitioned into k-means buckets and only the
+    `n_probe` buckets closest to each face are scanned.
+
+    Rows where `valid` is False are kept in the matrix but can never be matched,
+    which lets a caller retire rows without copying the whole matrix.
+
+    k-means is the slow part of building the index, so a caller may pass the
+    `centroids` of an earlier matcher and the bucket of every row it already knows
+    (`assign`, -1 for new rows); `self.assign` then holds every row's bucket, in the
+    caller's row order, for the next time.
+    """
+
+    def __init__(self, encodings, labels, threshold=DEFAULT_TOLERANCE, dtype=np.float32,
+                 index_min_size=INDEX_MIN_SIZE, n_probe=8, valid=None, centroids=None, assign=None):
+        self.labels = list(labels)
+        self.threshold = threshold
+        self.dtype = dtype
+        self.n_probe = n_probe
+
+        matrix = np.asarray(encodings, dtype=dtype)
+        self.matrix = np.ascontiguousarray(matrix.reshape(-1, ENCODING_SIZE))
+        if len(self.matrix) != len(self.labels):
+            raise ValueError("encodings and labels must have the same length")
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        if valid is not None:
+            self.sq_norms[~np.asarray(valid, dtype=bool)] = np.inf
+
+        self.centroids = None
+        self.assign = None
+        if len(self.matrix) >= index_min_size:
+            self.build_index(centroids=centroids, assign=assign)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def build_index(self, n_buckets=None, centroids=None, assign=None):
+        """Partitions the gallery into k-means buckets (about sqrt(n) of them)."""
+        n = len(self.matrix)
+        if centroids is None:
+            k = n_buckets or max(1, int(np.sqrt(n)))
+            self.centroids = kmeans(self.matrix, k)
+            assign = None
+        else:
+            k = len(centroids)
+            self.centroids = np.asarray(centroids, dtype=self.dtype)
+
+        if assign is None:
+            assign = assign_buckets(self.matrix, self.centroids)
+        else:
+            assign = np.array(assign, dtype=np.int64)
+            new = np.flatnonzero(assign < 0)
+            if len(new):
+                assign[new] = assign_buckets(self.matrix[new], self.centroids)
+        self.assign = assign
+
+        # Reorder rows so every bucket is one contiguous slice of the matrix
+        order = np.argsort(assign, kind='stable')
+        self.matrix = np.ascontiguousarray(self.matrix[order])
+        self.sq_norms = self.sq_norms[order]
+        self.labels = np.array(self.labels)[order].tolist()
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=k))))
+
+    def nearest(self, encodings):
+        """Returns (row indices, euclidean distances) of the closest gallery row for each query."""
+        queries = np.asarray(encodings, dtype=self.dtype).reshape(-1, ENCODING_SIZE)
+        if len(queries) == 0 or len(self.matrix) == 0:
+            return np.full(len(queries), -1), np.full(len(queries), np.inf)
+
+        if self.centroids is None:
+            d = squared_distances(queries, self.matrix, self.sq_norms)
+            idx = d.argmin(axis=1)
+            return idx, np.sqrt(d[np.arange(len(queries)), idx])
+
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argpartition(squared_distances(queries, self.centroids), n_probe - 1, axis=1)[:, :n_probe]
+        idx = np.empty(len(queries), dtype=np.int64)
+        dist = np.empty(len(queries))
+        for i, buckets in enumerate(probes):
+            rows = np.concatenate([np.arange(self.offsets[b], self.offsets[b + 1]) for b in buckets])
+            if len(rows) == 0:
+                rows = np.arange(len(self.matrix))
+            d = squared_distances(queries[i:i + 1], self.matrix[rows], self.sq_norms[rows])[0]
+            best = d.argmin()
+            idx[i], dist[i] = rows[best], np.sqrt(d[best])
+        return idx, dist
+
+    def match(self, encodings, threshold=None):
+        """Returns [(label or None, distance)] for every query encoding."""
+        threshold = self.threshold if threshold is None else threshold
+        idx, dist = self.nearest(encodings)
+        return [(self.labels[i] if d <= threshold else None, float(d)) for i, d in zip(idx, dist)]
@@ -0,0 +1,308 @@
+"""
+Instrumentation for the recognition hot path.
+
+Components time their own stages with a StageTimings (a perf_counter pair and a deque
+append per sample, cheap enough to leave on); whoever wires the components together
+registers those timings and a few gauges (queue depths, FPS, dropped frames) on a
+Metrics registry. Percentiles are only computed when a snapshot is taken, i.e. when
+the on-screen panel refreshes or a dump is written.
+
+    metrics = Metrics()
+    metrics.register(policy.timings, camera=0)
+    metrics.gauge("result_queue_depth", pipeline.result_queue.qsize)
+    metrics.dump("data/metrics")            # metrics.json + metrics.prom
+    metrics.profiler.start(10, "data/metrics/profile.prof")
+"""
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 1024           # Samples kept per stage for the rolling percentiles
+ONE_PROFILER = sys.version_info >= (3, 12)   # cProfile can be enabled on one thread at a time
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StageTimings:
+    """
+    Wall-clock time per stage: moving average, last value, call count and the last
+    `window` samples for p50/p95/p99. Safe to call from several threads.
+    """
+
+    def __init__(self, window=WINDOW, alpha=0.1):
+        self.window = window
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.ema = {}
+        self.last = {}
+        self.calls = {}
+        self.samples = {}       # stage -> deque of ms
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        ms = seconds * 1000
+        with self.lock:
+            old = self.ema.get(name)
+            if old is None:
+                self.ema[name] = ms
+                self.samples[name] = deque(maxlen=self.window)
+            else:
+                self.ema[name] = old + self.alpha * (ms - old)
+            self.last[name] = ms
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.samples[name].append(ms)
+
+    def as_dict(self):
+        with self.lock:
+            copies = {name: (sorted(self.samples[name]), self.ema[name], self.last[name], self.calls[name])
+                      for name in self.ema}
+        return {name: {"ms": round(ema, 2), "last_ms": round(last, 2), "calls": calls,
+                       "p50_ms": round(percentile(s, 50), 2), "p95_ms": round(percentile(s, 95), 2),
+                       "p99_ms": round(percentile(s, 99), 2)}
+                for name, (s, ema, last, calls) in copies.items()}
+
+
+class Profiler:
+    """
+    On-demand cProfile capture. cProfile only sees the thread it is enabled on, so
+    the hot loops wrap each iteration in section(). Before Python 3.12 every such
+    thread profiles into its own cProfile.Profile and the results are merged into one
+    .prof file (plus a top-functions .txt) when the capture ends. From 3.12 on only one
+    cProfile can be active in the process, so only one thread is profiled: `thread`
+    (a thread name) or else the first one to enter section(). Sections that ran
+    without the profiler are counted per thread and listed at the top of the .txt.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.cond = threading.Condition()
+        self.busy = 0
+        self.profiles = []
+        self.local = threading.local()
+        self.thread = None
+        self.sections = {}      # thread name -> [profiled sections, unprofiled sections]
+        self.path = None
+        self.last_report = None
+
+    def start(self, seconds, path, thread=None):
+        """
+        Profiles for `seconds`, then writes `path`. `thread` limits the capture to the
+        thread with that name. Returns False if a capture is already running.
+        """
+        with self.cond:
+            if self.active:
+                return False
+            self.active, self.profiles, self.path = True, [], path
+            self.thread, self.sections = thread, {}
+            self.local = threading.local()
+        timer = threading.Timer(seconds, self._finish)
+        timer.daemon = True
+        timer.start()
+        return True
+
+    @contextmanager
+    def section(self):
+        if not self.active:
+            yield
+            return
+        name = threading.current_thread().name
+        profile = getattr(self.local, "profile", None)
+        with self.cond:
+            if ONE_PROFILER and self.thread is None:
+                self.thread = name
+            counts = self.sections.setdefault(name, [0, 0])
+            if self.thread is not None and name != self.thread:
+                counts[1] += 1
+                profile = False
+            elif profile is None:
+                profile = self.local.profile = cProfile.Profile()
+                self.profiles.append(profile)
+            self.busy += 1
+        enabled = False
+        if profile:
+            try:
+                profile.enable()
+                enabled = True
+            except ValueError:
+                # Another profiler (e.g. a debugger's) already holds the process
+                with self.cond:
+                    counts[1] += 1
+        try:
+            yield
+        finally:
+            if enabled:
+                profile.disable()
+            with self.cond:
+                if enabled:
+                    counts[0] += 1
+                self.busy -= 1
+                self.cond.notify_all()
+
+    def unprofiled(self):
+        """Sections that ran without the profiler in the current (or last) capture."""
+        with self.cond:
+            return sum(skipped for _, skipped in self.sections.values())
+
+    def _finish(self):
+        with self.cond:
+            self.active = False
+            self.cond.wait_for(lambda: self.busy == 0, timeout=5.0)
+            profiles, path = self.profiles, self.path
+            sections = {name: tuple(counts) for name, counts in self.sections.items()}
+        profiled = sorted(name for name, (done, _) in sections.items() if done)
+        skipped = sum(s for _, s in sections.values())
+        if not profiled:
+            print(f"Profiler: no instrumented code was profiled during the capture ({skipped} sections skipped)")
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        text = io.StringIO()
+        text.write(f"Profiled threads: {', '.join(profiled)}\n")
+        if ONE_PROFILER:
+            text.write("Python 3.12+ runs one cProfile at a time, so other threads are not in this profile.\n")
+        for name, (done, missed) in sorted(sections.items()):
+            text.write(f"  {name}: {done} sections profiled, {missed} not\n")
+        pstats.Stats(path, stream=text).sort_stats("cumulative").print_stats(40)
+        with open(path + ".txt", "w") as f:
+            f.write(text.getvalue())
+        self.last_report = path
+        print(f"Profile of {', '.join(profiled)} written to {path} ({skipped} sections on other threads not profiled)")
+
+
+class Metrics:
+    """Registry of labelled StageTimings and gauges, dumpable as JSON or Prometheus text."""
+
+    def __init__(self, prefix="visionguard"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.timings = {}       # labels tuple -> StageTimings
+        self.gauges = {}        # (name, labels tuple) -> callable returning a number
+        self.profiler = Profiler()
+
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def register(self, timings, **labels):
+        """Adds (or replaces) the StageTimings reported under `labels`."""
+        with self.lock:
+            self.timings[self._labels(labels)] = timings
+        return timings
+
+    def gauge(self, name, read, **labels):
+        """`read()` is called at snapshot time; errors and None are reported as 0."""
+        with self.lock:
+            self.gauges[(name, self._labels(labels))] = read
+
+    def snapshot(self):
+        with self.lock:
+            timings = list(self.timings.items())
+            gauges = list(self.gauges.items())
+        stages = []
+        for labels, t in timings:
+            for stage, values in sorted(t.as_dict().items()):
+                stages.append({"stage": stage, "labels": dict(labels), **values})
+        values = []
+        for (name, labels), read in gauges:
+            try:
+                value = read() or 0
+            except Exception:
+                value = 0
+            values.append({"name": name, "labels": dict(labels), "value": value})
+        return {"time": time.time(), "stages": stages, "gauges": values}
+
+    def to_prometheus(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        p = self.prefix
+        lines = [f"# TYPE {p}_stage_seconds summary"]
+        for s in snapshot["stages"]:
+            base = ",".join([f'stage="{s["stage"]}"'] + [f'{k}="{v}"' for k, v in s["labels"].items()])
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'{p}_stage_seconds{{{base},quantile="{q}"}} {s[key] / 1000:.6f}')
+            lines.append(f"{p}_stage_seconds_count{{{base}}} {s['calls']}")
+        seen = set()
+        for g in snapshot["gauges"]:
+            name = f"{p}_{g['name']}"
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            labels = ",".join(f'{k}="{v}"' for k, v in g["labels"].items())
+            lines.append(f"{name}{{{labels}}} {g['value']}" if labels else f"{name} {g['value']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory):
+        """Writes metrics.json and metrics.prom into `directory` (atomically, for scrapers)."""
+        os.makedirs(directory, exist_ok=True)
+        snapshot = self.snapshot()
+        for name, text in (("metrics.json", json.dumps(snapshot, indent=1)),
+                           ("metrics.prom", self.to_prometheus(snapshot))):
+            path = os.path.join(directory, name)
+            with open(path + ".tmp", "w") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+        return directory
+
+    def format_panel(self, snapshot=None):
+        """Short multi-line text for the on-screen metrics panel."""
+        snapshot = snapshot or self.snapshot()
+        lines = []
+        for s in snapshot["stages"]:
+            where = " ".join(f"{v}" for v in s["labels"].values())
+            lines.append(f"{where:>6} {s['stage']:<12} p50 {s['p50_ms']:6.1f}  p95 {s['p95_ms']:6.1f}  "
+                         f"p99 {s['p99_ms']:6.1f} ms")
+        for g in snapshot["gauges"]:
+            where = " ".join(f"{v}" for v in g["labels"].values())
+            value = g["value"]
+            lines.append(f"{where:>6} {g['name']:<20} {value:.1f}" if isinstance(value, float)
+                         else f"{where:>6} {g['name']:<20} {value}")
+        if self.profiler.active:
+            lines.append(f"profiling {self.profiler.thread or 'all threads'}... "
+                         f"({self.profiler.unprofiled()} sections not profiled)")
+        return "\n".join(lines)
+
+
+class MetricsDumper(threading.Thread):
+    """Rewrites the metrics files every `interval` seconds until stopped."""
+
+    def __init__(self, metrics, directory, interval=10.0):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.directory = directory
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.metrics.dump(self.directory)
+            except OSError as e:
+                print(f"Metrics dump error: {e}")
+
+    def stop(self):
+        self.stopped.set()
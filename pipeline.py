@@ -0,0 +1,259 @@
+import threading
+import queue
+import time
+
+import cv2
+
+from metrics import StageTimings, Profiler
+
+
+def put_latest(q, item):
+    """
+    Puts an item on a bounded queue, discarding the oldest entries when it is full.
+    Returns the number of entries that had to be dropped.
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+def open_source(source):
+    """Opens a device index ("0"), a video file or a stream URL with OpenCV."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source)
+
+
+class CameraStats:
+    """Per-camera counters. Rates and latency are exponential moving averages."""
+
+    def __init__(self):
+        self.frames = 0
+        self.dropped = 0
+        self.recognized = 0
+        self.capture_fps = 0.0
+        self.recognition_fps = 0.0
+        self.latency_ms = 0.0
+        self._last_frame = None
+        self._last_result = None
+
+    @staticmethod
+    def _ema(old, new, alpha=0.1):
+        return new if old == 0 else old + alpha * (new - old)
+
+    def on_frame(self, ts):
+        self.frames += 1
+        if self._last_frame is not None and ts > self._last_frame:
+            self.capture_fps = self._ema(self.capture_fps, 1.0 / (ts - self._last_frame))
+        self._last_frame = ts
+
+    def on_result(self, frame_ts, done_ts):
+        self.recognized += 1
+        self.latency_ms = self._ema(self.latency_ms, (done_ts - frame_ts) * 1000)
+        if self._last_result is not None and done_ts > self._last_result:
+            self.recognition_fps = self._ema(self.recognition_fps, 1.0 / (done_ts - self._last_result))
+        self._last_result = done_ts
+
+    def as_dict(self):
+        return {"frames": self.frames, "dropped": self.dropped, "recognized": self.recognized,
+                "capture_fps": round(self.capture_fps, 1), "recognition_fps": round(self.recognition_fps, 1),
+                "latency_ms": round(self.latency_ms, 1)}
+
+
+class CaptureThread(threading.Thread):
+    """
+    Reads frames from an opened cv2.VideoCapture as fast as the camera delivers them
+    and hands each one to the pipeline, which only ever keeps the newest.
+    Video files are paced at their own frame rate and end the thread at EOF.
+    """
+
+    def __init__(self, camera_id, cap, pipeline, is_file=False):
+        super().__init__(daemon=True)
+        self.camera_id = camera_id
+        self.cap = cap
+        self.pipeline = pipeline
+        self.is_file = is_file
+        self.running = True
+        self.finished = False
+        self.latest = None      # (seq, timestamp, frame)
+        self.seq = 0
+        fps = cap.get(cv2.CAP_PROP_FPS) if is_file else 0
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 0
+
+    def run(self):
+        next_due = time.monotonic()
+        timings = self.pipeline.timings
+        while self.running:
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            # Includes waiting for the camera, so on a live device this is ~1/fps
+            timings.add(f"capture_{self.camera_id}", time.perf_counter() - start)
+            if not ret:
+                if self.is_file:
+                    break
+                time.sleep(0.01)
+                continue
+            if self.frame_interval:
+                next_due += self.frame_interval
+                time.sleep(max(0, next_due - time.monotonic()))
+            self.seq += 1
+            packet = (self.seq, time.time(), frame)
+            self.latest = packet
+            self.pipeline.submit(self.camera_id, packet)
+        self.finished = True
+
+    def stop(self):
+        self.running = False
+
+
+class RecognitionPipeline:
+    """
+    N capture threads -> one shared recognition worker pool -> result queue.
+
+    Every camera has a single pending-frame slot: a new frame replaces the one still
+    waiting, so stale frames are dropped under load instead of queueing. Workers always
+    take the camera whose pending frame is oldest, which keeps busy cameras from
+    starving quiet ones. A camera has at most one frame in flight, so per-camera
+    tracking state sees its frames in order.
+
+    `recognize(camera_id, frame)` is called on a worker thread with a BGR frame and must
+    return a list of per-face tuples (see recognition.recognize_frame). The Tk loop or the headless
+    service only ever calls latest_frame() and poll_results(), so it never blocks on dlib.
+
+    `timings` records how long frames wait for a worker ("queue_wait") and how long
+    recognize takes per frame; worker iterations run inside `profiler.section()`.
+    """
+
+    def __init__(self, recognize, workers=2, result_size=32, profiler=None):
+        self.recognize = recognize
+        self.timings = StageTimings()
+        self.profiler = profiler or Profiler()
+        self.cond = threading.Condition()
+        self.pending = {}       # camera id -> (seq, timestamp, frame) waiting for a worker
+        self.cameras = {}       # camera id -> CaptureThread
+        self.stats = {}         # camera id -> CameraStats
+        self.result_queue = queue.Queue(maxsize=result_size)
+        self.workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        self.running = False
+        self.last_result_seq = {}
+        self.in_flight = set()  # cameras with a frame currently on a worker
+
+    def add_camera(self, camera_id, cap, is_file=False):
+        thread = CaptureThread(camera_id, cap, self, is_file)
+        self.cameras[camera_id] = thread
+        self.stats[camera_id] = CameraStats()
+        self.last_result_seq[camera_id] = 0
+        if self.running:
+            thread.start()
+        return thread
+
+    def start(self):
+        self.running = True
+        for thread in self.cameras.values():
+            thread.start()
+        for w in self.workers:
+            w.start()
+
+    def stop(self, timeout=1.0):
+        """Stops all stages. Call before releasing the capture devices."""
+        self.running = False
+        for thread in self.cameras.values():
+            thread.stop()
+        with self.cond:
+            self.cond.notify_all()
+        for thread in self.cameras.values():
+            if thread.is_alive():
+                thread.join(timeout)
+        for w in self.workers:
+            w.join(timeout)
+
+    def submit(self, camera_id, packet):
+        stats = self.stats[camera_id]
+        stats.on_frame(packet[1])
+        with self.cond:
+            if camera_id in self.pending:
+                stats.dropped += 1
+            self.pending[camera_id] = packet
+            self.cond.notify()
+
+    def _next_job(self):
+        with self.cond:
+            ready = [c for c in self.pending if c not in self.in_flight]
+            while self.running and not ready:
+                self.cond.wait(0.1)
+                ready = [c for c in self.pending if c not in self.in_flight]
+            if not ready:
+                return None
+            camera_id = min(ready, key=lambda c: self.pending[c][1])
+            self.in_flight.add(camera_id)
+            return camera_id, self.pending.pop(camera_id)
+
+    def _worker(self):
+        while self.running:
+            job = self._next_job()
+            if job is None:
+                continue
+            camera_id, (seq, ts, frame) = job
+            try:
+                self.timings.add("queue_wait", max(0.0, time.time() - ts))
+                with self.profiler.section(), self.timings.stage("recognize"):
+                    faces = self.recognize(camera_id, frame)
+                self.stats[camera_id].on_result(ts, time.time())
+                put_latest(self.result_queue, (camera_id, seq, ts, frame.shape[:2], faces))
+            except Exception as e:
+                print(f"Recognition error on camera {camera_id}: {e}")
+            finally:
+                with self.cond:
+                    self.in_flight.discard(camera_id)
+                    self.cond.notify()
+
+    def latest_frame(self, camera_id=0):
+        """Returns the newest (seq, timestamp, frame) from a camera, or None."""
+        thread = self.cameras.get(camera_id)
+        return thread.latest if thread else None
+
+    def poll_results(self):
+        """
+        Drains the result queue and returns the results newer than anything seen so far
+        for their camera, oldest first. Results that finish out of order are discarded.
+        """
+        results = []
+        while True:
+            try:
+                results.append(self.result_queue.get_nowait())
+            except queue.Empty:
+                break
+        results.sort(key=lambda r: r[2])
+        fresh = []
+        for r in results:
+            if r[1] > self.last_result_seq.get(r[0], 0):
+                self.last_result_seq[r[0]] = r[1]
+                fresh.append(r)
+        return fresh
+
+    def idle(self):
+        """True once every camera has ended and all of their frames are processed."""
+        with self.cond:
+            busy = self.in_flight or self.pending
+        return not busy and self.result_queue.empty() and all(t.finished for t in self.cameras.values())
+
+    @property
+    def dropped(self):
+        return sum(s.dropped for s in self.stats.values())
+
+    def register_metrics(self, metrics, **labels):
+        """Publishes the pipeline's timings, queue depths, FPS and drop counts on a metrics.Metrics."""
+        metrics.register(self.timings, component="pipeline", **labels)
+        metrics.gauge("pending_frames", lambda: len(self.pending), **labels)
+        metrics.gauge("result_queue_depth", self.result_queue.qsize, **labels)
+        for camera_id, stats in self.stats.items():
+            for key in ("capture_fps", "recognition_fps", "latency_ms", "frames", "dropped"):
+                metrics.gauge(key, lambda s=stats, k=key: getattr(s, k), camera=camera_id, **labels)
@@ -0,0 +1,18 @@
+from detection import DetectionPolicy
+
+
+def recognize_frame(frame, snapshot, policy=None):
+    """
+    Detects, encodes and matches every face in a BGR frame against a GallerySnapshot.
+    Returns [(employee_id, name, (top, right, bottom, left), track_id)] in full-frame
+    coordinates; id and name are None for unknown faces and track_id is always None here.
+    Without a `policy` the whole frame is searched at the fixed default scale.
+    """
+    policy = policy or DetectionPolicy(adaptive=False, roi=False)
+    detection = policy.detect(frame)
+    encs = policy.encode(detection)
+
+    # One batched nearest-neighbour search for every face in the frame
+    with policy.timings.stage("match"):
+        matches = snapshot.match(encs)
+    return [(emp_id, name, box, None) for box, (emp_id, name, _) in zip(detection.boxes, matches)]
@@ -1,14 +1,19 @@
 import cv2
-import face_recognition
 import sqlite3
-import numpy as np
-import os
+import time
 from tkinter import messagebox
+from image_store import store_image
+from detection import DetectionPolicy
+from enrollment import capture_burst, select_samples, encode_samples
+from templates import save_templates, centroid
+
+PREVIEW_SCALE = 0.5             # The preview rectangle only needs a rough location
+PREVIEW_DETECT_INTERVAL = 0.2   # Seconds between preview detections; boxes are reused in between
 
 def register_user_gui(name, email, phone, desig):
     """
     Validates user data, checks for duplicates, and captures face encoding/image.
-    Returns True if registration is successful, False otherwise.
+    Returns the new employee id if registration is successful, False otherwise.
     """
     
     # 1. Validation: Check if any fields are empty
@@ -48,9 +53,12 @@ def register_user_gui(name, email, phone, desig):
         conn.close()
         return False
 
-    messagebox.showinfo("Face Capture", "Data Validated!\n\n1. Look at the camera.\n2. Press 'S' to Capture & Save.\n3. Press 'Q' to Cancel.")
+    messagebox.showinfo("Face Capture", "Data Validated!\n\n1. Look at the camera.\n2. Press 'S' to Capture & Save, then turn your head slowly for a couple of seconds.\n3. Press 'Q' to Cancel.")
 
     registration_success = False
+    preview = DetectionPolicy("fast", PREVIEW_SCALE, adaptive=False, roi=False)
+    face_locations = []
+    next_detect = 0
 
     while True:
         ret, frame = cam.read()
@@ -60,10 +68,11 @@ def register_user_gui(name, email, phone, desig):
 
         # Display UI feedback on the camera frame
         display_frame = frame.copy()
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
-        # Detect faces for visual rectangle
-        face_locations = face_recognition.face_locations(rgb_frame)
+        # Detect faces for visual rectangle (downscaled, a few times per second)
+        if time.monotonic() >= next_detect:
+            face_locations = preview.detect(frame).boxes
+            next_detect = time.monotonic() + PREVIEW_DETECT_INTERVAL
         for (top, right, bottom, left) in face_locations:
             cv2.rectangle(display_frame, (left, top), (right, bottom), (0, 255, 0), 2)
             cv2.putText(display_frame, "Face Detected", (left, top - 10), 
@@ -76,33 +85,35 @@ def register_user_gui(name, email, phone, desig):
         # Press 'S' to Save
         if key == ord('s'):
             if len(face_locations) > 0:
-                # Generate face encoding (the 128D mathematical map)
-                encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+                # Capture a burst, keep the best few samples (size, sharpness, pose spread) and
+                # generate their face encodings (the 128D mathematical map) with the accurate profile
+                samples = encode_samples(select_samples(capture_burst(cam, preview, "Enrollment - Press 'S' to Save")))
                 
-                if len(encodings) > 0:
-                    encoding_blob = encodings[0].tobytes() # Convert numpy array to binary
+                if len(samples) > 0:
+                    encodings = [s.encoding for s in samples]
+                    encoding_blob = centroid(encodings).tobytes() # Convert numpy array to binary
                     
-                    # Convert the frame to JPG format bytes (Profile Image)
-                    success, buffer = cv2.imencode('.jpg', frame)
-                    if success:
-                        image_blob = buffer.tobytes()
-
-                        try:
-                            # Insert into Database
+                    try:
+                        # Store the best sample as the profile image (JPG + thumbnail), keyed by its hash
+                        image_hash = store_image(cursor, samples[0].frame)
+                        if image_hash:
+                            # Insert into Database: the centroid on the employee row, every sample as a template
                             cursor.execute("""
-                                INSERT INTO employees (name, email, phone, designation, encoding, image) 
+                                INSERT INTO employees (name, email, phone, designation, encoding, image_hash) 
                                 VALUES (?, ?, ?, ?, ?, ?)
-                            """, (name, email, phone, desig, encoding_blob, image_blob))
+                            """, (name, email, phone, desig, encoding_blob, image_hash))
+                            emp_id = cursor.lastrowid
+                            save_templates(cursor, emp_id, encodings, [s.quality for s in samples])
                             
                             conn.commit()
-                            messagebox.showinfo("Success", f"Registration complete for {name}!")
-                            registration_success = True
-                            break
-                        except sqlite3.IntegrityError:
-                            messagebox.showerror("Error", "Database integrity error. Possible duplicate during save.")
+                            messagebox.showinfo("Success", f"Registration complete for {name} ({len(samples)} face samples)!")
+                            registration_success = emp_id
                             break
+                    except sqlite3.IntegrityError:
+                        messagebox.showerror("Error", "Database integrity error. Possible duplicate during save.")
+                        break
                 else:
-                    messagebox.showwarning("Processing Error", "Could not process face. Please stay still and try again.")
+                    messagebox.showwarning("Processing Error", "No sharp, large enough face in the capture. Please stay close, hold still and try again.")
             else:
                 messagebox.showwarning("No Face", "No face detected in the frame. Please look at the camera.")
 
@@ -0,0 +1,236 @@
+"""
+Attendance reports for payroll: per-employee daily rows and period summaries.
+
+    python reports.py --month 2026-10 --daily daily.csv --summary summary.csv
+    python reports.py --from 2026-01-01 --to 2026-03-31 --columnar q1.vgc --late-after 09:15
+
+Attendance rows are streamed from SQLite in (employee, date) index order and
+aggregated in a single pass, so memory use does not grow with the table. Daily rows
+can be written as CSV and/or in a compact columnar format (see ColumnarWriter);
+summaries are small and always written as CSV.
+"""
+import argparse
+import calendar
+import csv
+import json
+import sqlite3
+import struct
+import zlib
+from array import array
+from datetime import datetime, date
+
+from database import DB_PATH, init_db
+
+FETCH_SIZE = 5000
+
+DAILY_COLUMNS = [("employee_id", "int"), ("name", "str"), ("designation", "str"), ("date", "str"),
+                 ("sessions", "int"), ("first_in", "int"), ("last_out", "int"), ("worked_seconds", "int"),
+                 ("late", "int"), ("missing_checkout", "int")]
+SUMMARY_COLUMNS = ["employee_id", "name", "designation", "days_present", "hours_worked",
+                   "late_days", "missing_checkouts"]
+
+
+def stream_attendance(conn, date_from, date_to):
+    """Yields (employee_id, date, ts_in, ts_out) ordered by employee, day and session."""
+    cur = conn.cursor()
+    # Walking the (employee_id, date) index returns rows already in order, so SQLite
+    # streams them instead of sorting the whole period into a temp b-tree first. Without
+    # ANALYZE statistics (the app never runs it) the planner picks idx_attendance_date and
+    # sorts, hence the hint. The index exists from schema v2 on; main() runs init_db.
+    cur.execute("""SELECT employee_id, date, ts_in, ts_out FROM attendance INDEXED BY idx_attendance_employee_date
+                   WHERE date BETWEEN ? AND ? ORDER BY employee_id, date, id""", (date_from, date_to))
+    while True:
+        rows = cur.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+
+def daily_rows(conn, date_from, date_to, late_after="09:00:00"):
+    """
+    Single pass over the attendance stream, one dict per employee and day.
+    Only the day currently being aggregated is held in memory.
+    """
+    employees = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT id, name, designation FROM employees")}
+    today = date.today().isoformat()
+    day = None
+    for emp_id, day_str, ts_in, ts_out in stream_attendance(conn, date_from, date_to):
+        if day is None or (emp_id, day_str) != (day["employee_id"], day["date"]):
+            if day is not None:
+                yield day
+            name, desig = employees.get(emp_id, ("", ""))
+            day = {"employee_id": emp_id, "name": name, "designation": desig, "date": day_str,
+                   "sessions": 0, "first_in": ts_in, "last_out": 0, "worked_seconds": 0,
+                   "late": int(datetime.fromtimestamp(ts_in).strftime('%H:%M:%S') > late_after),
+                   "missing_checkout": 0}
+        day["sessions"] += 1
+        if ts_out:
+            day["worked_seconds"] += max(0, ts_out - ts_in)
+            day["last_out"] = max(day["last_out"], ts_out)
+        elif day_str < today:
+            # Still open on a day that is over: nobody checked out
+            day["missing_checkout"] += 1
+    if day is not None:
+        yield day
+
+
+def summarize(days):
+    """Folds the daily stream (ordered by employee) into one summary row per employee."""
+    current = None
+    for d in days:
+        if current is None or d["employee_id"] != current["employee_id"]:
+            if current is not None:
+                yield finish_summary(current)
+            current = {"employee_id": d["employee_id"], "name": d["name"], "designation": d["designation"],
+                       "days_present": 0, "worked_seconds": 0, "late_days": 0, "missing_checkouts": 0}
+        current["days_present"] += 1
+        current["worked_seconds"] += d["worked_seconds"]
+        current["late_days"] += d["late"]
+        current["missing_checkouts"] += d["missing_checkout"]
+        yield d     # Pass the day through so one pass can feed several outputs
+    if current is not None:
+        yield finish_summary(current)
+
+
+def finish_summary(s):
+    s = dict(s)
+    s["hours_worked"] = round(s.pop("worked_seconds") / 3600, 2)
+    s["summary"] = True
+    return s
+
+
+class ColumnarWriter:
+    """
+    Compact columnar file: a JSON schema line, then row groups. In each row group
+    every column is stored separately and zlib-compressed; integers as int64
+    arrays, strings dictionary-encoded (unique values + int32 codes). Only one row
+    group is buffered at a time. Read it back with read_columnar().
+    """
+
+    MAGIC = b"VGCOL1\n"
+
+    def __init__(self, path, columns, group_size=65536):
+        self.columns = columns
+        self.group_size = group_size
+        self.file = open(path, "wb")
+        self.file.write(self.MAGIC)
+        self.file.write(json.dumps(columns).encode() + b"\n")
+        self.buffer = {name: [] for name, _ in columns}
+        self.rows = 0
+
+    def write(self, row):
+        for name, _ in self.columns:
+            self.buffer[name].append(row[name])
+        self.rows += 1
+        if len(self.buffer[self.columns[0][0]]) >= self.group_size:
+            self.flush()
+
+    def flush(self):
+        n = len(self.buffer[self.columns[0][0]])
+        if not n:
+            return
+        self.file.write(struct.pack("<I", n))
+        for name, kind in self.columns:
+            values = self.buffer[name]
+            if kind == "int":
+                raw = array("q", values).tobytes()
+            else:
+                uniques = list(dict.fromkeys(values))
+                index = {v: i for i, v in enumerate(uniques)}
+                header = json.dumps(uniques).encode()
+                raw = struct.pack("<I", len(header)) + header + array("i", [index[v] for v in values]).tobytes()
+            packed = zlib.compress(raw, 6)
+            self.file.write(struct.pack("<I", len(packed)) + packed)
+            values.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_columnar(path):
+    """Yields the rows of a ColumnarWriter file as dicts, one row group at a time."""
+    with open(path, "rb") as f:
+        if f.read(len(ColumnarWriter.MAGIC)) != ColumnarWriter.MAGIC:
+            raise ValueError(f"{path} is not a columnar report file")
+        columns = json.loads(f.readline())
+        while True:
+            head = f.read(4)
+            if not head:
+                break
+            (n,) = struct.unpack("<I", head)
+            data = {}
+            for name, kind in columns:
+                (size,) = struct.unpack("<I", f.read(4))
+                raw = zlib.decompress(f.read(size))
+                if kind == "int":
+                    data[name] = array("q", raw)
+                else:
+                    (hlen,) = struct.unpack("<I", raw[:4])
+                    uniques = json.loads(raw[4:4 + hlen])
+                    data[name] = [uniques[c] for c in array("i", raw[4 + hlen:])]
+            for i in range(n):
+                yield {name: data[name][i] for name, _ in columns}
+
+
+def run_report(conn, date_from, date_to, daily_csv=None, summary_csv=None, columnar=None, late_after="09:00:00"):
+    """Streams the period once and writes every requested output. Returns (days, employees)."""
+    daily_file = open(daily_csv, "w", newline="") if daily_csv else None
+    summary_file = open(summary_csv, "w", newline="") if summary_csv else None
+    daily_writer = csv.DictWriter(daily_file, [c for c, _ in DAILY_COLUMNS]) if daily_file else None
+    summary_writer = csv.DictWriter(summary_file, SUMMARY_COLUMNS, extrasaction="ignore") if summary_file else None
+    columnar_writer = ColumnarWriter(columnar, DAILY_COLUMNS) if columnar else None
+    if daily_writer: daily_writer.writeheader()
+    if summary_writer: summary_writer.writeheader()
+
+    days = employees = 0
+    try:
+        for row in summarize(daily_rows(conn, date_from, date_to, late_after)):
+            if row.get("summary"):
+                employees += 1
+                if summary_writer: summary_writer.writerow(row)
+                continue
+            days += 1
+            if daily_writer: daily_writer.writerow(row)
+            if columnar_writer: columnar_writer.write(row)
+    finally:
+        if daily_file: daily_file.close()
+        if summary_file: summary_file.close()
+        if columnar_writer: columnar_writer.close()
+    return days, employees
+
+
+def month_range(month):
+    year, mon = map(int, month.split("-"))
+    return f"{year:04d}-{mon:02d}-01", f"{year:04d}-{mon:02d}-{calendar.monthrange(year, mon)[1]:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export attendance reports (daily rows and per-employee summaries).")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--month", help="YYYY-MM (shortcut for --from/--to)")
+    parser.add_argument("--from", dest="date_from", default="0000-01-01")
+    parser.add_argument("--to", dest="date_to", default="9999-12-31")
+    parser.add_argument("--late-after", default="09:00:00", help="first check-in later than this counts as late")
+    parser.add_argument("--daily", help="daily rows as CSV")
+    parser.add_argument("--columnar", help="daily rows in the compact columnar format")
+    parser.add_argument("--summary", help="per-employee summary as CSV")
+    args = parser.parse_args()
+
+    if args.month:
+        args.date_from, args.date_to = month_range(args.month)
+    if len(args.late_after) == 5:
+        args.late_after += ":00"
+    if not (args.daily or args.columnar or args.summary):
+        parser.error("choose at least one of --daily, --columnar, --summary")
+
+    init_db(args.db)    # The report query needs the v2 indexes
+    conn = sqlite3.connect(args.db)
+    days, employees = run_report(conn, args.date_from, args.date_to, args.daily, args.summary,
+                                 args.columnar, args.late_after)
+    conn.close()
+    print(f"{days} employee-days for {employees} employees ({args.date_from} .. {args.date_to})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from database import DB_PATH
+
+
+class DailyStats:
+    """
+    In-memory dashboard counters ("Total Staff" and "Present Today").
+
+    Seeded once from the database, then kept current by record_* calls from the
+    attendance and registration code paths. A background thread re-runs the
+    aggregate queries every `reconcile_interval` seconds and right after midnight,
+    so drift is corrected without ever querying on the hot path.
+    `version` increases on every change so the UI can cheaply tell when to redraw.
+    """
+
+    def __init__(self, db_path=DB_PATH, reconcile_interval=300):
+        self.db_path = db_path
+        self.reconcile_interval = reconcile_interval
+        self.lock = threading.Lock()
+        self.total = 0
+        self.present = set()    # employee ids with a session today
+        self.day = None
+        self.version = 0
+        self.recorded = set()   # today's check-ins seen in this process
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.reconcile()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            now = datetime.now()
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            wait = min(self.reconcile_interval, (midnight - now).total_seconds() + 1)
+            if self._stop.wait(wait):
+                return
+            try:
+                self.reconcile()
+            except sqlite3.Error as e:
+                print(f"Stats reconcile error: {e}")
+
+    def reconcile(self):
+        """Replaces the counters with the database's view of today."""
+        today = datetime.now().strftime('%Y-%m-%d')
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM employees")
+        total = cur.fetchone()[0]
+        cur.execute("SELECT DISTINCT employee_id FROM attendance WHERE date=?", (today,))
+        present = {r[0] for r in cur.fetchall()}
+        conn.close()
+        with self.lock:
+            # Check-ins still sitting in the write-behind queue are not in the DB yet
+            if self.day == today:
+                present |= self.recorded
+            else:
+                self.recorded = set()
+            self.total, self.present, self.day = total, present, today
+            self.version += 1
+
+    def snapshot(self):
+        """Returns (total, present) for the dashboard cards."""
+        with self.lock:
+            return self.total, len(self.present)
+
+    def record_check_in(self, emp_id, now=None):
+        day = (now or datetime.now()).strftime('%Y-%m-%d')
+        if day != datetime.now().strftime('%Y-%m-%d'):
+            return      # The counters are for today; a late or future event must not move `day`
+        with self.lock:
+            if day != self.day:
+                self.present, self.recorded, self.day = set(), set(), day
+            self.recorded.add(emp_id)
+            if emp_id not in self.present:
+                self.present.add(emp_id)
+                self.version += 1
+
+    def record_registration(self):
+        with self.lock:
+            self.total += 1
+            self.version += 1
+
+    def record_removal(self, emp_id):
+        # Deleting an employee cascades to their attendance rows
+        with self.lock:
+            self.total = max(0, self.total - 1)
+            self.present.discard(emp_id)
+            self.recorded.discard(emp_id)
+            self.version += 1
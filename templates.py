@@ -0,0 +1,157 @@
+"""
+Face templates: several encodings per employee (face_templates table, schema v5).
+
+Enrollment stores the best few samples of a capture burst (see enrollment.py) and
+AutoEnroller adds more from confident live recognitions, up to MAX_TEMPLATES per
+person, so an identity keeps up with glasses, haircuts and lighting changes.
+employees.encoding holds the centroid of the templates for code that expects a
+single encoding per person.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from database import DB_PATH
+
+MAX_TEMPLATES = 8           # Per employee, enrollment and live captures together
+AUTO_MAX_DISTANCE = 0.35    # Only recognitions this confident may add a template
+AUTO_MIN_NOVELTY = 0.12     # ...and only if they differ this much from every existing one
+AUTO_MIN_FACE_PX = 100      # Face height in the full frame
+AUTO_INTERVAL = 3600        # Seconds between automatic additions for the same person
+
+
+def gallery_rows(conn, emp_id=None):
+    """
+    [(employee_id, name, encoding bytes)] with one row per template, for FaceGallery.
+    Employees without templates (added by older code) fall back to employees.encoding.
+    """
+    where = "AND e.id = ?" if emp_id is not None else ""
+    params = (emp_id, emp_id) if emp_id is not None else ()
+    return conn.execute(f"""SELECT e.id, e.name, t.encoding FROM face_templates t
+                                JOIN employees e ON e.id = t.employee_id WHERE 1 {where}
+                            UNION ALL
+                            SELECT e.id, e.name, e.encoding FROM employees e
+                            WHERE e.encoding IS NOT NULL {where}
+                              AND NOT EXISTS (SELECT 1 FROM face_templates t WHERE t.employee_id = e.id)""",
+                        params).fetchall()
+
+
+def centroid(encodings):
+    return np.mean(np.stack([np.asarray(e, dtype=np.float64) for e in encodings]), axis=0)
+
+
+def update_centroid(cursor, emp_id):
+    cursor.execute("SELECT encoding FROM face_templates WHERE employee_id=?", (emp_id,))
+    encs = [np.frombuffer(r[0], dtype=np.float64) for r in cursor.fetchall()]
+    if encs:
+        cursor.execute("UPDATE employees SET encoding=? WHERE id=?", (centroid(encs).tobytes(), emp_id))
+
+
+def save_templates(cursor, emp_id, encodings, qualities=None, source="enroll"):
+    """Stores templates on the caller's cursor (commits with the employee row) and refreshes the centroid."""
+    qualities = qualities or [None] * len(encodings)
+    cursor.executemany("INSERT INTO face_templates (employee_id, encoding, quality, source) VALUES (?, ?, ?, ?)",
+                       [(emp_id, np.asarray(e, dtype=np.float64).tobytes(), q, source)
+                        for e, q in zip(encodings, qualities)])
+    update_centroid(cursor, emp_id)
+
+
+class AutoEnroller:
+    """
+    Adds templates from live recognitions in the background.
+
+    observe() is called by FaceTracker on recognition threads for every fresh encoding
+    and only does cheap checks: the match must be very confident (a wrong template
+    would make the mistake permanent), the face large, and the person not updated in
+    the last `interval` seconds. The writer thread then skips encodings too close to
+    an existing template, and once a person is at `max_templates` replaces their
+    oldest live template; enrollment templates are never replaced. A person enrolled
+    before templates existed is only known by employees.encoding; that encoding is
+    stored as their enrollment template before the first live one, so a live capture
+    adds to their identity instead of replacing it.
+    """
+
+    def __init__(self, gallery, db_path=DB_PATH, max_templates=MAX_TEMPLATES, max_distance=AUTO_MAX_DISTANCE,
+                 min_novelty=AUTO_MIN_NOVELTY, min_face_px=AUTO_MIN_FACE_PX, interval=AUTO_INTERVAL):
+        self.gallery = gallery
+        self.db_path = db_path
+        self.max_templates = max_templates
+        self.max_distance = max_distance
+        self.min_novelty = min_novelty
+        self.min_face_px = min_face_px
+        self.interval = interval
+        self.last_added = {}    # employee id -> monotonic time of the last accepted candidate
+        self.candidates = queue.Queue(maxsize=64)
+        self.running = False
+        self.thread = None
+        # Counters for diagnostics
+        self.added = 0
+        self.replaced = 0
+        self.redundant = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def observe(self, emp_id, encoding, distance, box):
+        if emp_id is None or distance > self.max_distance or box[2] - box[0] < self.min_face_px:
+            return
+        now = time.monotonic()
+        if now - self.last_added.get(emp_id, -self.interval) < self.interval:
+            return
+        self.last_added[emp_id] = now
+        try:
+            self.candidates.put_nowait((emp_id, np.asarray(encoding, dtype=np.float64)))
+        except queue.Full:
+            pass
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA foreign_keys = ON")
+        while self.running:
+            try:
+                emp_id, encoding = self.candidates.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._add(conn, emp_id, encoding)
+            except sqlite3.Error as e:
+                print(f"Template update error: {e}")
+        conn.close()
+
+    def _add(self, conn, emp_id, encoding):
+        cur = conn.cursor()
+        cur.execute("SELECT id, encoding, source FROM face_templates WHERE employee_id=? ORDER BY id", (emp_id,))
+        existing = cur.fetchall()
+        seed = None
+        if not existing:
+            cur.execute("SELECT encoding FROM employees WHERE id=?", (emp_id,))
+            row = cur.fetchone()
+            if row and row[0] is not None and len(row[0]) == encoding.nbytes:
+                seed = np.frombuffer(row[0], dtype=np.float64)
+        known = [np.frombuffer(r[1], dtype=np.float64) for r in existing] + ([seed] if seed is not None else [])
+        if known and np.sqrt(((np.stack(known) - encoding) ** 2).sum(axis=1)).min() < self.min_novelty:
+            self.redundant += 1
+            return
+        with conn:
+            if seed is not None:
+                save_templates(cur, emp_id, [seed], source="enroll")
+            if len(existing) >= self.max_templates:
+                live = [r[0] for r in existing if r[2] == "live"]
+                if not live:
+                    return
+                cur.execute("DELETE FROM face_templates WHERE id=?", (live[0],))
+                self.replaced += 1
+            save_templates(cur, emp_id, [encoding], source="live")
+        self.added += 1
+        rows = gallery_rows(conn, emp_id)
+        if rows:
+            self.gallery.add(emp_id, rows[0][1], [r[2] for r in rows])
@@ -0,0 +1,127 @@
+import threading
+import itertools
+
+from detection import DetectionPolicy
+
+_track_ids = itertools.count(1)
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    def __init__(self, box):
+        self.id = next(_track_ids)
+        self.box = box              # full-frame box
+        self.encoded_box = None     # box at the time of the last encoding
+        self.emp_id = None
+        self.name = None
+        self.distance = None
+        self.misses = 0
+        self.detections_since_encode = 0
+
+
+class FaceTracker:
+    """
+    Track-then-recognize for one camera.
+
+    The detector only runs every `detect_every` frames; in between, the last known
+    boxes are reused. Where and at what scale it looks is up to the DetectionPolicy,
+    which searches around the existing tracks when it can. Detections are associated with existing tracks by IoU, and the
+    128-D encoder only runs for tracks that are new, have drifted away from where they
+    were last encoded, matched with low confidence (or not at all), or have not been
+    re-checked for `refresh_every` detections.
+
+    `on_encoding(emp_id, encoding, distance, box)`, if given, sees every fresh encoding
+    (templates.AutoEnroller uses it to learn from confident recognitions).
+    """
+
+    def __init__(self, detect_every=5, policy=None, match_iou=0.3, drift_iou=0.5,
+                 confident_distance=0.45, refresh_every=30, max_misses=2, on_encoding=None):
+        self.detect_every = detect_every
+        self.policy = policy or DetectionPolicy()
+        self.on_encoding = on_encoding
+        self.match_iou = match_iou
+        self.drift_iou = drift_iou
+        self.confident_distance = confident_distance
+        self.refresh_every = refresh_every
+        self.max_misses = max_misses
+        self.tracks = []
+        self.frame_no = 0
+        self.lock = threading.Lock()
+        # Counters for benchmarks / diagnostics
+        self.frames = 0
+        self.detections = 0
+        self.encodes = 0
+
+    def needs_encoding(self, track):
+        if track.encoded_box is None or track.emp_id is None:
+            return True
+        if track.distance is not None and track.distance > self.confident_distance:
+            return True
+        if iou(track.box, track.encoded_box) < self.drift_iou:
+            return True
+        return track.detections_since_encode >= self.refresh_every
+
+    def associate(self, locs):
+        """Greedy IoU matching of detections to tracks; returns the tracks for this frame."""
+        pairs = sorted(((iou(t.box, loc), ti, li) for ti, t in enumerate(self.tracks) for li, loc in enumerate(locs)),
+                       reverse=True)
+        used_tracks, used_locs = set(), set()
+        for score, ti, li in pairs:
+            if score < self.match_iou:
+                break
+            if ti in used_tracks or li in used_locs:
+                continue
+            used_tracks.add(ti)
+            used_locs.add(li)
+            track = self.tracks[ti]
+            track.box = locs[li]
+            track.misses = 0
+            track.detections_since_encode += 1
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        for li, loc in enumerate(locs):
+            if li not in used_locs:
+                survivors.append(Track(loc))
+        self.tracks = survivors
+
+    def process(self, frame, snapshot):
+        """Returns [(employee_id, name, (top, right, bottom, left), track_id)] like recognize_frame."""
+        with self.lock:
+            self.frames += 1
+            self.frame_no += 1
+            if self.frame_no % self.detect_every == 1 or self.detect_every <= 1:
+                detection = self.policy.detect(frame, [t.box for t in self.tracks])
+                self.detections += 1
+                self.associate(detection.boxes)
+
+                stale = [t for t in self.tracks if t.misses == 0 and self.needs_encoding(t)]
+                if stale:
+                    encs = self.policy.encode(detection, [t.box for t in stale])
+                    self.encodes += len(encs)
+                    with self.policy.timings.stage("match"):
+                        matches = snapshot.match(encs)
+                    for track, enc, (emp_id, name, dist) in zip(stale, encs, matches):
+                        track.emp_id, track.name, track.distance = emp_id, name, dist
+                        track.encoded_box = track.box
+                        track.detections_since_encode = 0
+                        if self.on_encoding and emp_id is not None:
+                            self.on_encoding(emp_id, enc, dist, track.box)
+
+            return [(t.emp_id, t.name, t.box, t.id)
+                    for t in self.tracks if t.misses == 0]